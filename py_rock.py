@@ -12,11 +12,18 @@ from typing import Optional
 from .src.commands.base_indexer import BaseIndexer
 from .src.commands.import_symbol import ImportSymbolCommand
 from .src.commands.re_index_imports import ReIndexImportsCommand
+from .src.commands.re_index_package import ReIndexPackageCommand
 from .src.commands.admin import AdminManager
 from .src.logger import Logger
 from .src.constants import PyRockConstants
+from .src.settings import PyRockSettings
+from .src.index_cache import import_index_cache
+from .src.index_server_client import index_server_client
+from .src.project_index import project_index_cache
+from .src.indexer_scheduler import indexer_scheduler
 from .src.commands.copy_test_path import CopyTestPathCommand
 from .src.commands.annotate_and_test_runner import AnnotateAndTestRunnerCommand
+from .src.commands.browse_symbols import BrowseSymbolsCommand, SymbolPrefixInputHandler
 
 
 logger = Logger(__name__)
@@ -32,8 +39,18 @@ def plugin_loaded():
     settings = sublime.load_settings(PyRockConstants.PACKAGE_SETTING_NAME)
     logger.debug(f"[{PyRockConstants.PACKAGE_NAME}] Settings: {settings}")
 
+    # Load the import index in background, so the first lookup is instant
+    if PyRockSettings().INDEX_SERVER.value:
+        sublime.set_timeout_async(index_server_client.ensure_started, 0)
+    else:
+        sublime.set_timeout_async(import_index_cache.warm_up, 0)
+
+    for window in sublime.windows():
+        sublime.set_timeout_async(lambda window=window: project_index_cache.warm_up(window), 0)
+
 def plugin_unloaded():
     logger.debug(f"[{PyRockConstants.PACKAGE_NAME}]..........unloaded")
+    index_server_client.stop()
 
 
 class PyRockCommand(sublime_plugin.TextCommand):
@@ -62,6 +79,12 @@ class PyRockCommand(sublime_plugin.TextCommand):
         elif action == "re_index_imports":
             cmd = ReIndexImportsCommand(test=test)
             cmd.run(sublime.active_window())
+        elif action == "rebuild_imports":
+            cmd = ReIndexImportsCommand(test=test, force=True)
+            cmd.run(sublime.active_window())
+        elif action == "re_index_package":
+            cmd = ReIndexPackageCommand(test=test)
+            cmd.run(sublime.active_window())
         elif action == "copy_test_path":
             cmd = CopyTestPathCommand(
                 view=self.view,
@@ -81,13 +104,45 @@ class PyRockCommand(sublime_plugin.TextCommand):
         logger.debug("View is not python file or have a python syntax, disabling commands")
         return False
 
+class PyRockBrowseSymbolsCommand(sublime_plugin.TextCommand):
+    """
+        The py_rock_browse_symbols command implementation, it searches the
+        index as you type and adds the import of the selected symbol
+    """
+
+    def run(self, edit: Edit, symbol_prefix: str, import_path: str, test: bool = False):
+        # Run admin checks
+        admin.run()
+
+        cmd = BrowseSymbolsCommand(
+            view=self.view,
+            edit=edit,
+            test=test,
+        )
+        cmd.run(import_path)
+
+    def input(self, args):
+        if "symbol_prefix" not in args:
+            return SymbolPrefixInputHandler(self.view)
+        return None
+
+    def input_description(self) -> str:
+        return "Browse Symbols"
+
+    def is_enabled(self, test: bool = False):
+        file_name: Optional[str] = self.view.file_name()
+        return bool(
+            (file_name and file_name.endswith(".py")) or self.view.syntax().name == "Python"
+        )
+
 class ImportAutoIndexerCommand(BaseIndexer):
     def run(self):
         # Run admin checks
         admin.run()
 
         logger.debug("Running Auto Indexer")
-        sublime.set_timeout_async(lambda: self._run_indexer(sublime.active_window()), 0)
+        # Started once the editor is idle, not while sublime starts
+        indexer_scheduler.run_when_idle(lambda: self._run_indexer(sublime.active_window()))
 
 ImportAutoIndexerCommand().run()
 
@@ -129,3 +184,24 @@ class PyRockAnnotateAndTestRunnerCommand(sublime_plugin.ViewEventListener):
     def on_post_save_async(self):
         logger.debug("View saved")
         test_runner_cmd.run(self.view)
+
+
+class PyRockProjectIndexListener(sublime_plugin.EventListener):
+    """
+        Keeps the project index of the window up to date with the saved files
+    """
+
+    def on_post_save_async(self, view):
+        file_name: Optional[str] = view.file_name()
+        if view.window() and file_name and file_name.endswith(".py"):
+            project_index_cache.on_file_saved(view.window(), file_name)
+
+
+class PyRockIndexerSchedulerListener(sublime_plugin.EventListener):
+    """
+        Tells the indexer scheduler the user is typing, background indexing
+        waits until the editor is idle again
+    """
+
+    def on_modified_async(self, view):
+        indexer_scheduler.record_activity()
@@ -1,11 +1,25 @@
 import os
-import re
-from typing import List, Tuple, Union
+import queue
+import signal
+import threading
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple, Union
 import sublime
 from sublime import Window
 from ..settings import PyRockSettings
 from ..constants import PyRockConstants
 from ..logger import Logger
+from ..index_cache import import_index_cache
+from ..index_server_client import index_server_client
+from ..indexer_scheduler import indexer_scheduler
+from ..project_index import project_index_cache
+from ..exceptions import IndexServerError
+from ..utils import (
+    get_python_script_command,
+    get_indexer_settings,
+    get_indexer_environment,
+    get_environment_cache_directory,
+)
 from pathlib import Path
 import subprocess
 import json
@@ -16,77 +30,183 @@ logger = Logger(__name__)
 path = Path(__file__)
 
 
-class BaseIndexer:
-    def _generate_serialized_settings(self):
-        settings = {
-            "IMPORT_SCAN_DEPTH": PyRockSettings().IMPORT_SCAN_DEPTH.value,
-            "INDEX_CACHE_DIRECTORY": PyRockConstants.INDEX_CACHE_DIRECTORY,
-            "IMPORT_INDEX_FILE_NAME": PyRockConstants.IMPORT_INDEX_FILE_NAME
-        }
-
-        settings_path = os.path.join(path.parent.parent, 'serialized_settings.json')
+# Last lines of the indexer stderr kept to explain a failure
+INDEXER_STDERR_LINES = 50
 
-        with open(settings_path, "w") as f:
-            json.dump(settings, f)
 
+class BaseIndexer:
     def _get_indexer_script_path(self):
         return os.path.join(path.parent.parent, 'scripts', 'indexer.py')
     
-    def _is_indexing_needed(self) -> bool:
-        file_path = os.path.join(PyRockConstants.INDEX_CACHE_DIRECTORY, PyRockConstants.IMPORT_INDEX_FILE_NAME)
-        return os.path.exists(file_path)
+    def get_indexed_distributions(self) -> Dict[str, Dict]:
+        file_path = os.path.join(
+            get_environment_cache_directory(),
+            PyRockConstants.DISTRIBUTIONS_MANIFEST_FILE_NAME
+        )
+
+        if not os.path.exists(file_path):
+            return {}
+
+        with open(file_path, 'r') as f:
+            return json.load(f).get("distributions", {})
+
+    def _handle_indexer_event(self, window: Window, event: Dict):
+        event_name = event.get("event")
+
+        if event_name == "started":
+            self._indexer_total_modules = event["modules"]
+            self._indexer_finished_modules = 0
+            self._indexer_start_time = time.perf_counter()
+        elif event_name == "module_started":
+            self._indexer_current_module = event["module"]
+        elif event_name == "module_finished":
+            self._indexer_finished_modules += 1
+            if event.get("error"):
+                logger.debug(f"Unable to index {event['module']}: {event['error']}")
+
+            total_modules = max(1, self._indexer_total_modules)
+            finished_modules = min(self._indexer_finished_modules, total_modules)
+            elapsed_time = time.perf_counter() - self._indexer_start_time
+            remaining_time = elapsed_time / finished_modules * (total_modules - finished_modules)
+            progress = int(finished_modules / total_modules * 100)
+
+            logger.debug(f"Indexing imports...{progress}%, {event['module']} took {event['duration']} sec")
+            window.status_message(f"Indexing imports...{progress}% ({int(remaining_time)}s left)")
+        elif event_name == "published":
+            logger.debug(f"Published the index of the {event['distributions']} distributions the project imports")
+            window.status_message("Imports of the project are indexed, indexing the rest...")
+        elif event_name == "paused":
+            logger.debug("Indexing paused until the editor is idle")
+            window.status_message("Indexing imports paused while typing")
+        elif event_name == "resumed":
+            logger.debug(f"Indexing resumed after {event['paused']} sec")
+        elif event_name == "summary" and event.get("followed"):
+            # Another indexer, of another window or sublime, is still at it
+            self._indexer_success = event["success"]
+            self._indexer_followed = True
+            logger.debug("Indexing is left to the indexer already running")
+        elif event_name == "summary":
+            self._indexer_success = event["success"]
+            logger.debug(
+                f"Indexed {event['modules']} modules, {event['symbols']} symbols in {event['duration']} sec, "
+                f"slowest modules: {event['slowest_modules']}"
+            )
+            if event.get("skipped_modules"):
+                logger.warning(f"Skipped modules which hung, used too much memory or crashed on import: {event['skipped_modules']}")
+            self._indexer_unfinished_distributions = event.get("unfinished_distributions", 0)
+        elif event_name == "failed":
+            self._indexer_success = False
+            self._command_error_evidence.append(event["message"])
+
+    def _read_indexer_output(self, process: subprocess.Popen, events: queue.Queue):
+        for line in iter(process.stdout.readline, b""):
+            try:
+                events.put(json.loads(line.decode('utf-8')))
+            except ValueError:
+                logger.debug(f"Invalid indexer output: {line}")
+        # Marks the end of the output
+        events.put(None)
+
+    def _read_indexer_errors(self, process: subprocess.Popen):
+        # Stderr is drained all the time, a full pipe would block the indexer
+        for line in iter(process.stderr.readline, b""):
+            output = line.decode('utf-8', errors='replace').rstrip()
+            logger.debug(output)
+            self._indexer_stderr.append(output)
+
+    def _kill_indexer(self, process: subprocess.Popen):
+        if hasattr(os, 'killpg'):
+            # Kills the shell, the python and its pool workers together
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except OSError:
+                pass
+        else:
+            process.kill()
 
     def _track_indexer_progress(self, window: Window, process: subprocess.Popen) -> bool:
-        start_time = time.perf_counter()
-        script_success: bool = False
-        log_errors: bool = False
-        # Progress tracker
-        for line in iter(process.stdout.readline, ""):
-            output = line.decode('utf-8').strip()
-            # Kill process after 20 sec
-            if (time.perf_counter() - start_time) > 20:
-                error_reason = f"Indexing stopped due to timeout at {output}%"
+        events: queue.Queue = queue.Queue()
+        threading.Thread(
+            target=self._read_indexer_output, args=(process, events), daemon=True
+        ).start()
+        threading.Thread(
+            target=self._read_indexer_errors, args=(process,), daemon=True
+        ).start()
+
+        deadline = time.monotonic() + PyRockConstants.INDEXER_TIMEOUT
+        pause_start_time: Optional[float] = None
+
+        while True:
+            remaining_time = deadline - time.monotonic()
+            if remaining_time <= 0:
+                error_reason = "Indexing stopped due to timeout"
+                if self._indexer_current_module:
+                    error_reason += f" while indexing {self._indexer_current_module}"
                 logger.warning(error_reason)
                 self._command_error_evidence.append(error_reason)
-                process.terminate()
-                script_success = False
-                break
-            
-            if log_errors:
-                # Collect error generated from script
-                self._command_error_evidence.append(output)
-            elif re.match(r"^([1-9]|[1-9][0-9]|100)$", output):
-                logger.debug(f"Indexing imports...{output}%")
-                window.status_message(f"Indexing imports...{output}%")
-                if 95 <= int(output) <= 100:
-                    script_success = True
-            elif "FAILED_INDEXING" in output:
-                script_success = False
-                log_errors = True
-            
-            if output == "" or output is None:
-                break
-        return script_success
+                self._kill_indexer(process)
+                return False
+
+            try:
+                event: Optional[Dict] = events.get(timeout=remaining_time)
+            except queue.Empty:
+                continue
 
-    def _collect_cmd_error_output(self, process: subprocess.Popen):
-        # Collect error generated from command
-        for line in iter(process.stderr.readline, ""):
-            output = line.decode('utf-8').strip()
-            if len(output) == 0 or output == "" or output is None:
+            if event is None:
                 break
-            logger.debug(output)
-            self._command_error_evidence.append(output)
-    
+
+            # Time paused waiting for the editor to be idle doesn't count,
+            # the indexer resumes by itself within the max pause
+            if event.get("event") == "paused":
+                pause_start_time = time.monotonic()
+                deadline += PyRockConstants.INDEXER_MAX_PAUSE
+            elif event.get("event") == "resumed" and pause_start_time is not None:
+                deadline -= PyRockConstants.INDEXER_MAX_PAUSE - (time.monotonic() - pause_start_time)
+                pause_start_time = None
+
+            self._handle_indexer_event(window, event)
+
+        process.wait()
+        return self._indexer_success
+
+    def _run_import_indexer_on_server(self, window: Window) -> Optional[Tuple[bool, str]]:
+        """
+            Indexes through the index server, returns None when the server
+            is not available
+        """
+        if not PyRockSettings().INDEX_SERVER.value:
+            return None
+
+        try:
+            result: Dict = index_server_client.reindex(
+                self._indexer_settings,
+                lambda event: self._handle_indexer_event(window, event),
+            )
+        except IndexServerError as e:
+            logger.warning(f"{e}, indexing without index server")
+            return None
+
+        if not result["success"]:
+            logger.error(result["message"])
+        return result["success"], result["message"]
+
     def _run_import_indexer(self, window: Window, indexer_command: Union[str, List]) -> Tuple[bool, str]:
         message: str = ""
         script_success: bool = False
 
+        server_result = self._run_import_indexer_on_server(window)
+        if server_result is not None:
+            return server_result
+
         try:
             process = subprocess.Popen(
                 indexer_command,
                 shell=True,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
+                env=get_indexer_environment(self._indexer_settings),
+                # Own process group, so a timeout kills everything it started
+                start_new_session=True,
             )
         except Exception as e:
             logger.error(str(e))
@@ -96,67 +216,67 @@ class BaseIndexer:
         script_success = self._track_indexer_progress(window, process)
 
         if not script_success:
-            if len(self._command_error_evidence) > 0:
-                logger.error("\n".join(self._command_error_evidence))
-            else:
-                self._collect_cmd_error_output(process)
-                message = "\n".join(self._command_error_evidence)
-                logger.error(message)
+            if len(self._command_error_evidence) == 0:
+                self._command_error_evidence.extend(self._indexer_stderr)
+            message = "\n".join(self._command_error_evidence)
+            logger.error(message)
         
         return script_success, message
 
-    def _get_import_command(self) -> str:
-        unix_env_bash = """
-            set -e
-            . "{venv_path}"
-            python -u "{indexer_script_path}"
-            deactivate
+    def _get_import_command(self) -> Union[str, List]:
+        return get_python_script_command(self._get_indexer_script_path())
+    
+    def _run_indexer(
+        self,
+        window: Window,
+        force: bool = False,
+        distributions: Optional[List[str]] = None,
+        resume_count: int = 0,
+    ):
         """
-        unix_without_env_bash = """
-            set -e
-            python -u "{indexer_script_path}"
+            Indexer only indexes the distributions which are added or changed
+            since the last run, `force` indexes everything again and
+            `distributions` are indexed again even if they are unchanged.
+            Distributions a run leaves, forced or not, are recorded in the
+            manifest and indexed by the next runs, started when the editor
+            is idle again.
         """
+        with indexer_scheduler.indexing():
+            success = self._run_indexer_once(window, force, distributions)
 
-        if sublime.platform() in [
-            PyRockConstants.PLATFORM_LINUX,
-            PyRockConstants.PLATFORM_OSX
-        ]:
-            if PyRockSettings().PYTHON_VIRTUAL_ENV_PATH.value:
-                import_command = unix_env_bash.format(
-                    venv_path=PyRockSettings().PYTHON_VIRTUAL_ENV_PATH.value,
-                    indexer_script_path=self._get_indexer_script_path()
-                )
-            else:
-                import_command = unix_without_env_bash.format(
-                    indexer_script_path=self._get_indexer_script_path()
-                )
-        else:
-            if PyRockSettings().PYTHON_VIRTUAL_ENV_PATH.value:
-                venv_path = PyRockSettings().PYTHON_VIRTUAL_ENV_PATH.value.replace(
-                    '\\', '\\\\'
-                )
-                indexer_script_path = self._get_indexer_script_path().replace(
-                    '\\', '\\\\'
-                )
-                import_command = [
-                    venv_path, '&&', 'python', indexer_script_path, 'deactivate'
-                ]
-            else:
-                indexer_script_path = self._get_indexer_script_path().replace('\\', '\\\\')
-                import_command = ['python', indexer_script_path]
-
-
-        return import_command
-    
-    def _run_indexer(self, window: Window, force=False):
-        if self._is_indexing_needed() and not force:
-            logger.debug("Indexing not needed")
-            window.status_message("Indexing not needed")
-            return
+        if (
+            success
+            and self._indexer_unfinished_distributions
+            and resume_count < PyRockConstants.INDEXER_MAX_RESUMES
+        ):
+            logger.debug(f"Resuming indexing of {self._indexer_unfinished_distributions} distributions")
+            # Manifest records what is left, only that is indexed, even
+            # when its shard of before is still there
+            indexer_scheduler.run_when_idle(
+                lambda: self._run_indexer(window, resume_count=resume_count + 1)
+            )
 
+    def _run_indexer_once(
+        self,
+        window: Window,
+        force: bool,
+        distributions: Optional[List[str]],
+    ) -> bool:
         self._command_error_evidence: List[str] = []
+        self._indexer_stderr: Deque[str] = deque(maxlen=INDEXER_STDERR_LINES)
+        self._indexer_success: bool = False
+        self._indexer_total_modules: int = 0
+        self._indexer_finished_modules: int = 0
+        self._indexer_start_time: float = time.perf_counter()
+        self._indexer_current_module: Optional[str] = None
+        self._indexer_unfinished_distributions: int = 0
+        self._indexer_followed: bool = False
 
-        self._generate_serialized_settings()
+        self._indexer_settings: Dict = get_indexer_settings(
+            full_reindex=force,
+            distributions=distributions,
+            priority_modules=sorted(project_index_cache.get_imported_modules(window)),
+        )
 
         window.set_status_bar_visible(True)
 
@@ -169,6 +289,18 @@ class BaseIndexer:
         logger.debug(f"Indexing result: {success}")
 
         if success:
-            window.status_message("Finished imports...")
+            if not PyRockSettings().INDEX_SERVER.value:
+                # Swap in the new index now, instead of on the next lookup
+                import_index_cache.warm_up()
+            if self._indexer_followed:
+                window.status_message("Imports are being indexed by another window")
+            elif self._indexer_unfinished_distributions:
+                window.status_message(
+                    f"Indexed imports partially, {self._indexer_unfinished_distributions} "
+                    "distributions are left for when the editor is idle"
+                )
+            else:
+                window.status_message("Finished imports...")
         else:
             sublime.error_message(f"Indexing Failed\n\n{message}")
+        return success
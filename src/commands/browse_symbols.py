@@ -0,0 +1,114 @@
+import html
+import time
+from typing import List, Optional, Tuple
+import sublime
+import sublime_plugin
+from sublime import View
+from .import_symbol import ImportSymbolCommand
+from ..index_cache import ImportIndex
+from ..constants import PyRockConstants
+from ..logger import Logger
+from pathlib import Path
+
+
+logger = Logger(__name__)
+path = Path(__file__)
+
+
+class ImportPathInputHandler(sublime_plugin.ListInputHandler):
+    def __init__(self, import_paths: List[str]):
+        self.import_paths = import_paths
+
+    def name(self) -> str:
+        return "import_path"
+
+    def placeholder(self) -> str:
+        return "Select import"
+
+    def list_items(self) -> List[sublime.ListInputItem]:
+        return [
+            sublime.ListInputItem(
+                text=import_path,
+                value=import_path,
+                annotation=import_path.rsplit('.', 1)[0] if '.' in import_path else "module",
+            )
+            for import_path in self.import_paths
+        ]
+
+
+class SymbolPrefixInputHandler(sublime_plugin.TextInputHandler):
+    """
+        Shows the top matches of the typed prefix as preview on every
+        keystroke, the matches are then listed to select an import from
+    """
+
+    def __init__(self, view: View):
+        self.view = view
+        self.import_index: Optional[ImportIndex] = ImportSymbolCommand(
+            window=view.window(),
+            edit=None,
+            view=view,
+        ).load_imports()
+        self.import_paths: List[str] = []
+        # Preview, validate and next_input all get the same prefix once
+        # it is entered, it is searched only once
+        self._last_search: Optional[Tuple[str, List[str]]] = None
+
+    def name(self) -> str:
+        return "symbol_prefix"
+
+    def placeholder(self) -> str:
+        return "Symbol name or dotted import path prefix"
+
+    def _search(self, symbol_prefix: str) -> List[str]:
+        if self.import_index is None or not symbol_prefix:
+            return []
+
+        if self._last_search is not None and self._last_search[0] == symbol_prefix:
+            return self._last_search[1]
+
+        import_paths = self.import_index.prefix_search(
+            symbol_prefix, PyRockConstants.BROWSE_SYMBOLS_LIMIT
+        )
+        if not import_paths and '.' not in symbol_prefix:
+            import_paths = self.import_index.fuzzy_search(
+                symbol_prefix, PyRockConstants.BROWSE_SYMBOLS_LIMIT
+            )
+        self._last_search = (symbol_prefix, import_paths)
+        return import_paths
+
+    def preview(self, symbol_prefix: str) -> sublime.Html:
+        if self.import_index is None:
+            return sublime.Html("<i>No index found, re-index imports first</i>")
+
+        start_time = time.perf_counter()
+        self.import_paths = self._search(symbol_prefix)
+        logger.debug(f"Time taken to search prefix: {time.perf_counter() - start_time}")
+
+        return sublime.Html(
+            "<br>".join(html.escape(import_path) for import_path in self.import_paths)
+            or "<i>No match</i>"
+        )
+
+    def validate(self, symbol_prefix: str) -> bool:
+        return len(self._search(symbol_prefix)) > 0
+
+    def next_input(self, args) -> ImportPathInputHandler:
+        return ImportPathInputHandler(self._search(args["symbol_prefix"]))
+
+
+class BrowseSymbolsCommand:
+    def __init__(self, view: View, edit=None, test: bool = False):
+        self.view = view
+        self.sublime_edit = edit
+        self.test = test
+
+    def run(self, import_path: str):
+        logger.debug(f"Selected import path {import_path}")
+
+        ImportSymbolCommand(
+            window=self.view.window(),
+            edit=self.sublime_edit,
+            view=self.view,
+            test=self.test,
+        ).add_import_path(import_path)
@@ -1,13 +1,17 @@
 import os
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple, Union
 import sublime
 from sublime import SymbolLocation, Region
 from sublime import SymbolSource, SymbolType, KindId, FindFlags
 import re
-import json
 from ..logger import Logger
 from pathlib import Path
 from ..constants import PyRockConstants
+from ..settings import PyRockSettings
+from ..index_cache import ImportIndex, import_index_cache
+from ..index_server_client import RemoteImportIndex, index_server_client
+from ..project_index import project_index_cache
+from ..scripts.index_format import CompositeImportIndex
 
 
 logger = Logger(__name__)
@@ -149,25 +153,24 @@ class ImportSymbolCommand:
             )
 
 
-    def load_user_python_imports(self) -> Optional[Dict[str, Dict]]:
-        import time
-        file_path = os.path.join(
-            PyRockConstants.INDEX_CACHE_DIRECTORY,
-            PyRockConstants.IMPORT_INDEX_FILE_NAME
-        )
-
-        import_map: Dict[str, Dict] = {}
-        start_time = time.perf_counter()
-        if os.path.exists(file_path):
-            with open(file_path, 'r') as f:
-                import_map = json.load(f)
-        else:
-            logger.debug("No user python import index found")
-            return None
+    def load_user_python_imports(self) -> Optional[Union[ImportIndex, RemoteImportIndex]]:
+        if PyRockSettings().INDEX_SERVER.value and index_server_client.ensure_started():
+            return index_server_client.get_index()
+        return import_index_cache.get()
 
-        logger.debug(f"Time taken to load index: {time.perf_counter() - start_time}")
+    def load_imports(self) -> Optional[Union[ImportIndex, RemoteImportIndex]]:
+        """
+            Project symbols and the user python imports looked up as one,
+            project symbols come first
+        """
+        user_python_import_index = self.load_user_python_imports()
+        project_import_index = project_index_cache.get_import_index(self.window)
 
-        return import_map
+        if project_import_index is None:
+            return user_python_import_index
+        if user_python_import_index is None:
+            return project_import_index
+        return CompositeImportIndex([project_import_index, user_python_import_index])
 
     def generate_imports_from_sublime_result(
         self,
@@ -186,30 +189,61 @@ class ImportSymbolCommand:
                 }
         return import_statements
 
+    def get_import_statement(self, import_path: str) -> Tuple[str, Dict]:
+        path_split = import_path.split('.')
+        symbol = path_split[-1]
+        if len(path_split) > 1:
+            return f"from {'.'.join(path_split[:-1])} import {symbol}", {
+                "from_part": f"from {'.'.join(path_split[:-1])} import",
+                "symbol": symbol,
+            }
+        return f"import {symbol}", {
+            "from_part": f"import {symbol}",
+            "symbol": symbol,
+        }
+
     def generate_imports_from_user_python_imports(
         self,
         selected_text: str,
-        user_python_import_map: Dict[str, Dict]
+        user_python_import_index: ImportIndex
     ) -> Dict[str, Dict]:
-        import_statements: Dict[str, Dict] = {}
+        import_paths: List[str] = user_python_import_index.lookup(selected_text)
+        if not import_paths:
+            # Selected text can be in a different case, like `ordereddict`
+            import_paths = user_python_import_index.lookup(selected_text, ignore_case=True)
+
+        if not import_paths:
+            # Selected text can have a typo or be an abbreviation, like `HttpResp`
+            import_paths = user_python_import_index.fuzzy_search(
+                selected_text, PyRockConstants.FUZZY_MATCH_LIMIT
+            )
+            import_statements: Dict[str, Dict] = {}
+            for rank, import_path in enumerate(import_paths, start=1):
+                import_statement, import_statement_info = self.get_import_statement(import_path)
+                # Fuzzy matches are kept in the order of their similarity
+                import_statements[import_statement] = {**import_statement_info, "rank": rank}
+            return import_statements
+
+        return dict(
+            self.get_import_statement(import_path)
+            for import_path in import_paths
+        )
 
-        if user_python_import_map.get(selected_text[0], {}).get(selected_text[-1]):
-            import_paths = user_python_import_map[selected_text[0]][selected_text[-1]]
-
-            for import_path in import_paths:
-                path_split = import_path.split('.')
-                if path_split[-1] == selected_text:
-                    if len(path_split) > 1:
-                        import_statements[f"from {'.'.join(path_split[:-1])} import {selected_text}"] = {
-                            "from_part": f"from {'.'.join(path_split[:-1])} import",
-                            "symbol": selected_text,
-                        }
-                    else:
-                        import_statements[f"import {selected_text}"] = {
-                            "from_part": f"import {selected_text}",
-                            "symbol": selected_text,
-                        }
-        return import_statements
+    def is_private_import_statement(self, import_statement: str) -> bool:
+        """
+            Modules like `pkg._impl` are private, the same symbol is usually
+            re-exported by a public module
+        """
+        module_path = import_statement.split()[1]
+        return any(part.startswith('_') for part in module_path.split('.'))
+
+    def add_import_path(self, import_path: str, copy: bool = False):
+        """
+            Adds the import statement of an already chosen import path
+        """
+        self.copy = copy
+        self.import_statements = dict([self.get_import_statement(import_path)])
+        self._add_import_to_view(index=0)
 
     def run(self, copy: bool = False):
         self.copy = copy
@@ -225,39 +259,44 @@ class ImportSymbolCommand:
             )
             return
 
-        user_python_import_map: Optional[Dict[str, Dict]] = self.load_user_python_imports()
-
-        symbol_locations: List[SymbolLocation] = self.view.window().symbol_locations(
-            sym=selected_text,
-            source=SymbolSource.INDEX,
-            type=SymbolType.DEFINITION,
-            kind_id=KindId.AMBIGUOUS,
-            kind_letter=''
-        )
-        logger.debug(f"Sublime importer result {symbol_locations}")
+        user_python_import_index: Optional[ImportIndex] = self.load_imports()
 
         self.import_statements: Dict[str, Dict] = {}
 
-        if selected_text:
+        # Sublime index only until the project index is built, its module
+        # paths are relative to the project folder
+        if selected_text and project_index_cache.get_import_index(self.window) is None:
+            symbol_locations: List[SymbolLocation] = self.view.window().symbol_locations(
+                sym=selected_text,
+                source=SymbolSource.INDEX,
+                type=SymbolType.DEFINITION,
+                kind_id=KindId.AMBIGUOUS,
+                kind_letter=''
+            )
+            logger.debug(f"Sublime importer result {symbol_locations}")
+
             self.import_statements = self.generate_imports_from_sublime_result(
                 selected_text,
                 symbol_locations
             )
 
-        if user_python_import_map and selected_text:
+        if user_python_import_index and selected_text:
             self.import_statements.update(
                 self.generate_imports_from_user_python_imports(
                     selected_text,
-                    user_python_import_map
+                    user_python_import_index
                 )
             )
 
         self.import_statements = dict(
             sorted(
                 self.import_statements.items(),
-                # put imports first, then sort by depth, then by name
+                # put exact matches first, imports first, public modules first,
+                # then sort by depth, then by name
                 key=lambda k: (
+                    k[1].get("rank", 0),
                     not k[0].startswith("import "),
+                    self.is_private_import_statement(k[0]),
                     k[0].count("."),
                     k[0],
                 ),
@@ -10,14 +10,28 @@ path = Path(__file__)
 
 
 class ReIndexImportsCommand(BaseIndexer):
-    def __init__(self, test: bool = False):
+    """
+        Re-indexes the packages changed since the last indexing, `force`
+        rebuilds the index of every package, like the editable installs
+        whose sources changed without their version
+    """
+
+    def __init__(self, test: bool = False, force: bool = False):
         self.test = test
+        self.force = force
 
     def run(self, window: Window):
-        result: bool = sublime.ok_cancel_dialog(
-            msg="Are you sure to re-index imports?",
-            ok_title='Yes',
-            title='Re-Index Imports'
-        )
+        if self.force:
+            result: bool = sublime.ok_cancel_dialog(
+                msg="Are you sure to rebuild the imports index? Every package is indexed again.",
+                ok_title='Yes',
+                title='Rebuild Imports'
+            )
+        else:
+            result = sublime.ok_cancel_dialog(
+                msg="Are you sure to re-index imports?",
+                ok_title='Yes',
+                title='Re-Index Imports'
+            )
         if result:
-            sublime.set_timeout_async(lambda: self._run_indexer(window, True), 0)
+            sublime.set_timeout_async(lambda: self._run_indexer(window, force=self.force), 0)
@@ -0,0 +1,54 @@
+import sublime
+from typing import Dict, List
+from sublime import Window
+from .base_indexer import BaseIndexer
+from ..logger import Logger
+from pathlib import Path
+
+
+logger = Logger(__name__)
+path = Path(__file__)
+
+
+class ReIndexPackageCommand(BaseIndexer):
+    def __init__(self, test: bool = False):
+        self.test = test
+
+    def _re_index_package(self, window: Window, index: int):
+        if index < 0:
+            logger.debug("Not selected any package, returning")
+            return
+
+        distribution_name = self.distribution_names[index]
+        logger.debug(f"Re-indexing package {distribution_name}")
+
+        sublime.set_timeout_async(
+            lambda: self._run_indexer(window, distributions=[distribution_name]),
+            0
+        )
+
+    def run(self, window: Window):
+        indexed_distributions: Dict[str, Dict] = self.get_indexed_distributions()
+
+        if not indexed_distributions:
+            logger.info("No indexed packages found, re-index imports first")
+            sublime.status_message("No indexed packages found, re-index imports first")
+            return
+
+        self.distribution_names: List[str] = sorted(indexed_distributions.keys())
+
+        if self.test:
+            self._re_index_package(window, index=0)
+            return
+
+        window.show_quick_panel(
+            items=[
+                sublime.QuickPanelItem(
+                    trigger=distribution_name,
+                    annotation=indexed_distributions[distribution_name]["version"],
+                )
+                for distribution_name in self.distribution_names
+            ],
+            on_select=lambda index: self._re_index_package(window, index),
+            placeholder="Select package to re-index",
+        )
@@ -1,11 +1,39 @@
 import os
 import sublime
+from .scripts.indexer_settings import SETTINGS_ENV_VAR
 
 class PyRockConstants:
     PACKAGE_NAME = 'PyRock'
+    # Latest version of messages.json, written in the index file headers
+    PACKAGE_VERSION = '2.0.0'
     PACKAGE_SETTING_NAME = 'pyrock.sublime-settings'
     INDEX_CACHE_DIRECTORY = os.path.join(sublime.cache_path(), PACKAGE_NAME)
     IMPORT_INDEX_FILE_NAME = 'py_rock_imports.json'
+    BINARY_INDEX_FILE_NAME = 'py_rock_imports.idx'
+    EXTENSION_CACHE_FILE_NAME = 'py_rock_extension_cache.json'
+    DISTRIBUTIONS_MANIFEST_FILE_NAME = 'py_rock_distributions.json'
+    INDEX_SHARDS_DIRECTORY_NAME = 'shards'
+    MODULE_DISCOVERY_CACHE_FILE_NAME = 'py_rock_modules.json'
+    # Bumped by the indexer once a new index is complete
+    INDEX_GENERATION_FILE_NAME = 'py_rock_generation.txt'
+    # Lease of the indexer building the index of an environment, others
+    # follow its progress from its events file
+    INDEXER_LEASE_FILE_NAME = 'py_rock_indexer.lock'
+    INDEXER_EVENTS_FILE_NAME = 'py_rock_indexer_events.jsonl'
+    # Touched while the user types, the indexer waits while it is recent
+    INDEXER_PAUSE_FILE_NAME = 'py_rock_indexer.pause'
+    # Index, manifest and module cache of every python environment, shards
+    # are shared by all of them
+    ENVIRONMENTS_DIRECTORY_NAME = 'environments'
+    DEFAULT_ENVIRONMENT_NAME = 'default'
+    # Standard library indexes, one per python build, linked in the
+    # directory of every environment using it
+    STDLIB_INDEX_DIRECTORY_NAME = 'stdlib'
+    STDLIB_IMPORT_INDEX_FILE_NAME = 'py_rock_stdlib.json'
+    STDLIB_BINARY_INDEX_FILE_NAME = 'py_rock_stdlib.idx'
+    # Max size of the cache directory, least recently used environments
+    # and shards are removed past it
+    INDEX_CACHE_MAX_SIZE = 512 * 1024 * 1024
     ABSOLUTE_PACKAGE_ASSETS_DIR = os.path.join(
         sublime.packages_path(), PACKAGE_NAME, 'assets'
     )
@@ -22,6 +50,69 @@ class PyRockConstants:
     MIN_IMPORT_SCAN_DEPTH = 1
     MAX_IMPORT_SCAN_DEPTH = 6
 
+    IMPORT_INDEXER_ENGINE = "import"
+    STATIC_INDEXER_ENGINE = "static"
+    DEFAULT_INDEXER_ENGINE = IMPORT_INDEXER_ENGINE
+
+    BINARY_INDEX_FORMAT = "binary"
+    JSON_INDEX_FORMAT = "json"
+    DEFAULT_INDEX_FORMAT = BINARY_INDEX_FORMAT
+
+    # Max matches shown while browsing symbols
+    BROWSE_SYMBOLS_LIMIT = 50
+    # Max imports suggested when the selected text has no exact match
+    FUZZY_MATCH_LIMIT = 20
+
+    DEFAULT_INDEXER_WORKERS = 1
+    MIN_INDEXER_WORKERS = 1
+    MAX_INDEXER_WORKERS = 64
+
+    # Seconds the editor has to be idle before indexing starts or goes on
+    # after the user typed
+    DEFAULT_INDEXER_IDLE_DELAY = 3
+    MIN_INDEXER_IDLE_DELAY = 0
+    MAX_INDEXER_IDLE_DELAY = 300
+    # Max seconds an indexer run waits for the editor to be idle, it then
+    # stops and the rest is indexed on the next idle period
+    INDEXER_MAX_PAUSE = 60
+    # Indexer runs started one after another to finish what a run left
+    INDEXER_MAX_RESUMES = 5
+    # Niceness of the indexer process, 0 keeps the editor priority
+    INDEXER_NICENESS = 10
+
+    # Glob patterns of the top level modules never indexed, unless included
+    DEFAULT_EXCLUDED_MODULES = ["*sublime*", "*xkcd*", "*antigravity*"]
+
+    # Folders of the window, relative to which project module paths are
+    # made, the deepest one containing a file wins
+    DEFAULT_PROJECT_SOURCE_ROOTS = [".", "src"]
+    # Threads parsing the project files when the project index is built
+    PROJECT_INDEXER_THREADS = 4
+    # Max python files of a window indexed, big trees are cut short
+    PROJECT_INDEX_MAX_FILES = 50000
+    # Directories never walked for project files
+    PROJECT_INDEX_SKIPPED_DIRECTORIES = [
+        "__pycache__", "node_modules", "site-packages"
+    ]
+
+    DEFAULT_INDEX_SERVER = True
+    # Lookups load the index in the plugin host while the server is down
+    DEFAULT_INDEX_SERVER_FALLBACK = True
+    # Max seconds to wait for the index server to answer a lookup
+    INDEX_SERVER_REQUEST_TIMEOUT = 2
+    # Seconds to wait before starting again an index server which failed
+    INDEX_SERVER_RESTART_DELAY = 60
+    # Max seconds given to the indexer to finish
+    INDEXER_TIMEOUT = 20
+    # Max seconds given to the import of a single module
+    MODULE_TIMEOUT = 5
+    # Max memory of an import worker in bytes, it is killed past it
+    INDEXER_WORKER_MAX_RSS = 1024 * 1024 * 1024
+    # Modules imported by an import worker before it is replaced
+    INDEXER_WORKER_MAX_MODULES = 50
+    # Environment variable passing the settings to the indexer scripts
+    INDEXER_SETTINGS_ENV_VAR = SETTINGS_ENV_VAR
+
     PLATFORM_OSX = "osx"
     PLATFORM_LINUX = "linux"
     PLATFORM_WINDOWS = "windows"
@@ -97,3 +97,84 @@ class InvalidTestFramework(PyRockBaseException):
         error_code: str = "PR0010",
     ):
         super().__init__(error_code, message)
+
+
+class InvalidIndexerEngine(PyRockBaseException):
+    def __init__(
+        self,
+        message: str = "Provided indexer engine is invalid",
+        error_code: str = "PR0011",
+    ):
+        super().__init__(error_code, message)
+
+
+class InvalidIndexerWorkers(PyRockBaseException):
+    def __init__(
+        self,
+        message: str = "Provided indexer workers value is not in valid range",
+        error_code: str = "PR0012",
+    ):
+        super().__init__(error_code, message)
+
+
+class InvalidIndexFormat(PyRockBaseException):
+    def __init__(
+        self,
+        message: str = "Provided index format is invalid",
+        error_code: str = "PR0013",
+    ):
+        super().__init__(error_code, message)
+
+
+class InvalidIndexServer(PyRockBaseException):
+    def __init__(
+        self,
+        message: str = "Provided index server value should be true or false",
+        error_code: str = "PR0014",
+    ):
+        super().__init__(error_code, message)
+
+
+class InvalidIndexServerFallback(PyRockBaseException):
+    def __init__(
+        self,
+        message: str = "Provided index server fallback value should be true or false",
+        error_code: str = "PR0019",
+    ):
+        super().__init__(error_code, message)
+
+
+class IndexServerError(PyRockBaseException):
+    def __init__(
+        self,
+        message: str = "Index server is not available",
+        error_code: str = "PR0015",
+    ):
+        super().__init__(error_code, message)
+
+
+class InvalidModulePatterns(PyRockBaseException):
+    def __init__(
+        self,
+        message: str = "Provided module patterns should be a list of strings",
+        error_code: str = "PR0016",
+    ):
+        super().__init__(error_code, message)
+
+
+class InvalidProjectSourceRoots(PyRockBaseException):
+    def __init__(
+        self,
+        message: str = "Provided project source roots should be a list of paths",
+        error_code: str = "PR0017",
+    ):
+        super().__init__(error_code, message)
+
+
+class InvalidIndexerIdleDelay(PyRockBaseException):
+    def __init__(
+        self,
+        message: str = "Provided indexer idle delay is not in valid range",
+        error_code: str = "PR0018",
+    ):
+        super().__init__(error_code, message)
@@ -0,0 +1,128 @@
+import os
+import time
+import threading
+from typing import Optional, Union
+from .constants import PyRockConstants
+from .settings import PyRockSettings
+from .utils import get_environment_cache_directory
+from .logger import Logger
+from .scripts.index_format import (
+    BinaryImportIndex,
+    CompositeImportIndex,
+    JsonImportIndex,
+    InvalidIndexFile,
+    IndexSignature,
+    get_index_signature,
+    get_snapshot_path,
+    read_index_generation,
+)
+
+
+logger = Logger(__name__)
+
+
+ImportIndex = Union[BinaryImportIndex, JsonImportIndex, CompositeImportIndex]
+
+
+class ImportIndexCache:
+    """
+        Keeps the user python import index loaded for the whole plugin
+        host, getting it only costs a stat of the index file and it is
+        loaded again only when a re-index completes a new generation,
+        lookups keep using the previous one until then
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._import_index: Optional[ImportIndex] = None
+        self._index_signature: Optional[IndexSignature] = None
+        self.generation = 0
+
+    def _get_index_file_path(self) -> str:
+        # Every python environment has its own index, switching between
+        # them only switches the file loaded
+        if PyRockSettings().INDEX_FORMAT.value == PyRockConstants.JSON_INDEX_FORMAT:
+            return os.path.join(
+                get_environment_cache_directory(),
+                PyRockConstants.IMPORT_INDEX_FILE_NAME
+            )
+        return os.path.join(
+            get_environment_cache_directory(),
+            PyRockConstants.BINARY_INDEX_FILE_NAME
+        )
+
+    def _get_stdlib_index_file_path(self) -> str:
+        # Prebuilt index of the standard library of the environment python
+        if PyRockSettings().INDEX_FORMAT.value == PyRockConstants.JSON_INDEX_FORMAT:
+            return os.path.join(
+                get_environment_cache_directory(),
+                PyRockConstants.STDLIB_IMPORT_INDEX_FILE_NAME
+            )
+        return os.path.join(
+            get_environment_cache_directory(),
+            PyRockConstants.STDLIB_BINARY_INDEX_FILE_NAME
+        )
+
+    def _get_generation_file_path(self, file_path: str) -> str:
+        return os.path.join(
+            os.path.dirname(file_path), PyRockConstants.INDEX_GENERATION_FILE_NAME
+        )
+
+    def _load_file(self, file_path: str) -> ImportIndex:
+        if file_path.endswith(".json"):
+            return JsonImportIndex.from_file(file_path)
+        return BinaryImportIndex(file_path)
+
+    def _load(self, file_path: str, generation: int) -> Optional[ImportIndex]:
+        start_time = time.perf_counter()
+        try:
+            import_index = self._load_file(file_path)
+            # Standard library index of the same generation
+            stdlib_file_path = get_snapshot_path(self._get_stdlib_index_file_path(), generation)
+            if os.path.exists(stdlib_file_path):
+                import_index = CompositeImportIndex([import_index, self._load_file(stdlib_file_path)])
+        except (InvalidIndexFile, OSError, ValueError) as e:
+            logger.warning(f"Unable to load user python import index: {e}")
+            return None
+
+        logger.debug(f"Time taken to load index: {time.perf_counter() - start_time}")
+        return import_index
+
+    def get(self) -> Optional[ImportIndex]:
+        # Every generation has its own file, the writer never replaces
+        # the one mapped here
+        generation_file_path = self._get_generation_file_path(self._get_index_file_path())
+        generation = read_index_generation(generation_file_path)
+        file_path = get_snapshot_path(self._get_index_file_path(), generation)
+        index_signature = get_index_signature(file_path, generation_file_path)
+
+        if index_signature is None:
+            logger.debug("No user python import index found")
+            return None
+
+        if index_signature == self._index_signature:
+            return self._import_index
+
+        with self._lock:
+            # Another thread could have loaded it while waiting for the lock
+            if index_signature != self._index_signature:
+                logger.debug(f"Loading user python import index {file_path}")
+                # Replaced, not closed, lookups running on the old index
+                # keep their own reference to it, mmap is released with it.
+                # An index failing to load leaves the previous one in use.
+                import_index = self._load(file_path, generation)
+                if import_index is not None:
+                    self._import_index = import_index
+                    self.generation = generation
+                self._index_signature = index_signature
+            return self._import_index
+
+    def warm_up(self):
+        """
+            Loads the index ahead of the first lookup, meant to be called
+            in background when the plugin loads or after a re-index
+        """
+        self.get()
+
+
+import_index_cache = ImportIndexCache()
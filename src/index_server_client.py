@@ -0,0 +1,265 @@
+import os
+import json
+import time
+import itertools
+import threading
+import subprocess
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Union
+from .constants import PyRockConstants
+from .exceptions import IndexServerError
+from .index_cache import import_index_cache
+from .logger import Logger
+from .settings import PyRockSettings
+from .utils import (
+    get_python_script_command,
+    get_indexer_settings,
+    get_indexer_environment,
+)
+
+
+logger = Logger(__name__)
+path = Path(__file__)
+
+
+class PendingRequest:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[str] = None
+
+
+class IndexServerClient:
+    """
+        Talks to the index server script over line delimited JSON-RPC,
+        the server is started once per python environment and started
+        again when the environment or the settings change, or the server dies
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._process: Optional[subprocess.Popen] = None
+        self._command: Optional[Union[str, List]] = None
+        self._settings: Optional[Dict] = None
+        self._request_ids = itertools.count(1)
+        self._pending_requests: Dict[int, PendingRequest] = {}
+        self._indexer_event_callback: Optional[Callable[[Dict], None]] = None
+        self._failed_at: Optional[float] = None
+
+    def _get_server_script_path(self) -> str:
+        return os.path.join(path.parent, 'scripts', 'index_server.py')
+
+    def _is_running(self) -> bool:
+        return self._process is not None and self._process.poll() is None
+
+    def _start(self, command: Union[str, List], settings: Dict):
+        logger.debug(f"Starting index server using: {command}")
+        self._process = subprocess.Popen(
+            command,
+            shell=True,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            env=get_indexer_environment(settings),
+        )
+        self._command = command
+        self._settings = settings
+
+        threading.Thread(
+            target=self._read_responses, args=(self._process,), daemon=True
+        ).start()
+        threading.Thread(
+            target=self._read_errors, args=(self._process,), daemon=True
+        ).start()
+
+    def ensure_started(self) -> bool:
+        command = get_python_script_command(self._get_server_script_path())
+        settings = get_indexer_settings()
+
+        with self._lock:
+            if self._is_running() and command == self._command and settings == self._settings:
+                return True
+
+            if self._is_running():
+                # Python environment or the index location changed
+                self._stop()
+
+            if (
+                self._failed_at is not None
+                and time.monotonic() - self._failed_at < PyRockConstants.INDEX_SERVER_RESTART_DELAY
+            ):
+                return False
+
+            try:
+                self._start(command, settings)
+            except Exception as e:
+                logger.error(f"Unable to start index server: {e}")
+                self._failed_at = time.monotonic()
+                return False
+
+            self._failed_at = None
+            return True
+
+    def _read_responses(self, process: subprocess.Popen):
+        for line in iter(process.stdout.readline, b''):
+            try:
+                message: Dict = json.loads(line.decode('utf-8'))
+            except ValueError:
+                logger.debug(f"Invalid index server output: {line}")
+                continue
+
+            if "id" in message:
+                pending_request = self._pending_requests.pop(message["id"], None)
+                if pending_request is None:
+                    continue
+                if "error" in message:
+                    pending_request.error = message["error"].get("message")
+                else:
+                    pending_request.result = message.get("result")
+                pending_request.done.set()
+            elif message.get("method") == "indexer_event" and self._indexer_event_callback:
+                self._indexer_event_callback(message["params"])
+
+        logger.debug("Index server stopped")
+        with self._lock:
+            if self._process is process:
+                self._failed_at = time.monotonic()
+        self._fail_pending_requests("Index server stopped")
+
+    def _read_errors(self, process: subprocess.Popen):
+        for line in iter(process.stderr.readline, b''):
+            logger.debug(line.decode('utf-8', errors='replace').rstrip())
+
+    def _fail_pending_requests(self, error: str):
+        for request_id in list(self._pending_requests.keys()):
+            pending_request = self._pending_requests.pop(request_id, None)
+            if pending_request is not None:
+                pending_request.error = error
+                pending_request.done.set()
+
+    def request(self, method: str, params: Dict, timeout: float) -> Any:
+        if not self.ensure_started():
+            raise IndexServerError()
+
+        request_id = next(self._request_ids)
+        pending_request = PendingRequest()
+        self._pending_requests[request_id] = pending_request
+
+        message = json.dumps({
+            "jsonrpc": "2.0",
+            "id": request_id,
+            "method": method,
+            "params": params,
+        })
+
+        try:
+            with self._write_lock:
+                self._process.stdin.write(f"{message}\n".encode('utf-8'))
+                self._process.stdin.flush()
+        except (OSError, ValueError) as e:
+            self._pending_requests.pop(request_id, None)
+            raise IndexServerError(f"Unable to send request to index server: {e}")
+
+        if not pending_request.done.wait(timeout):
+            self._pending_requests.pop(request_id, None)
+            raise IndexServerError(f"Index server didn't answer {method} in {timeout} sec")
+
+        if pending_request.error is not None:
+            raise IndexServerError(f"Index server failed {method}: {pending_request.error}")
+
+        return pending_request.result
+
+    def reindex(self, settings: Dict, indexer_event_callback: Callable[[Dict], None]) -> Dict:
+        self._indexer_event_callback = indexer_event_callback
+        try:
+            return self.request(
+                "reindex",
+                {"settings": settings, "timeout": PyRockConstants.INDEXER_TIMEOUT},
+                # Server stops the indexer on timeout, then it answers,
+                # the time it waited for the editor to be idle doesn't count
+                timeout=(
+                    PyRockConstants.INDEXER_TIMEOUT
+                    + PyRockConstants.INDEXER_MAX_PAUSE
+                    + PyRockConstants.INDEX_SERVER_REQUEST_TIMEOUT
+                ),
+            )
+        finally:
+            self._indexer_event_callback = None
+
+    def _stop(self):
+        process = self._process
+        self._process = None
+        self._command = None
+        self._settings = None
+
+        if process is None:
+            return
+
+        try:
+            # Server stops on shutdown or when its stdin is closed
+            process.stdin.write(b'{"jsonrpc": "2.0", "id": 0, "method": "shutdown"}\n')
+            process.stdin.close()
+        except (OSError, ValueError):
+            pass
+
+    def stop(self):
+        with self._lock:
+            self._stop()
+
+    def get_index(self) -> 'RemoteImportIndex':
+        return RemoteImportIndex(self)
+
+
+class RemoteImportIndex:
+    """
+        Import index answered by the index server. When the server is
+        not available, lookups load the index in the plugin host, unless
+        the `index_server_fallback` setting turns it off
+    """
+
+    def __init__(self, client: IndexServerClient):
+        self._client = client
+
+    def _request(self, method: str, params: Dict, fallback: Callable[[Any], List[str]]) -> List[str]:
+        try:
+            return self._client.request(
+                method, params, timeout=PyRockConstants.INDEX_SERVER_REQUEST_TIMEOUT
+            )
+        except IndexServerError as e:
+            if not PyRockSettings().INDEX_SERVER_FALLBACK.value:
+                logger.error(f"{e}, no imports found")
+                return []
+            logger.warning(f"{e}, looking up in the index loaded in the plugin host")
+
+        import_index = import_index_cache.get()
+        if import_index is None:
+            return []
+        return fallback(import_index)
+
+    def lookup(self, symbol: str, ignore_case: bool = False, kinds: Optional[List[str]] = None) -> List[str]:
+        return self._request(
+            "lookup",
+            {"symbol": symbol, "ignore_case": ignore_case, "kinds": kinds},
+            lambda import_index: import_index.lookup(symbol, ignore_case=ignore_case, kinds=kinds),
+        )
+
+    def prefix_search(self, prefix: str, limit: int, kinds: Optional[List[str]] = None) -> List[str]:
+        return self._request(
+            "prefix",
+            {"prefix": prefix, "limit": limit, "kinds": kinds},
+            lambda import_index: import_index.prefix_search(prefix, limit, kinds=kinds),
+        )
+
+    def fuzzy_search(self, query: str, limit: int, kinds: Optional[List[str]] = None) -> List[str]:
+        return self._request(
+            "fuzzy",
+            {"query": query, "limit": limit, "kinds": kinds},
+            lambda import_index: import_index.fuzzy_search(query, limit, kinds=kinds),
+        )
+
+    def close(self):
+        pass
+
+
+index_server_client = IndexServerClient()
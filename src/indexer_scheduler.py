@@ -0,0 +1,95 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+from typing import Callable, Iterator
+import sublime
+from .constants import PyRockConstants
+from .settings import PyRockSettings
+from .utils import get_environment_cache_directory
+from .logger import Logger
+
+
+logger = Logger(__name__)
+
+
+# Min seconds between two touches of the pause file while the user types
+PAUSE_TOUCH_INTERVAL = 1
+
+
+class IndexerScheduler:
+    """
+        Runs the background indexing once the editor is idle and pauses it
+        while the user types, through a pause file the indexer checks
+        before every module it starts
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_activity_time = time.monotonic()
+        self._last_pause_touch_time = 0.0
+        self._running_indexers = 0
+
+    def _get_pause_file_path(self) -> str:
+        return os.path.join(
+            get_environment_cache_directory(),
+            PyRockConstants.INDEXER_PAUSE_FILE_NAME
+        )
+
+    def _touch_pause_file(self):
+        pause_file_path = self._get_pause_file_path()
+        try:
+            with open(pause_file_path, 'a'):
+                pass
+            os.utime(pause_file_path)
+        except OSError:
+            logger.debug(f"Unable to touch the indexer pause file {pause_file_path}")
+
+    def record_activity(self):
+        """
+            Called on every change made by the user, running indexers wait
+            until the editor is idle again
+        """
+        now = time.monotonic()
+        self._last_activity_time = now
+
+        with self._lock:
+            if not self._running_indexers or now - self._last_pause_touch_time < PAUSE_TOUCH_INTERVAL:
+                return
+            self._last_pause_touch_time = now
+
+        self._touch_pause_file()
+
+    def get_idle_time(self) -> float:
+        return time.monotonic() - self._last_activity_time
+
+    def run_when_idle(self, callback: Callable[[], None]):
+        """
+            Runs the callback in the async thread once the editor has been
+            idle for the indexer idle delay
+        """
+        remaining_time = PyRockSettings().INDEXER_IDLE_DELAY.value - self.get_idle_time()
+        if remaining_time <= 0:
+            sublime.set_timeout_async(callback, 0)
+            return
+
+        sublime.set_timeout_async(
+            lambda: self.run_when_idle(callback),
+            int(remaining_time * 1000) + 1,
+        )
+
+    @contextmanager
+    def indexing(self) -> Iterator[None]:
+        """
+            Marks an indexer as running, typing pauses it meanwhile
+        """
+        with self._lock:
+            self._running_indexers += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._running_indexers -= 1
+
+
+indexer_scheduler = IndexerScheduler()
@@ -0,0 +1,245 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+from .constants import PyRockConstants
+from .settings import PyRockSettings
+from .logger import Logger
+from .scripts.index_format import JsonImportIndex, MODULE_KIND, get_symbol_name
+from .scripts.source_members import get_imported_modules, get_source_members, parse_source
+
+
+logger = Logger(__name__)
+
+
+# import path and kind of every symbol a project file defines
+FileEntries = List[Tuple[str, str]]
+
+# Symbols a project file defines and top level modules it imports
+FileIndex = Tuple[FileEntries, Set[str]]
+
+
+class ProjectIndex:
+    """
+        Symbols of the python files of the window folders, parsed with ast.
+        Module paths are made relative to the deepest source root holding
+        the file, a saved file is parsed again on its own.
+    """
+
+    def __init__(self, folders: List[str], source_roots: List[str]):
+        self.folders = folders
+        self.source_root_settings = source_roots
+        self.source_roots = sorted(
+            {
+                os.path.normpath(os.path.join(folder, source_root))
+                for folder in folders
+                for source_root in source_roots
+            },
+            # Deepest first, `src` wins over the folder holding it
+            key=lambda source_root: source_root.count(os.sep),
+            reverse=True,
+        )
+        self._lock = threading.Lock()
+        self._file_entries: Dict[str, FileEntries] = {}
+        self._file_imports: Dict[str, Set[str]] = {}
+        # Files saved while building, the build must not overwrite them
+        self._saved_file_paths: Optional[set] = None
+        self._import_index: Optional[JsonImportIndex] = None
+        self.is_ready = False
+
+    def get_module_path(self, file_path: str) -> Optional[str]:
+        file_path = os.path.normpath(file_path)
+        for source_root in self.source_roots:
+            if not file_path.startswith(source_root + os.sep):
+                continue
+
+            parts = os.path.splitext(os.path.relpath(file_path, source_root))[0].split(os.sep)
+            if parts[-1] == "__init__":
+                parts = parts[:-1]
+            if parts and all(part.isidentifier() for part in parts):
+                return ".".join(parts)
+            return None
+        return None
+
+    def _iter_source_files(self) -> Iterator[str]:
+        skipped_directories = set(PyRockConstants.PROJECT_INDEX_SKIPPED_DIRECTORIES)
+        file_count = 0
+
+        for folder in self.folders:
+            for directory_path, directory_names, file_names in os.walk(folder):
+                # Virtual envs inside the project are indexed as the environment
+                if "pyvenv.cfg" in file_names:
+                    directory_names[:] = []
+                    continue
+
+                directory_names[:] = [
+                    directory_name for directory_name in directory_names
+                    if not directory_name.startswith(".")
+                    and directory_name not in skipped_directories
+                ]
+                for file_name in file_names:
+                    if not file_name.endswith(".py"):
+                        continue
+
+                    file_count += 1
+                    if file_count > PyRockConstants.PROJECT_INDEX_MAX_FILES:
+                        logger.warning(
+                            f"More than {PyRockConstants.PROJECT_INDEX_MAX_FILES} project files, "
+                            "skipping the rest"
+                        )
+                        return
+                    yield os.path.join(directory_path, file_name)
+
+    def _get_file_index(self, file_path: str) -> Optional[FileIndex]:
+        module_path = self.get_module_path(file_path)
+        if module_path is None:
+            return None
+
+        file_entries: FileEntries = [(module_path, MODULE_KIND)]
+        tree = parse_source(file_path)
+        if tree is None:
+            return file_entries, set()
+
+        for member_name, kind in get_source_members(module_path, file_path, tree).items():
+            file_entries.append((f"{module_path}.{member_name}", kind))
+        return file_entries, get_imported_modules(tree)
+
+    def build(self):
+        start_time = time.perf_counter()
+        with self._lock:
+            self._saved_file_paths = set()
+
+        file_entries: Dict[str, FileEntries] = {}
+        file_imports: Dict[str, Set[str]] = {}
+        # Threads, the plugin host can not start processes, files are
+        # read from disk while others are parsed
+        with ThreadPoolExecutor(max_workers=PyRockConstants.PROJECT_INDEXER_THREADS) as executor:
+            file_paths = list(self._iter_source_files())
+            for file_path, file_index in zip(file_paths, executor.map(self._get_file_index, file_paths)):
+                if file_index is not None:
+                    file_path = os.path.normpath(file_path)
+                    file_entries[file_path], file_imports[file_path] = file_index
+
+        with self._lock:
+            for file_path in self._saved_file_paths:
+                if file_path in self._file_entries:
+                    file_entries[file_path] = self._file_entries[file_path]
+                    file_imports[file_path] = self._file_imports[file_path]
+                else:
+                    file_entries.pop(file_path, None)
+                    file_imports.pop(file_path, None)
+            self._saved_file_paths = None
+            self._file_entries = file_entries
+            self._file_imports = file_imports
+            self._import_index = None
+            self.is_ready = True
+
+        logger.debug(
+            f"Indexed {len(file_entries)} project files in {time.perf_counter() - start_time}"
+        )
+
+    def update_file(self, file_path: str):
+        """
+            Parses again a saved file, a removed file is removed from the index
+        """
+        file_path = os.path.normpath(file_path)
+        file_index = self._get_file_index(file_path) if os.path.isfile(file_path) else None
+
+        with self._lock:
+            if file_index is None:
+                self._file_entries.pop(file_path, None)
+                self._file_imports.pop(file_path, None)
+            else:
+                self._file_entries[file_path], self._file_imports[file_path] = file_index
+            if self._saved_file_paths is not None:
+                self._saved_file_paths.add(file_path)
+            self._import_index = None
+
+    def get_imported_modules(self) -> Set[str]:
+        """
+            Top level modules imported by the project, but not part of it
+        """
+        with self._lock:
+            imported_modules: Set[str] = set().union(*self._file_imports.values())
+            project_modules = {
+                import_path.split('.')[0]
+                for entries in self._file_entries.values()
+                for import_path, _ in entries[:1]
+            }
+        return imported_modules - project_modules
+
+    def get_import_index(self) -> JsonImportIndex:
+        with self._lock:
+            if self._import_index is None:
+                imports_map: Dict[str, List[str]] = {}
+                path_kinds: Dict[str, str] = {}
+                for entries in self._file_entries.values():
+                    for import_path, kind in entries:
+                        if import_path in path_kinds:
+                            continue
+                        imports_map.setdefault(get_symbol_name(import_path), []).append(import_path)
+                        path_kinds[import_path] = kind
+                self._import_index = JsonImportIndex(imports_map, path_kinds)
+            return self._import_index
+
+
+class ProjectIndexCache:
+    """
+        Keeps a project index per window, built in background and built
+        again when the folders of the window or the source roots change
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._project_indexes: Dict[int, ProjectIndex] = {}
+
+    def _get_project_index(self, window) -> Optional[ProjectIndex]:
+        folders = [os.path.normpath(folder) for folder in window.folders()]
+        if not folders:
+            return None
+
+        source_roots = PyRockSettings().PROJECT_SOURCE_ROOTS.value
+        with self._lock:
+            project_index = self._project_indexes.get(window.id())
+            if project_index is not None and project_index.folders == folders and (
+                project_index.source_root_settings == source_roots
+            ):
+                return project_index
+
+            project_index = ProjectIndex(folders, source_roots)
+            self._project_indexes[window.id()] = project_index
+
+        logger.debug(f"Building project index of {folders}")
+        threading.Thread(target=project_index.build, daemon=True).start()
+        return project_index
+
+    def get_import_index(self, window) -> Optional[JsonImportIndex]:
+        """
+            Index of the window project, None until it is built
+        """
+        project_index = self._get_project_index(window)
+        if project_index is None or not project_index.is_ready:
+            return None
+        return project_index.get_import_index()
+
+    def get_imported_modules(self, window) -> Set[str]:
+        """
+            Top level modules the window project imports, empty until the
+            project index is built
+        """
+        project_index = self._get_project_index(window)
+        if project_index is None or not project_index.is_ready:
+            return set()
+        return project_index.get_imported_modules()
+
+    def warm_up(self, window):
+        self._get_project_index(window)
+
+    def on_file_saved(self, window, file_path: str):
+        project_index = self._get_project_index(window)
+        if project_index is not None:
+            project_index.update_file(file_path)
+
+
+project_index_cache = ProjectIndexCache()
@@ -0,0 +1,161 @@
+import re
+import sys
+import hashlib
+import inspect
+import platform
+import logging
+from typing import Dict, List, NamedTuple, Optional, Set
+
+try:
+    from importlib import metadata
+except ImportError:
+    # Python < 3.8, everything gets indexed as part of the python distribution
+    metadata = None
+
+
+logger = logging.getLogger(__name__)
+
+
+# Pseudo distribution owning every module which is not installed by
+# any distribution, like the standard library and loose modules
+PYTHON_DISTRIBUTION_NAME = "__python__"
+
+# Pseudo distribution owning the standard library modules, indexed once
+# per python build
+STDLIB_DISTRIBUTION_NAME = "__stdlib__"
+
+
+class DistributionInfo(NamedTuple):
+    name: str
+    version: str
+    record_hash: str
+    modules: List[str]
+
+
+def normalize_distribution_name(name: str) -> str:
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def _hash_text(text: str) -> str:
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def _get_record_hash(distribution) -> str:
+    for record_file_name in ('RECORD', 'installed-files.txt', 'SOURCES.txt'):
+        try:
+            record = distribution.read_text(record_file_name)
+        except Exception:
+            record = None
+        if record:
+            return _hash_text(record)
+    return ""
+
+
+def _get_top_level_modules(distribution) -> Set[str]:
+    try:
+        top_level = distribution.read_text('top_level.txt')
+    except Exception:
+        top_level = None
+
+    if top_level:
+        return {
+            line.strip().replace('/', '.').split('.')[0]
+            for line in top_level.splitlines() if line.strip()
+        }
+
+    modules: Set[str] = set()
+    try:
+        files = distribution.files or []
+    except Exception:
+        files = []
+
+    for file in files:
+        parts = file.parts
+        if not parts or parts[0] in ('..', '__pycache__'):
+            continue
+
+        if len(parts) == 1:
+            module_name = inspect.getmodulename(parts[0])
+            if module_name and module_name != '__init__':
+                modules.add(module_name)
+        elif not parts[0].endswith(('.dist-info', '.egg-info', '.data')):
+            modules.add(parts[0])
+
+    return modules
+
+
+def read_installed_distributions() -> List[DistributionInfo]:
+    """
+        Every installed distribution with all the top level modules it
+        declares, importable or not
+    """
+    distributions: Dict[str, DistributionInfo] = {}
+
+    for distribution in (metadata.distributions() if metadata else []):
+        try:
+            name = normalize_distribution_name(distribution.metadata['Name'])
+            version = distribution.version
+        except Exception:
+            continue
+
+        # First one found in sys.path wins, same as the import system
+        if not name or name in distributions:
+            continue
+
+        distributions[name] = DistributionInfo(
+            name=name,
+            version=version,
+            record_hash=_get_record_hash(distribution),
+            modules=sorted(_get_top_level_modules(distribution)),
+        )
+
+    return list(distributions.values())
+
+
+def get_installed_distributions(
+    system_module_names: Set[str],
+    installed_distributions: Optional[List[DistributionInfo]] = None,
+    stdlib_module_names: Optional[Set[str]] = None,
+    stdlib_path: str = "",
+) -> Dict[str, DistributionInfo]:
+    """
+        Maps every importable top level module to the distributions that
+        installed it, the standard library modules are owned by the stdlib
+        pseudo distribution and the modules without any distribution by
+        the python pseudo distribution
+    """
+    if installed_distributions is None:
+        installed_distributions = read_installed_distributions()
+
+    stdlib_module_names = stdlib_module_names or set()
+    distributions: Dict[str, DistributionInfo] = {}
+    owned_modules: Set[str] = set(stdlib_module_names)
+
+    for distribution in installed_distributions:
+        # A backport shadowed by the standard library is never imported
+        modules = [
+            module_name for module_name in distribution.modules
+            if module_name in system_module_names and module_name not in stdlib_module_names
+        ]
+        distributions[distribution.name] = distribution._replace(modules=modules)
+        owned_modules.update(modules)
+
+    if stdlib_module_names:
+        stdlib_modules = sorted(stdlib_module_names)
+        distributions[STDLIB_DISTRIBUTION_NAME] = DistributionInfo(
+            name=STDLIB_DISTRIBUTION_NAME,
+            version=platform.python_version(),
+            # Version string has the build too, patched builds differ
+            record_hash=_hash_text("\n".join([sys.version, stdlib_path, *stdlib_modules])),
+            modules=stdlib_modules,
+        )
+
+    unowned_modules = sorted(system_module_names - owned_modules)
+    distributions[PYTHON_DISTRIBUTION_NAME] = DistributionInfo(
+        name=PYTHON_DISTRIBUTION_NAME,
+        version=platform.python_version(),
+        record_hash=_hash_text(sys.version + "\n".join(unowned_modules)),
+        modules=unowned_modules,
+    )
+
+    return distributions
@@ -0,0 +1,117 @@
+import os
+import sys
+import socket
+import threading
+import subprocess
+from typing import Any, Callable, List, Tuple
+
+
+_MISSING = object()
+
+
+class SandboxViolation(OSError):
+    """
+        Raised by the blocked calls, an OSError so the packages which
+        already expect the network or a command to fail go on importing
+    """
+
+
+class ImportSandbox:
+    """
+        Imports run inside it can't reach the network, start processes or
+        start threads, those calls fail right away instead of slowing down
+        indexing. Anything written to stdout/stderr, including by compiled
+        code writing to the file descriptors, goes to the null device.
+
+        Usage:
+            with ImportSandbox() as sandbox:
+                importlib.import_module(module_name)
+            sandbox.blocked_calls
+    """
+
+    def __init__(self):
+        self.blocked_calls: List[str] = []
+        self._patches: List[Tuple[Any, str, Any]] = []
+        self._stdout = None
+        self._stderr = None
+        self._null_file = None
+        self._saved_fds: List[Tuple[int, int]] = []
+
+    def _get_blocked_calls(self) -> List[Tuple[Any, str, str]]:
+        return [
+            (socket, 'getaddrinfo', "socket.getaddrinfo"),
+            (socket, 'gethostbyname', "socket.gethostbyname"),
+            (socket, 'gethostbyname_ex', "socket.gethostbyname_ex"),
+            (socket, 'gethostbyaddr', "socket.gethostbyaddr"),
+            (socket, 'create_connection', "socket.create_connection"),
+            (socket.socket, 'connect', "socket.connect"),
+            (socket.socket, 'connect_ex', "socket.connect_ex"),
+            # Every way of starting a process with subprocess ends up here
+            (subprocess.Popen, '_execute_child', "subprocess.Popen"),
+            (os, 'system', "os.system"),
+            (threading.Thread, 'start', "threading.Thread.start"),
+        ]
+
+    def _get_fake(self, call_name: str) -> Callable:
+        def blocked_call(*args, **kwargs):
+            self.blocked_calls.append(call_name)
+            raise SandboxViolation(f"{call_name} is blocked while indexing")
+        return blocked_call
+
+    def _patch(self):
+        for owner, attribute_name, call_name in self._get_blocked_calls():
+            # Methods can be inherited from a compiled base class, those are
+            # deleted again instead of being set on the subclass
+            original = vars(owner).get(attribute_name, _MISSING)
+            self._patches.append((owner, attribute_name, original))
+            setattr(owner, attribute_name, self._get_fake(call_name))
+
+    def _unpatch(self):
+        for owner, attribute_name, original in reversed(self._patches):
+            if original is _MISSING:
+                delattr(owner, attribute_name)
+            else:
+                setattr(owner, attribute_name, original)
+        self._patches = []
+
+    def _redirect_output(self):
+        self._stdout, self._stderr = sys.stdout, sys.stderr
+        self._null_file = open(os.devnull, 'w')
+        sys.stdout = sys.stderr = self._null_file
+
+        for stream in (sys.__stdout__, sys.__stderr__):
+            if stream is None:
+                continue
+            try:
+                stream.flush()
+                fd = stream.fileno()
+                self._saved_fds.append((fd, os.dup(fd)))
+                os.dup2(self._null_file.fileno(), fd)
+            except (OSError, ValueError):
+                continue
+
+    def _restore_output(self):
+        # Text buffered by the packages must not reach the real streams
+        for stream in (sys.__stdout__, sys.__stderr__):
+            try:
+                if stream is not None:
+                    stream.flush()
+            except (OSError, ValueError):
+                pass
+
+        for fd, saved_fd in reversed(self._saved_fds):
+            os.dup2(saved_fd, fd)
+            os.close(saved_fd)
+        self._saved_fds = []
+
+        sys.stdout, sys.stderr = self._stdout, self._stderr
+        self._null_file.close()
+
+    def __enter__(self) -> 'ImportSandbox':
+        self._redirect_output()
+        self._patch()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._unpatch()
+        self._restore_output()
@@ -0,0 +1,1274 @@
+'''
+    Import index file formats, shared by the indexer script which writes
+    the index and the plugin which reads it, so it must not depend on sublime
+'''
+import os
+import re
+import sys
+import json
+import mmap
+import zlib
+import heapq
+import struct
+from array import array
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from typing import Callable, Collection, Dict, Iterable, Iterator, IO, List, Optional, Set, Tuple, Union
+
+
+BINARY_INDEX_MAGIC = b'PYRKIDX\x00'
+# First version to be released, the ones before it never were and their
+# numbers are not reused, files of any of them are built again
+BINARY_INDEX_VERSION = 7
+
+# Header is the magic, the version and then these fields
+HEADER_FIELDS = (
+    'symbol_count',
+    'path_count',
+    # Sections offsets
+    'symbols_offset',
+    'names_offset',
+    'postings_offset',
+    'paths_offset',
+    'path_data_offset',
+    # Exact symbol name hash table
+    'hash_table_offset',
+    'hash_table_size',
+    # Case folded symbol name groups and their hash table
+    'folded_count',
+    'folded_table_offset',
+    'folded_postings_offset',
+    'folded_hash_table_offset',
+    'folded_hash_table_size',
+    # Symbol indexes sorted by name length and lower cased name, path ids
+    # sorted by dot count, length and lower cased path, for prefix searches
+    'folded_sorted_symbols_offset',
+    'folded_sorted_paths_offset',
+    # Trigrams and camel humps of the folded names, for fuzzy searches
+    'trigram_count',
+    'trigram_table_offset',
+    'trigram_postings_offset',
+    'camel_hump_count',
+    'camel_hump_table_offset',
+    'camel_hump_postings_offset',
+    # Kind of every path, one byte per path id
+    'path_kinds_offset',
+    # Json metadata, producer and interpreter of the index
+    'metadata_offset',
+    'metadata_length',
+    # crc32 of everything after the header
+    'checksum',
+)
+# Fields of the headers of the previous versions still migrated
+HEADER_FIELDS_BY_VERSION: Dict[int, Tuple[str, ...]] = {
+    BINARY_INDEX_VERSION: HEADER_FIELDS,
+}
+HEADER_PREFIX = struct.Struct('<8sI')
+HEADER = struct.Struct('<8sI' + 'I' * len(HEADER_FIELDS))
+# name offset, name length, postings offset, postings count
+SYMBOL_ENTRY = struct.Struct('<IIII')
+# path data offset, path length
+PATH_ENTRY = struct.Struct('<II')
+# folded postings offset, folded postings count
+FOLDED_ENTRY = struct.Struct('<II')
+# key hash, postings offset, postings count, sorted by key hash
+KEY_ENTRY = struct.Struct('<III')
+UINT32 = struct.Struct('<I')
+
+# Hash table slots hold the entry index + 1, zero marks an empty slot
+EMPTY_SLOT = 0
+
+# Max candidates of the same length looked at by a prefix search, so short
+# prefixes matching a big part of the index still answer in bounded time.
+# Candidates are scanned shortest first, so only the ties past it are lost.
+PREFIX_SCAN_LIMIT = 2000
+
+# Folded names sharing the most trigrams with the query are scored,
+# the rest can't get a better similarity
+FUZZY_CANDIDATES_LIMIT = 200
+# Min similarity of a fuzzy match, between 0 and 1
+FUZZY_SIMILARITY_THRESHOLD = 0.3
+# Similarity given to a name whose camel hump initials are the query
+CAMEL_HUMP_SIMILARITY = 0.9
+
+CAMEL_HUMP_WORD_PATTERN = re.compile(r'[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+')
+
+
+# Kinds of the indexed symbols, stored as their position in SYMBOL_KINDS
+UNKNOWN_KIND = "symbol"
+MODULE_KIND = "module"
+CLASS_KIND = "class"
+FUNCTION_KIND = "function"
+BUILTIN_KIND = "builtin"
+# Typing aliases, like `typing.List`
+ALIAS_KIND = "alias"
+SYMBOL_KINDS = (UNKNOWN_KIND, MODULE_KIND, CLASS_KIND, FUNCTION_KIND, BUILTIN_KIND, ALIAS_KIND)
+SYMBOL_KIND_IDS: Dict[str, int] = {kind: kind_id for kind_id, kind in enumerate(SYMBOL_KINDS)}
+
+# Import path with the kind of its symbol
+ImportEntry = Tuple[str, str]
+
+# Json index holds `{"header": header, "imports": imports_map, "kinds": path_kinds}`,
+# first version to be released, like BINARY_INDEX_VERSION. Files without header,
+# like the buckets of symbol initials written before the index was
+# versioned, are built again.
+JSON_INDEX_VERSION = 3
+
+# Bytes read at once while checksumming an index file
+CHECKSUM_CHUNK_SIZE = 1024 * 1024
+
+
+# File path, modification time in ns, size and inode of the file telling
+# readers a new index generation is complete
+IndexSignature = Tuple[str, int, int, int]
+
+
+class InvalidIndexFile(Exception):
+    pass
+
+
+@contextmanager
+def write_file_atomically(file_path: str, mode: str = 'w') -> Iterator[IO]:
+    """
+        Writes a temp file next to `file_path` and replaces it once
+        synced to disk, readers only ever see a complete file
+    """
+    temp_path = f"{file_path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, mode) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, file_path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def read_index_generation(generation_file_path: str) -> int:
+    try:
+        with open(generation_file_path, 'r') as f:
+            return int(f.read().strip() or 0)
+    except (OSError, ValueError):
+        return 0
+
+
+def write_index_generation(generation_file_path: str) -> int:
+    """
+        Bumped once the index files of a re-index are all in place, so
+        readers load them together, returns the new generation
+    """
+    generation = read_index_generation(generation_file_path) + 1
+    with write_file_atomically(generation_file_path) as f:
+        f.write(str(generation))
+    return generation
+
+
+def get_snapshot_path(file_path: str, generation: int) -> str:
+    """
+        File of the index of a generation, like `py_rock_imports.3.idx`.
+        Every generation gets its own file, readers keep the previous ones
+        mapped and windows doesn't replace a mapped file. Generation 0,
+        before any re-index completed, is the file itself.
+    """
+    if generation <= 0:
+        return file_path
+    root, extension = os.path.splitext(file_path)
+    return f"{root}.{generation}{extension}"
+
+
+def remove_previous_snapshots(file_path: str, generation: int):
+    """
+        Removes the files of the generations before `generation`, the ones
+        a reader still has mapped on windows are left for a later run
+    """
+    directory_path, file_name = os.path.split(file_path)
+    root, extension = os.path.splitext(file_name)
+    snapshot_pattern = re.compile(rf"{re.escape(root)}\.(\d+){re.escape(extension)}$")
+
+    try:
+        file_names = os.listdir(directory_path)
+    except OSError:
+        return
+
+    for snapshot_file_name in file_names:
+        match = snapshot_pattern.match(snapshot_file_name)
+        if (snapshot_file_name == file_name and generation > 0) or (match and int(match.group(1)) < generation):
+            try:
+                os.remove(os.path.join(directory_path, snapshot_file_name))
+            except OSError:
+                pass
+
+
+def get_index_signature(file_path: str, generation_file_path: str) -> Optional[IndexSignature]:
+    """
+        Changes only when a new index generation is complete. Indexes
+        written before the generations were kept are signed by their own file.
+    """
+    if not os.path.exists(file_path):
+        return None
+
+    for signed_file_path in (generation_file_path, file_path):
+        try:
+            stat = os.stat(signed_file_path)
+        except OSError:
+            continue
+        return file_path, stat.st_mtime_ns, stat.st_size, stat.st_ino
+    return None
+
+
+def get_symbol_name(import_path: str) -> str:
+    return import_path.rsplit('.', 1)[-1]
+
+
+def hash_symbol_name(symbol_name: bytes) -> int:
+    # crc32 is stable across processes unlike hash()
+    return zlib.crc32(symbol_name)
+
+
+def get_trigrams(folded_name: str) -> Set[str]:
+    # Padding gives the start and end of the name their own trigrams,
+    # and short names at least one trigram
+    padded_name = f"  {folded_name} "
+    return {padded_name[index:index + 3] for index in range(len(padded_name) - 2)}
+
+
+def get_camel_humps(symbol_name: str) -> str:
+    """
+        Lower cased initials of the words of the name, like `hrr` for
+        `HttpResponseRedirect` and `goo4` for `get_object_or_404`
+    """
+    return ''.join(word[0] for word in CAMEL_HUMP_WORD_PATTERN.findall(symbol_name)).lower()
+
+
+def get_trigram_similarity(query_trigrams: Set[str], folded_name: str) -> float:
+    name_trigrams = get_trigrams(folded_name)
+    shared_count = len(query_trigrams & name_trigrams)
+    return shared_count / (len(query_trigrams) + len(name_trigrams) - shared_count)
+
+
+def rank_fuzzy_matches(
+    query: str,
+    trigram_counts: Counter,
+    camel_hump_names: Iterable[str],
+    limit: int,
+) -> List[str]:
+    """
+        Scores the folded names sharing the most trigrams with the query
+        and the ones whose camel humps are the query, returns the best
+        `limit` folded names by similarity
+    """
+    query_trigrams = get_trigrams(query.lower())
+    similarities: Dict[str, float] = {}
+
+    for folded_name, _ in trigram_counts.most_common(FUZZY_CANDIDATES_LIMIT):
+        similarity = get_trigram_similarity(query_trigrams, folded_name)
+        if similarity >= FUZZY_SIMILARITY_THRESHOLD:
+            similarities[folded_name] = similarity
+
+    for folded_name in camel_hump_names:
+        similarities[folded_name] = max(similarities.get(folded_name, 0), CAMEL_HUMP_SIMILARITY)
+
+    return heapq.nsmallest(
+        limit,
+        similarities.keys(),
+        key=lambda folded_name: (-similarities[folded_name], len(folded_name), folded_name),
+    )
+
+
+def get_symbol_sort_key(symbol_name: str) -> Tuple[int, str]:
+    return len(symbol_name), symbol_name.lower()
+
+
+def get_path_sort_key(import_path: str) -> Tuple[int, int, str]:
+    return import_path.count('.'), len(import_path), import_path.lower()
+
+
+def scan_prefix_buckets(
+    count: int,
+    get_sort_key: Callable[[int], Tuple],
+    first_bucket: Tuple[int, ...],
+    folded_prefix: str,
+    collect: Callable[[int], int],
+    limit: int,
+):
+    """
+        Entries are sorted by their bucket, the sort key without its last
+        part, then by their lower cased text. Buckets are in the order the
+        prefix matches are ranked, shorter names and shallower paths first,
+        so entries starting with the prefix are collected bucket by bucket
+        until a bucket ends with `limit` import paths collected, no entry
+        of the next buckets can rank higher. `collect` returns the count of
+        import paths it collected for the entry at the position.
+    """
+    bucket = first_bucket
+    position = 0
+    collected = 0
+
+    while True:
+        low, high = position, count
+        target = (*bucket, folded_prefix)
+        while low < high:
+            middle = (low + high) // 2
+            if get_sort_key(middle) < target:
+                low = middle + 1
+            else:
+                high = middle
+        position = low
+        if position >= count:
+            return
+
+        sort_key = get_sort_key(position)
+        if sort_key[:-1] != bucket:
+            # Nothing in the bucket, the next one having entries is looked
+            # at, from the shortest length that can match
+            next_bucket = sort_key[:-1]
+            if next_bucket[:-1] != bucket[:-1]:
+                next_bucket = (*next_bucket[:-1], max(next_bucket[-1], first_bucket[-1]))
+            bucket = next_bucket
+            continue
+
+        scanned = 0
+        while sort_key[:-1] == bucket and sort_key[-1].startswith(folded_prefix) and scanned < PREFIX_SCAN_LIMIT:
+            collected += collect(position)
+            position += 1
+            scanned += 1
+            if position >= count:
+                return
+            sort_key = get_sort_key(position)
+
+        if collected >= limit:
+            return
+        bucket = (*bucket[:-1], bucket[-1] + 1)
+
+
+def _get_hash_table_size(entry_count: int) -> int:
+    # Power of two with at most 50% load, so probing stays short
+    size = 1
+    while size < entry_count * 2:
+        size *= 2
+    return size
+
+
+def _build_hash_table(hashes: List[int]) -> array:
+    size = _get_hash_table_size(len(hashes))
+    mask = size - 1
+    hash_table = array('I', [EMPTY_SLOT]) * size
+
+    for entry_index, entry_hash in enumerate(hashes):
+        slot = entry_hash & mask
+        while hash_table[slot] != EMPTY_SLOT:
+            slot = (slot + 1) & mask
+        hash_table[slot] = entry_index + 1
+
+    return hash_table
+
+
+def _to_little_endian_bytes(values: array) -> bytes:
+    if sys.byteorder != 'little':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _build_key_table(key_postings: Dict[str, List[int]]) -> Tuple[bytearray, array]:
+    """
+        Table of the keys sorted by their hash, each pointing to its run
+        of postings, keys with the same hash are merged in one entry
+    """
+    hash_postings: Dict[int, List[int]] = defaultdict(list)
+    for key, key_postings_list in key_postings.items():
+        hash_postings[hash_symbol_name(key.encode('utf-8'))].extend(key_postings_list)
+
+    key_table = bytearray()
+    postings = array('I')
+    for key_hash in sorted(hash_postings.keys()):
+        key_table += KEY_ENTRY.pack(key_hash, len(postings), len(hash_postings[key_hash]))
+        postings.extend(hash_postings[key_hash])
+
+    return key_table, postings
+
+
+class BinaryImportIndexWriter:
+    """
+        Writes the binary index, layout of the file is:
+
+        header | symbol table | symbol names | postings | path table | path data
+        | hash table | folded table | folded postings | folded hash table
+        | folded sorted symbols | folded sorted paths | trigram table
+        | trigram postings | camel hump table | camel hump postings | path kinds
+        | metadata
+
+        Symbol table is sorted by symbol name, every symbol points to a run
+        of postings, which are ids into the path table, every unique import
+        path is stored only once. Hash table maps the exact symbol name to
+        its symbol entry. Symbols with the same lower cased name are grouped
+        in the folded table for case insensitive lookups. Sorted symbols
+        and paths are binary searched for case insensitive prefix searches.
+        Trigrams and camel humps point to the folded groups having them,
+        for fuzzy searches. Kinds of the paths are bytes indexed by path id.
+
+        Entries are read once as a stream, but every section is built in
+        memory before the file is written, the sections point into each
+        other and the hash tables are sized by the number of symbols.
+    """
+
+    def write(self, file_path: str, import_entries: Iterable[ImportEntry], metadata: Optional[Dict] = None):
+        path_ids: Dict[str, int] = {}
+        symbol_path_ids: Dict[str, List[int]] = defaultdict(list)
+        path_kinds = bytearray()
+
+        for import_path, kind in import_entries:
+            if import_path in path_ids:
+                continue
+            path_id = len(path_ids)
+            path_ids[import_path] = path_id
+            symbol_path_ids[get_symbol_name(import_path)].append(path_id)
+            path_kinds.append(SYMBOL_KIND_IDS.get(kind, SYMBOL_KIND_IDS[UNKNOWN_KIND]))
+
+        # Python orders str by code point, which is the same as utf-8 byte order
+        symbol_names: List[str] = sorted(symbol_path_ids.keys())
+
+        symbol_table = bytearray()
+        symbol_names_data = bytearray()
+        postings = array('I')
+        symbol_hashes: List[int] = []
+        folded_symbol_indexes: Dict[str, List[int]] = defaultdict(list)
+
+        for symbol_index, symbol_name in enumerate(symbol_names):
+            encoded_name = symbol_name.encode('utf-8')
+            symbol_table += SYMBOL_ENTRY.pack(
+                len(symbol_names_data),
+                len(encoded_name),
+                len(postings),
+                len(symbol_path_ids[symbol_name]),
+            )
+            symbol_names_data += encoded_name
+            postings.extend(symbol_path_ids[symbol_name])
+            symbol_hashes.append(hash_symbol_name(encoded_name))
+            folded_symbol_indexes[symbol_name.lower()].append(symbol_index)
+
+        path_table = bytearray()
+        path_data = bytearray()
+
+        # dict keeps the insertion order, which is the path id order
+        for import_path in path_ids:
+            encoded_path = import_path.encode('utf-8')
+            path_table += PATH_ENTRY.pack(len(path_data), len(encoded_path))
+            path_data += encoded_path
+
+        folded_table = bytearray()
+        folded_postings = array('I')
+        folded_hashes: List[int] = []
+        trigram_folded_indexes: Dict[str, List[int]] = defaultdict(list)
+        camel_hump_folded_indexes: Dict[str, List[int]] = defaultdict(list)
+
+        for folded_index, (folded_name, symbol_indexes) in enumerate(folded_symbol_indexes.items()):
+            folded_table += FOLDED_ENTRY.pack(len(folded_postings), len(symbol_indexes))
+            folded_postings.extend(symbol_indexes)
+            folded_hashes.append(hash_symbol_name(folded_name.encode('utf-8')))
+
+            for trigram in get_trigrams(folded_name):
+                trigram_folded_indexes[trigram].append(folded_index)
+
+            camel_humps: Set[str] = {
+                get_camel_humps(symbol_names[symbol_index]) for symbol_index in symbol_indexes
+            }
+            for camel_hump in camel_humps:
+                # Single word names have a single initial, not worth a lookup
+                if len(camel_hump) > 1:
+                    camel_hump_folded_indexes[camel_hump].append(folded_index)
+
+        trigram_table, trigram_postings = _build_key_table(trigram_folded_indexes)
+        camel_hump_table, camel_hump_postings = _build_key_table(camel_hump_folded_indexes)
+
+        hash_table = _build_hash_table(symbol_hashes)
+        folded_hash_table = _build_hash_table(folded_hashes)
+
+        # In the order prefix matches are ranked, see `scan_prefix_buckets`
+        folded_sorted_symbols = array('I', sorted(
+            range(len(symbol_names)),
+            key=lambda symbol_index: get_symbol_sort_key(symbol_names[symbol_index]),
+        ))
+        folded_sorted_paths = array('I', (
+            path_id for _, path_id in sorted(
+                (get_path_sort_key(import_path), path_id) for import_path, path_id in path_ids.items()
+            )
+        ))
+
+        sections = [
+            ('symbols_offset', symbol_table),
+            ('names_offset', symbol_names_data),
+            ('postings_offset', _to_little_endian_bytes(postings)),
+            ('paths_offset', path_table),
+            ('path_data_offset', path_data),
+            ('hash_table_offset', _to_little_endian_bytes(hash_table)),
+            ('folded_table_offset', folded_table),
+            ('folded_postings_offset', _to_little_endian_bytes(folded_postings)),
+            ('folded_hash_table_offset', _to_little_endian_bytes(folded_hash_table)),
+            ('folded_sorted_symbols_offset', _to_little_endian_bytes(folded_sorted_symbols)),
+            ('folded_sorted_paths_offset', _to_little_endian_bytes(folded_sorted_paths)),
+            ('trigram_table_offset', trigram_table),
+            ('trigram_postings_offset', _to_little_endian_bytes(trigram_postings)),
+            ('camel_hump_table_offset', camel_hump_table),
+            ('camel_hump_postings_offset', _to_little_endian_bytes(camel_hump_postings)),
+            ('path_kinds_offset', path_kinds),
+        ]
+
+        header_values: Dict[str, int] = {
+            'symbol_count': len(symbol_names),
+            'path_count': len(path_ids),
+            'hash_table_size': len(hash_table),
+            'folded_count': len(folded_hashes),
+            'folded_hash_table_size': len(folded_hash_table),
+            'trigram_count': len(trigram_table) // KEY_ENTRY.size,
+            'camel_hump_count': len(camel_hump_table) // KEY_ENTRY.size,
+        }
+
+        offset = HEADER.size
+        for offset_field, section in sections:
+            header_values[offset_field] = offset
+            offset += len(section)
+
+        _write_binary_index(
+            file_path, header_values, [section for _, section in sections], offset, metadata or {}
+        )
+
+
+def _write_binary_index(
+    file_path: str,
+    header_values: Dict[str, int],
+    body: List[bytes],
+    metadata_offset: int,
+    metadata: Dict,
+):
+    """
+        Writes the header and the sections of the body, followed by the
+        metadata, `metadata_offset` is where the sections end
+    """
+    encoded_metadata = json.dumps(metadata).encode('utf-8')
+    checksum = 0
+    for section in body:
+        checksum = zlib.crc32(section, checksum)
+
+    header_values = {
+        **header_values,
+        'metadata_offset': metadata_offset,
+        'metadata_length': len(encoded_metadata),
+        'checksum': zlib.crc32(encoded_metadata, checksum),
+    }
+    header = HEADER.pack(
+        BINARY_INDEX_MAGIC,
+        BINARY_INDEX_VERSION,
+        *[header_values[field] for field in HEADER_FIELDS]
+    )
+
+    with write_file_atomically(file_path, 'wb') as f:
+        f.write(header)
+        for section in body:
+            f.write(section)
+        f.write(encoded_metadata)
+
+
+def read_binary_index_header(data, file_path: str) -> Tuple[int, Dict[str, int], int]:
+    """
+        Version, header fields and header size of a binary index of any
+        version still migrated
+    """
+    if len(data) < HEADER_PREFIX.size:
+        raise InvalidIndexFile(f"Truncated index file {file_path}")
+
+    magic, version = HEADER_PREFIX.unpack_from(data, 0)
+    if magic != BINARY_INDEX_MAGIC or version not in HEADER_FIELDS_BY_VERSION:
+        raise InvalidIndexFile(f"Unsupported index file {file_path}")
+
+    header_fields = HEADER_FIELDS_BY_VERSION[version]
+    header_size = HEADER_PREFIX.size + UINT32.size * len(header_fields)
+    if len(data) < header_size:
+        raise InvalidIndexFile(f"Truncated index file {file_path}")
+
+    header: Dict[str, int] = dict(zip(
+        header_fields,
+        struct.unpack_from(f'<{len(header_fields)}I', data, HEADER_PREFIX.size),
+    ))
+    return version, header, header_size
+
+
+class BinaryImportIndex:
+    """
+        Reads the binary index through mmap, opening it only parses the
+        header and a lookup probes the hash table and touches only the
+        pages it needs
+    """
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+
+        with open(file_path, 'rb') as f:
+            try:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise InvalidIndexFile(f"Empty index file {file_path}")
+
+        try:
+            self.version, header, self.header_size = read_binary_index_header(self._mmap, file_path)
+            if self.version != BINARY_INDEX_VERSION:
+                # Migrated by the next indexing, see `migrate_index_file`
+                raise InvalidIndexFile(f"Index file {file_path} of previous version {self.version}")
+        except InvalidIndexFile:
+            self._mmap.close()
+            raise
+        self.header = header
+
+        self.symbol_count = header['symbol_count']
+        self.path_count = header['path_count']
+        self._symbols_offset = header['symbols_offset']
+        self._names_offset = header['names_offset']
+        self._postings_offset = header['postings_offset']
+        self._paths_offset = header['paths_offset']
+        self._path_data_offset = header['path_data_offset']
+        self._hash_table_offset = header['hash_table_offset']
+        self._hash_table_mask = header['hash_table_size'] - 1
+        self._folded_table_offset = header['folded_table_offset']
+        self._folded_postings_offset = header['folded_postings_offset']
+        self._folded_hash_table_offset = header['folded_hash_table_offset']
+        self._folded_hash_table_mask = header['folded_hash_table_size'] - 1
+        self._folded_sorted_symbols_offset = header['folded_sorted_symbols_offset']
+        self._folded_sorted_paths_offset = header['folded_sorted_paths_offset']
+        self._trigram_count = header['trigram_count']
+        self._trigram_table_offset = header['trigram_table_offset']
+        self._trigram_postings_offset = header['trigram_postings_offset']
+        self._camel_hump_count = header['camel_hump_count']
+        self._camel_hump_table_offset = header['camel_hump_table_offset']
+        self._camel_hump_postings_offset = header['camel_hump_postings_offset']
+        self._path_kinds_offset = header['path_kinds_offset']
+
+    def close(self):
+        self._mmap.close()
+
+    def get_metadata(self) -> Dict:
+        start = self.header['metadata_offset']
+        try:
+            return json.loads(self._mmap[start:start + self.header['metadata_length']].decode('utf-8'))
+        except ValueError:
+            return {}
+
+    def is_valid(self) -> bool:
+        """
+            Checksums the whole file, not done on open since lookups only
+            touch the pages they need
+        """
+        if self.header['metadata_offset'] + self.header['metadata_length'] != len(self._mmap):
+            return False
+
+        checksum = 0
+        for start in range(self.header_size, len(self._mmap), CHECKSUM_CHUNK_SIZE):
+            checksum = zlib.crc32(self._mmap[start:start + CHECKSUM_CHUNK_SIZE], checksum)
+        return checksum == self.header['checksum']
+
+    def _get_uint32(self, section_offset: int, index: int) -> int:
+        return UINT32.unpack_from(self._mmap, section_offset + index * UINT32.size)[0]
+
+    def _get_uint32_run(self, section_offset: int, start: int, count: int):
+        return struct.unpack_from(f'<{count}I', self._mmap, section_offset + start * UINT32.size)
+
+    def _get_symbol_entry(self, symbol_index: int):
+        return SYMBOL_ENTRY.unpack_from(
+            self._mmap, self._symbols_offset + symbol_index * SYMBOL_ENTRY.size
+        )
+
+    def _get_symbol_name(self, symbol_index: int) -> bytes:
+        name_offset, name_length, _, _ = self._get_symbol_entry(symbol_index)
+        start = self._names_offset + name_offset
+        return self._mmap[start:start + name_length]
+
+    def _get_path(self, path_id: int) -> str:
+        path_offset, path_length = PATH_ENTRY.unpack_from(
+            self._mmap, self._paths_offset + path_id * PATH_ENTRY.size
+        )
+        start = self._path_data_offset + path_offset
+        return self._mmap[start:start + path_length].decode('utf-8')
+
+    def _get_path_kind(self, path_id: int) -> str:
+        kind_id = self._mmap[self._path_kinds_offset + path_id]
+        return SYMBOL_KINDS[kind_id] if kind_id < len(SYMBOL_KINDS) else UNKNOWN_KIND
+
+    def _get_symbol_paths(self, symbol_index: int, kinds: Optional[Collection[str]] = None) -> List[str]:
+        _, _, postings_offset, postings_count = self._get_symbol_entry(symbol_index)
+        path_ids = self._get_uint32_run(self._postings_offset, postings_offset, postings_count)
+        return [
+            self._get_path(path_id) for path_id in path_ids
+            if kinds is None or self._get_path_kind(path_id) in kinds
+        ]
+
+    def _find_symbol(self, symbol_name: bytes) -> int:
+        slot = hash_symbol_name(symbol_name) & self._hash_table_mask
+        while True:
+            entry = self._get_uint32(self._hash_table_offset, slot)
+            if entry == EMPTY_SLOT:
+                return -1
+            if self._get_symbol_name(entry - 1) == symbol_name:
+                return entry - 1
+            slot = (slot + 1) & self._hash_table_mask
+
+    def _get_folded_group(self, folded_index: int) -> Tuple[int, ...]:
+        folded_postings_offset, folded_postings_count = FOLDED_ENTRY.unpack_from(
+            self._mmap, self._folded_table_offset + folded_index * FOLDED_ENTRY.size
+        )
+        return self._get_uint32_run(
+            self._folded_postings_offset, folded_postings_offset, folded_postings_count
+        )
+
+    def _find_folded_symbols(self, folded_name: str) -> List[int]:
+        slot = hash_symbol_name(folded_name.encode('utf-8')) & self._folded_hash_table_mask
+        while True:
+            entry = self._get_uint32(self._folded_hash_table_offset, slot)
+            if entry == EMPTY_SLOT:
+                return []
+
+            symbol_indexes = self._get_folded_group(entry - 1)
+            # All the symbols of a group have the same lower cased name
+            if self._get_symbol_name(symbol_indexes[0]).decode('utf-8').lower() == folded_name:
+                return list(symbol_indexes)
+            slot = (slot + 1) & self._folded_hash_table_mask
+
+    def lookup(
+        self,
+        symbol: str,
+        ignore_case: bool = False,
+        kinds: Optional[Collection[str]] = None,
+    ) -> List[str]:
+        """
+            `kinds` keeps only the paths of these kinds, like `["class"]`
+        """
+        if ignore_case:
+            symbol_indexes = self._find_folded_symbols(symbol.lower())
+        else:
+            symbol_index = self._find_symbol(symbol.encode('utf-8'))
+            symbol_indexes = [symbol_index] if symbol_index >= 0 else []
+
+        import_paths: List[str] = []
+        for symbol_index in symbol_indexes:
+            import_paths.extend(self._get_symbol_paths(symbol_index, kinds))
+        return import_paths
+
+    def _get_folded_symbol_name(self, symbol_index: int) -> str:
+        return self._get_symbol_name(symbol_index).decode('utf-8').lower()
+
+    def _get_symbol_prefix_matches(
+        self,
+        prefix: str,
+        limit: int,
+        kinds: Optional[Collection[str]] = None,
+    ) -> List[str]:
+        import_paths: List[str] = []
+
+        def get_sort_key(position: int) -> Tuple[int, str]:
+            symbol_index = self._get_uint32(self._folded_sorted_symbols_offset, position)
+            return get_symbol_sort_key(self._get_symbol_name(symbol_index).decode('utf-8'))
+
+        def collect(position: int) -> int:
+            symbol_index = self._get_uint32(self._folded_sorted_symbols_offset, position)
+            symbol_paths = self._get_symbol_paths(symbol_index, kinds)
+            import_paths.extend(symbol_paths)
+            return len(symbol_paths)
+
+        scan_prefix_buckets(
+            self.symbol_count, get_sort_key, (len(prefix),), prefix.lower(), collect, limit
+        )
+        return import_paths
+
+    def _get_path_prefix_matches(
+        self,
+        prefix: str,
+        limit: int,
+        kinds: Optional[Collection[str]] = None,
+    ) -> List[str]:
+        import_paths: List[str] = []
+
+        def get_sort_key(position: int) -> Tuple[int, int, str]:
+            path_id = self._get_uint32(self._folded_sorted_paths_offset, position)
+            return get_path_sort_key(self._get_path(path_id))
+
+        def collect(position: int) -> int:
+            path_id = self._get_uint32(self._folded_sorted_paths_offset, position)
+            if kinds is not None and self._get_path_kind(path_id) not in kinds:
+                return 0
+            import_paths.append(self._get_path(path_id))
+            return 1
+
+        scan_prefix_buckets(
+            self.path_count, get_sort_key, (prefix.count('.'), len(prefix)), prefix.lower(), collect, limit
+        )
+        return import_paths
+
+    def prefix_search(
+        self,
+        prefix: str,
+        limit: int,
+        kinds: Optional[Collection[str]] = None,
+    ) -> List[str]:
+        # Dotted prefix is matched against the full import path
+        if '.' in prefix:
+            candidates = self._get_path_prefix_matches(prefix, limit, kinds)
+        else:
+            candidates = self._get_symbol_prefix_matches(prefix, limit, kinds)
+
+        return rank_prefix_matches(prefix, candidates, limit)
+
+    def _get_key_postings(
+        self,
+        table_offset: int,
+        postings_offset: int,
+        count: int,
+        key: str,
+    ) -> Tuple[int, ...]:
+        key_hash = hash_symbol_name(key.encode('utf-8'))
+
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            entry_hash, entry_postings_offset, entry_postings_count = KEY_ENTRY.unpack_from(
+                self._mmap, table_offset + middle * KEY_ENTRY.size
+            )
+            if entry_hash == key_hash:
+                return self._get_uint32_run(postings_offset, entry_postings_offset, entry_postings_count)
+            if entry_hash < key_hash:
+                low = middle + 1
+            else:
+                high = middle
+        return ()
+
+    def fuzzy_search(
+        self,
+        query: str,
+        limit: int,
+        kinds: Optional[Collection[str]] = None,
+    ) -> List[str]:
+        folded_query = query.lower()
+        folded_names: Dict[int, str] = {}
+
+        def get_folded_name(folded_index: int) -> str:
+            if folded_index not in folded_names:
+                folded_names[folded_index] = self._get_folded_symbol_name(
+                    self._get_folded_group(folded_index)[0]
+                )
+            return folded_names[folded_index]
+
+        folded_index_counts: Counter = Counter()
+        for trigram in get_trigrams(folded_query):
+            folded_index_counts.update(self._get_key_postings(
+                self._trigram_table_offset,
+                self._trigram_postings_offset,
+                self._trigram_count,
+                trigram,
+            ))
+
+        trigram_counts: Counter = Counter({
+            get_folded_name(folded_index): count
+            for folded_index, count in folded_index_counts.most_common(FUZZY_CANDIDATES_LIMIT)
+        })
+
+        # Keys are hashed, so the camel humps are checked again
+        camel_hump_folded_indexes: Dict[str, int] = {}
+        for folded_index in self._get_key_postings(
+            self._camel_hump_table_offset,
+            self._camel_hump_postings_offset,
+            self._camel_hump_count,
+            folded_query,
+        ):
+            symbol_indexes = self._get_folded_group(folded_index)
+            if any(
+                get_camel_humps(self._get_symbol_name(symbol_index).decode('utf-8')) == folded_query
+                for symbol_index in symbol_indexes
+            ):
+                camel_hump_folded_indexes[get_folded_name(folded_index)] = folded_index
+
+        folded_name_indexes: Dict[str, int] = {
+            folded_names[folded_index]: folded_index for folded_index in folded_names
+        }
+
+        import_paths: List[str] = []
+        for folded_name in rank_fuzzy_matches(
+            query, trigram_counts, camel_hump_folded_indexes.keys(), limit
+        ):
+            for symbol_index in self._get_folded_group(folded_name_indexes[folded_name]):
+                import_paths.extend(self._get_symbol_paths(symbol_index, kinds))
+        return import_paths[:limit]
+
+
+def rank_symbol_name(prefix: str, symbol_name: str) -> Tuple:
+    return (
+        symbol_name != prefix,
+        symbol_name.lower() != prefix.lower(),
+        len(symbol_name),
+        symbol_name,
+    )
+
+
+def rank_prefix_matches(prefix: str, import_paths: Iterable[str], limit: int) -> List[str]:
+    """
+        Keeps only the top `limit` matches, exact matches first, then the
+        shorter symbols and the shallower import paths
+    """
+    folded_prefix = prefix.lower()
+
+    if '.' in prefix:
+        def rank(import_path: str):
+            return (import_path.lower() != folded_prefix, import_path.count('.'), len(import_path), import_path)
+    else:
+        def rank(import_path: str):
+            return rank_symbol_name(prefix, get_symbol_name(import_path))[:3] + (
+                import_path.count('.'),
+                import_path,
+            )
+
+    return heapq.nsmallest(limit, import_paths, key=rank)
+
+
+def _dump_json_index(imports_map: Dict[str, List[str]], path_kinds: Dict[str, str]) -> Tuple[str, str, int]:
+    """
+        Json of the imports map and of the path kinds, with their checksum.
+        Loading and dumping them again gives the same json, so the reader
+        checks the checksum without the original text.
+    """
+    imports_json = json.dumps(imports_map)
+    kinds_json = json.dumps(path_kinds)
+    checksum = zlib.crc32(kinds_json.encode('utf-8'), zlib.crc32(imports_json.encode('utf-8')))
+    return imports_json, kinds_json, checksum
+
+
+def _write_json_index(
+    file_path: str,
+    imports_map: Dict[str, List[str]],
+    path_kinds: Dict[str, str],
+    metadata: Dict,
+):
+    imports_json, kinds_json, checksum = _dump_json_index(imports_map, path_kinds)
+    header = {**metadata, "version": JSON_INDEX_VERSION, "checksum": checksum}
+
+    with write_file_atomically(file_path) as f:
+        f.write(f'{{"header": {json.dumps(header)}, "imports": {imports_json}, "kinds": {kinds_json}}}')
+
+
+def _get_json_index_version(index_data: Dict) -> int:
+    if isinstance(index_data, dict) and isinstance(index_data.get("header"), dict):
+        return index_data["header"].get("version", 0)
+    # Written before the index was versioned
+    return 0
+
+
+# Migrate an index of the version they are keyed by to the next one, every
+# new version adds the migration from the version before it. Both are empty
+# for now, no released version of the index needs one: the path is only
+# scaffolding, exercised by the tests with a made up version, and an index
+# of any other version is built again.
+JSON_INDEX_MIGRATIONS: Dict[int, Callable[[Dict], Dict]] = {}
+BINARY_INDEX_MIGRATIONS: Dict[int, Callable[[Dict[str, int], bytes], Tuple[Dict[str, int], bytes]]] = {}
+
+
+def migrate_json_index_data(index_data: Dict, file_path: str) -> Dict:
+    version = _get_json_index_version(index_data)
+    while version != JSON_INDEX_VERSION:
+        if version not in JSON_INDEX_MIGRATIONS:
+            raise InvalidIndexFile(f"Unsupported index file {file_path} of version {version}")
+        index_data = JSON_INDEX_MIGRATIONS[version](index_data)
+        version += 1
+    return index_data
+
+
+def is_binary_index_file(file_path: str) -> bool:
+    with open(file_path, 'rb') as f:
+        return f.read(len(BINARY_INDEX_MAGIC)) == BINARY_INDEX_MAGIC
+
+
+def open_index_file(file_path: str) -> Union['BinaryImportIndex', 'JsonImportIndex']:
+    if is_binary_index_file(file_path):
+        return BinaryImportIndex(file_path)
+    return JsonImportIndex.from_file(file_path)
+
+
+def migrate_index_file(file_path: str, metadata: Dict, migrated_file_path: Optional[str] = None) -> Optional[int]:
+    """
+        Rewrites an index file of a previous version, through the
+        migrations between every two adjacent versions, so a new version of
+        the format doesn't index everything again. It is written to
+        `migrated_file_path`, in place when not given. Returns the version
+        it was migrated from, None when it is of the current version.
+    """
+    migrated_file_path = migrated_file_path or file_path
+
+    if not is_binary_index_file(file_path):
+        with open(file_path, 'r') as f:
+            index_data: Dict = json.load(f)
+
+        version = _get_json_index_version(index_data)
+        if version == JSON_INDEX_VERSION:
+            return None
+
+        index_data = migrate_json_index_data(index_data, file_path)
+        _write_json_index(
+            migrated_file_path, index_data["imports"], index_data["kinds"], {**metadata, "migrated_from": version}
+        )
+        return version
+
+    # Read, not mapped, windows doesn't replace mapped files
+    with open(file_path, 'rb') as f:
+        data = f.read()
+    version, header, header_size = read_binary_index_header(data, file_path)
+    if version == BINARY_INDEX_VERSION:
+        return None
+    # Sections following the header, without the metadata
+    body = data[header_size:header.get('metadata_offset', len(data))]
+
+    migrated_version = version
+    while migrated_version != BINARY_INDEX_VERSION:
+        if migrated_version not in BINARY_INDEX_MIGRATIONS:
+            raise InvalidIndexFile(f"Unsupported index file {file_path} of version {version}")
+        header, body = BINARY_INDEX_MIGRATIONS[migrated_version](header, body)
+        migrated_version += 1
+
+    _write_binary_index(
+        migrated_file_path, header, [body], HEADER.size + len(body), {**metadata, "migrated_from": version}
+    )
+    return version
+
+
+class JsonImportIndexWriter:
+    def write(self, file_path: str, import_entries: Iterable[ImportEntry], metadata: Optional[Dict] = None):
+        imports_map: Dict[str, List[str]] = defaultdict(list)
+        path_kinds: Dict[str, str] = {}
+
+        for import_path, kind in import_entries:
+            if import_path in path_kinds:
+                continue
+            imports_map[get_symbol_name(import_path)].append(import_path)
+            path_kinds[import_path] = kind
+
+        _write_json_index(file_path, imports_map, path_kinds, metadata or {})
+
+
+class JsonImportIndex:
+    """
+        Index exported as json, import paths are keyed by their symbol name,
+        the file holds `{"header": header, "imports": imports_map, "kinds": path_kinds}`.
+        Paths missing in `path_kinds` are of unknown kind.
+    """
+
+    def __init__(self, imports_map: Dict[str, List[str]], path_kinds: Optional[Dict[str, str]] = None):
+        self.imports_map = imports_map
+        self.path_kinds: Dict[str, str] = path_kinds or {}
+        # Version of the file it is loaded from and its header
+        self.version: int = JSON_INDEX_VERSION
+        self.header: Dict = {}
+        self._folded_imports_map: Optional[Dict[str, List[str]]] = None
+        self._folded_sorted_symbol_names: Optional[List[Tuple[Tuple[int, str], str]]] = None
+        self._folded_sorted_import_paths: Optional[List[Tuple[Tuple[int, int, str], str]]] = None
+        self._trigram_folded_names: Optional[Dict[str, List[str]]] = None
+        self._camel_hump_folded_names: Optional[Dict[str, List[str]]] = None
+
+    @classmethod
+    def from_file(cls, file_path: str) -> 'JsonImportIndex':
+        """
+            Loads an index of any version, those of the previous versions
+            are migrated in memory, corrupted ones raise InvalidIndexFile
+        """
+        with open(file_path, 'r') as f:
+            index_data: Dict = json.load(f)
+
+        version = _get_json_index_version(index_data)
+        index_data = migrate_json_index_data(index_data, file_path)
+
+        checksum: Optional[int] = index_data["header"].get("checksum")
+        if checksum is not None and checksum != _dump_json_index(index_data["imports"], index_data["kinds"])[2]:
+            raise InvalidIndexFile(f"Corrupted index file {file_path}")
+
+        import_index = cls(index_data["imports"], index_data["kinds"])
+        import_index.version = version
+        import_index.header = index_data["header"]
+        return import_index
+
+    def get_metadata(self) -> Dict:
+        return {key: value for key, value in self.header.items() if key not in ("version", "checksum")}
+
+    def is_valid(self) -> bool:
+        # Checksummed as it is loaded
+        return True
+
+    def _filter_kinds(self, import_paths: Iterable[str], kinds: Optional[Collection[str]]) -> List[str]:
+        if kinds is None:
+            return list(import_paths)
+        return [
+            import_path for import_path in import_paths
+            if self.path_kinds.get(import_path, UNKNOWN_KIND) in kinds
+        ]
+
+    def close(self):
+        pass
+
+    def _get_folded_imports_map(self) -> Dict[str, List[str]]:
+        if self._folded_imports_map is None:
+            self._folded_imports_map = defaultdict(list)
+            for symbol_name, import_paths in self.imports_map.items():
+                self._folded_imports_map[symbol_name.lower()].extend(import_paths)
+        return self._folded_imports_map
+
+    def lookup(
+        self,
+        symbol: str,
+        ignore_case: bool = False,
+        kinds: Optional[Collection[str]] = None,
+    ) -> List[str]:
+        if not ignore_case:
+            return self._filter_kinds(self.imports_map.get(symbol, []), kinds)
+
+        return self._filter_kinds(self._get_folded_imports_map().get(symbol.lower(), []), kinds)
+
+    def prefix_search(
+        self,
+        prefix: str,
+        limit: int,
+        kinds: Optional[Collection[str]] = None,
+    ) -> List[str]:
+        if self._folded_sorted_import_paths is None:
+            # Same order as the sorted sections of the binary index
+            self._folded_sorted_symbol_names = sorted(
+                (get_symbol_sort_key(symbol_name), symbol_name) for symbol_name in self.imports_map
+            )
+            self._folded_sorted_import_paths = sorted(
+                (get_path_sort_key(import_path), import_path)
+                for import_paths in self.imports_map.values()
+                for import_path in import_paths
+            )
+
+        candidates: List[str] = []
+
+        if '.' in prefix:
+            sorted_entries = self._folded_sorted_import_paths
+            first_bucket: Tuple[int, ...] = (prefix.count('.'), len(prefix))
+
+            def collect(position: int) -> int:
+                import_paths = self._filter_kinds([sorted_entries[position][1]], kinds)
+                candidates.extend(import_paths)
+                return len(import_paths)
+        else:
+            sorted_entries = self._folded_sorted_symbol_names
+            first_bucket = (len(prefix),)
+
+            def collect(position: int) -> int:
+                import_paths = self._filter_kinds(self.imports_map[sorted_entries[position][1]], kinds)
+                candidates.extend(import_paths)
+                return len(import_paths)
+
+        scan_prefix_buckets(
+            len(sorted_entries),
+            lambda position: sorted_entries[position][0],
+            first_bucket,
+            prefix.lower(),
+            collect,
+            limit,
+        )
+        return rank_prefix_matches(prefix, candidates, limit)
+
+    def fuzzy_search(
+        self,
+        query: str,
+        limit: int,
+        kinds: Optional[Collection[str]] = None,
+    ) -> List[str]:
+        folded_imports_map = self._get_folded_imports_map()
+
+        if self._trigram_folded_names is None:
+            self._trigram_folded_names = defaultdict(list)
+            self._camel_hump_folded_names = defaultdict(list)
+            for symbol_name in self.imports_map:
+                folded_name = symbol_name.lower()
+                for trigram in get_trigrams(folded_name):
+                    self._trigram_folded_names[trigram].append(folded_name)
+                self._camel_hump_folded_names[get_camel_humps(symbol_name)].append(folded_name)
+
+        folded_query = query.lower()
+
+        trigram_counts: Counter = Counter()
+        for trigram in get_trigrams(folded_query):
+            trigram_counts.update(set(self._trigram_folded_names.get(trigram, [])))
+
+        camel_hump_names = self._camel_hump_folded_names.get(folded_query, [])
+
+        import_paths: List[str] = []
+        for folded_name in rank_fuzzy_matches(query, trigram_counts, camel_hump_names, limit):
+            import_paths.extend(self._filter_kinds(folded_imports_map[folded_name], kinds))
+        return import_paths[:limit]
+
+
+class CompositeImportIndex:
+    """
+        Looks up several indexes as one, like the index of an environment
+        and the prebuilt index of its standard library. Results of the
+        first index come first when they rank the same.
+    """
+
+    def __init__(self, import_indexes: List):
+        self.import_indexes = import_indexes
+
+    def close(self):
+        for import_index in self.import_indexes:
+            import_index.close()
+
+    def _chain(self, results: Iterable[List[str]]) -> List[str]:
+        # A path indexed twice, like a stdlib module shadowed by a
+        # package, is kept once
+        return list(dict.fromkeys(
+            import_path for import_paths in results for import_path in import_paths
+        ))
+
+    def lookup(
+        self,
+        symbol: str,
+        ignore_case: bool = False,
+        kinds: Optional[Collection[str]] = None,
+    ) -> List[str]:
+        return self._chain(
+            import_index.lookup(symbol, ignore_case=ignore_case, kinds=kinds)
+            for import_index in self.import_indexes
+        )
+
+    def prefix_search(
+        self,
+        prefix: str,
+        limit: int,
+        kinds: Optional[Collection[str]] = None,
+    ) -> List[str]:
+        # Top matches of every index ranked again together
+        return rank_prefix_matches(prefix, self._chain(
+            import_index.prefix_search(prefix, limit, kinds=kinds)
+            for import_index in self.import_indexes
+        ), limit)
+
+    def fuzzy_search(
+        self,
+        query: str,
+        limit: int,
+        kinds: Optional[Collection[str]] = None,
+    ) -> List[str]:
+        import_paths = self._chain(
+            import_index.fuzzy_search(query, limit, kinds=kinds)
+            for import_index in self.import_indexes
+        )
+
+        folded_query = query.lower()
+        query_trigrams = get_trigrams(folded_query)
+
+        def rank(import_path: str) -> Tuple:
+            symbol_name = get_symbol_name(import_path)
+            folded_name = symbol_name.lower()
+            similarity = get_trigram_similarity(query_trigrams, folded_name)
+            if get_camel_humps(symbol_name) == folded_query:
+                similarity = max(similarity, CAMEL_HUMP_SIMILARITY)
+            return -similarity, len(folded_name), folded_name
+
+        # Sort is stable, paths of a name keep the order of their index
+        return sorted(import_paths, key=rank)[:limit]
@@ -0,0 +1,187 @@
+'''
+    Lease making sure a single indexer builds the index of an environment,
+    across windows, plugin reloads and sublime instances. The indexer
+    holding it writes its events to a file, others follow its progress
+    from there instead of indexing the same distributions again.
+'''
+import os
+import json
+import time
+import socket
+import threading
+import logging
+from typing import Callable, Dict, IO, Optional
+
+
+logger = logging.getLogger(__name__)
+
+
+# Seconds between two heartbeats of the indexer holding the lease
+LEASE_HEARTBEAT_INTERVAL = 2
+
+# Seconds without heartbeat after which a lease is taken over, its
+# indexer hung or was killed before it could release it
+LEASE_TIMEOUT = 15
+
+# Seconds between two reads of the events of the indexer holding the lease
+FOLLOW_POLL_INTERVAL = 0.2
+
+
+def _is_process_running(pid: int) -> bool:
+    if os.name != 'posix':
+        # Signal 0 is CTRL_C_EVENT on windows, the heartbeat tells instead
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # Running, owned by another user
+        return True
+    return True
+
+
+class IndexLease:
+    """
+        Lease file holding the pid and host of the indexer, its
+        modification time is the heartbeat
+    """
+
+    def __init__(self, lease_path: str, events_path: str):
+        self.lease_path = lease_path
+        self.events_path = events_path
+        self._heartbeat_stop = threading.Event()
+        self._heartbeat_thread: Optional[threading.Thread] = None
+        self._events_file: Optional[IO] = None
+
+    def _read(self) -> Optional[Dict]:
+        try:
+            with open(self.lease_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _is_stale(self, lease: Optional[Dict], heartbeat_time: float) -> bool:
+        if time.time() - heartbeat_time > LEASE_TIMEOUT:
+            return True
+        # Written right after the lease file is created
+        if lease is None or lease.get("hostname") != socket.gethostname():
+            return False
+        return not _is_process_running(lease.get("pid", 0))
+
+    def _remove_if_stale(self) -> bool:
+        try:
+            stat = os.stat(self.lease_path)
+        except OSError:
+            # Released meanwhile
+            return True
+
+        lease = self._read()
+        if not self._is_stale(lease, stat.st_mtime):
+            return False
+
+        logger.debug(f"Taking over the stale indexer lease {lease}")
+        try:
+            # Another indexer can take it over between the check and the
+            # removal, the stat tells most of these races apart
+            if os.stat(self.lease_path).st_ino == stat.st_ino:
+                os.remove(self.lease_path)
+        except OSError:
+            pass
+        return True
+
+    def _heartbeat(self):
+        while not self._heartbeat_stop.wait(LEASE_HEARTBEAT_INTERVAL):
+            try:
+                os.utime(self.lease_path)
+            except OSError:
+                logger.debug("Unable to renew the indexer lease")
+
+    def acquire(self) -> bool:
+        """
+            Takes the lease if no live indexer holds it, stale leases are
+            taken over
+        """
+        for _ in range(2):
+            try:
+                fd = os.open(self.lease_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if not self._remove_if_stale():
+                    return False
+                continue
+
+            with os.fdopen(fd, 'w') as f:
+                json.dump({
+                    "pid": os.getpid(),
+                    "hostname": socket.gethostname(),
+                    "started": time.time(),
+                }, f)
+
+            self._events_file = open(self.events_path, 'w')
+            self._heartbeat_stop.clear()
+            self._heartbeat_thread = threading.Thread(target=self._heartbeat, daemon=True)
+            self._heartbeat_thread.start()
+            return True
+        return False
+
+    def record_event(self, line: str):
+        if self._events_file is not None:
+            self._events_file.write(line)
+            self._events_file.flush()
+
+    def release(self):
+        self._heartbeat_stop.set()
+        if self._events_file is not None:
+            self._events_file.close()
+            self._events_file = None
+
+        lease = self._read()
+        if lease is not None and lease.get("pid") == os.getpid():
+            try:
+                os.remove(self.lease_path)
+            except OSError:
+                pass
+
+    def _is_held(self) -> bool:
+        try:
+            heartbeat_time = os.stat(self.lease_path).st_mtime
+        except OSError:
+            return False
+        return not self._is_stale(self._read(), heartbeat_time)
+
+    def follow(self, on_event: Callable[[Dict], None], deadline: Optional[float] = None) -> bool:
+        """
+            Hands the events of the indexer holding the lease to `on_event`
+            until it is done, returns False when the deadline comes first
+        """
+        position = 0
+        partial_line = ""
+
+        while True:
+            is_held = self._is_held()
+
+            try:
+                with open(self.events_path, 'r') as f:
+                    f.seek(0, os.SEEK_END)
+                    if f.tell() < position:
+                        # Truncated by an indexer which just took the lease
+                        position, partial_line = 0, ""
+                    f.seek(position)
+                    data = f.read()
+                    position = f.tell()
+            except OSError:
+                data = ""
+
+            lines = (partial_line + data).split("\n")
+            partial_line = lines.pop()
+            for line in lines:
+                try:
+                    on_event(json.loads(line))
+                except ValueError:
+                    logger.debug(f"Invalid indexer event: {line}")
+
+            if not is_held:
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(FOLLOW_POLL_INTERVAL)
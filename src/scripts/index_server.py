@@ -0,0 +1,312 @@
+'''
+    Long lived index server, the plugin starts it once per python
+    interpreter. It keeps the import index loaded and answers line
+    delimited JSON-RPC 2.0 requests read from stdin, responses and
+    indexer event notifications are written to stdout.
+'''
+import os
+import sys
+import json
+import signal
+import time
+import threading
+import subprocess
+import logging
+from typing import Any, Callable, Dict, List, Optional, Union
+from pathlib import Path
+from index_format import (
+    BinaryImportIndex,
+    CompositeImportIndex,
+    JsonImportIndex,
+    InvalidIndexFile,
+    IndexSignature,
+    get_index_signature,
+    get_snapshot_path,
+    read_index_generation,
+)
+from index_shards import get_index_file_path, get_index_generation_file_path
+from indexer_settings import SETTINGS_ENV_VAR
+
+
+logger = logging.getLogger(__name__)
+path = Path(__file__)
+
+
+JSON_INDEX_FORMAT = "json"
+
+# JSON-RPC error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+INDEXING_IN_PROGRESS = -32000
+
+ImportIndex = Union[BinaryImportIndex, JsonImportIndex, CompositeImportIndex]
+
+
+class JsonRpcError(Exception):
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+class IndexServer:
+    def __init__(self, input_stream, output_stream):
+        self._input_stream = input_stream
+        self._output_stream = output_stream
+        self._output_lock = threading.Lock()
+        self._index_lock = threading.Lock()
+        self._reindex_lock = threading.Lock()
+        # Settings the server was started with, every re-index brings new ones
+        self._settings: Dict = json.loads(os.environ.get(SETTINGS_ENV_VAR) or "{}")
+        self._import_index: Optional[ImportIndex] = None
+        self._index_signature: Optional[IndexSignature] = None
+        self._indexer_process: Optional[subprocess.Popen] = None
+
+        self.methods: Dict[str, Callable[..., Any]] = {
+            "lookup": self.lookup,
+            "prefix": self.prefix_search,
+            "fuzzy": self.fuzzy_search,
+            "reindex": self.reindex,
+        }
+
+    def _get_index_file_path(self) -> Optional[str]:
+        settings = self._settings
+        if "INDEX_CACHE_DIRECTORY" not in settings:
+            return None
+
+        return get_index_file_path(settings)
+
+    def _load_index(self, file_path: str) -> ImportIndex:
+        if self._settings.get("INDEX_FORMAT") == JSON_INDEX_FORMAT:
+            return JsonImportIndex.from_file(file_path)
+        return BinaryImportIndex(file_path)
+
+    def _get_import_index(self) -> Optional[ImportIndex]:
+        """
+            Loads the index again only when a new generation is complete,
+            the previous one is served until then
+        """
+        index_file_path = self._get_index_file_path()
+        if index_file_path is None:
+            return None
+
+        # Every generation has its own file, the indexer never replaces
+        # the one mapped here
+        generation_file_path = get_index_generation_file_path(self._settings)
+        generation = read_index_generation(generation_file_path)
+        file_path = get_snapshot_path(index_file_path, generation)
+        index_signature = get_index_signature(file_path, generation_file_path)
+        if index_signature is None:
+            return None
+
+        with self._index_lock:
+            if index_signature != self._index_signature:
+                start_time = time.perf_counter()
+                try:
+                    import_index = self._load_index(file_path)
+                    stdlib_file_path = get_snapshot_path(get_index_file_path(self._settings, stdlib=True), generation)
+                    if os.path.exists(stdlib_file_path):
+                        import_index = CompositeImportIndex(
+                            [import_index, self._load_index(stdlib_file_path)]
+                        )
+                    self._import_index = import_index
+                except (InvalidIndexFile, OSError, ValueError):
+                    # Lookups keep going on the previous snapshot
+                    logger.debug(f"Unable to load index {file_path}")
+                self._index_signature = index_signature
+                logger.debug(f"Time taken to load index: {time.perf_counter() - start_time}")
+            return self._import_index
+
+    def lookup(self, symbol: str, ignore_case: bool = False, kinds: Optional[List[str]] = None) -> List[str]:
+        import_index = self._get_import_index()
+        if import_index is None:
+            return []
+        return import_index.lookup(symbol, ignore_case=ignore_case, kinds=kinds)
+
+    def prefix_search(self, prefix: str, limit: int, kinds: Optional[List[str]] = None) -> List[str]:
+        import_index = self._get_import_index()
+        if import_index is None:
+            return []
+        return import_index.prefix_search(prefix, limit, kinds=kinds)
+
+    def fuzzy_search(self, query: str, limit: int, kinds: Optional[List[str]] = None) -> List[str]:
+        import_index = self._get_import_index()
+        if import_index is None:
+            return []
+        return import_index.fuzzy_search(query, limit, kinds=kinds)
+
+    def reindex(self, settings: Dict, timeout: float) -> Dict:
+        """
+            Runs the indexer in a child process, the import engine imports
+            every package, which must not stay loaded in the server. The
+            indexer events are forwarded as notifications.
+        """
+        if not self._reindex_lock.acquire(blocking=False):
+            raise JsonRpcError(INDEXING_IN_PROGRESS, "Indexing is already running")
+
+        try:
+            self._settings = settings
+            return self._run_indexer(settings, timeout)
+        finally:
+            self._indexer_process = None
+            self._reindex_lock.release()
+
+    def _run_indexer(self, settings: Dict, timeout: float) -> Dict:
+        success = False
+        errors: List[str] = []
+
+        self._indexer_process = subprocess.Popen(
+            [sys.executable, '-u', str(path.parent / 'indexer.py')],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            env={**os.environ, SETTINGS_ENV_VAR: json.dumps(settings)},
+            # Own process group, so its pool workers are killed with it
+            start_new_session=True,
+        )
+
+        # Kills the indexer when it runs past the deadline, even if it
+        # hangs without writing anything
+        deadline = time.monotonic() + timeout
+        timer = threading.Timer(timeout, self._kill_indexer)
+        timer.start()
+        # Time paused waiting for the editor to be idle doesn't count
+        max_pause: float = settings.get("INDEXER_MAX_PAUSE", 0)
+        pause_start_time: Optional[float] = None
+
+        try:
+            for line in iter(self._indexer_process.stdout.readline, b''):
+                try:
+                    event: Dict = json.loads(line.decode('utf-8'))
+                except ValueError:
+                    continue
+
+                self.notify("indexer_event", event)
+
+                if event.get("event") == "paused":
+                    pause_start_time = time.monotonic()
+                    # Indexer resumes by itself within the max pause
+                    timer = self._restart_kill_timer(timer, deadline + max_pause)
+                elif event.get("event") == "resumed" and pause_start_time is not None:
+                    deadline += time.monotonic() - pause_start_time
+                    pause_start_time = None
+                    timer = self._restart_kill_timer(timer, deadline)
+                elif event.get("event") == "summary":
+                    success = event["success"]
+                elif event.get("event") == "failed":
+                    errors.append(event["message"])
+        finally:
+            timer.cancel()
+            self._indexer_process.wait()
+            self._indexer_process.stdout.close()
+
+        if not success and not errors:
+            errors.append(f"Indexer stopped without finishing, it crashed or ran past {timeout} sec")
+
+        if success:
+            # Swap in the new index now, instead of on the next lookup
+            self._get_import_index()
+
+        return {"success": success, "message": "\n".join(errors)}
+
+    def _restart_kill_timer(self, timer: threading.Timer, deadline: float) -> threading.Timer:
+        timer.cancel()
+        timer = threading.Timer(max(0, deadline - time.monotonic()), self._kill_indexer)
+        timer.start()
+        return timer
+
+    def _kill_indexer(self):
+        indexer_process = self._indexer_process
+        if indexer_process is None or indexer_process.poll() is not None:
+            return
+
+        if hasattr(os, 'killpg'):
+            try:
+                os.killpg(indexer_process.pid, signal.SIGKILL)
+            except OSError:
+                pass
+        else:
+            indexer_process.kill()
+
+    def _write(self, message: Dict):
+        with self._output_lock:
+            self._output_stream.write(json.dumps(message) + "\n")
+            self._output_stream.flush()
+
+    def notify(self, method: str, params: Dict):
+        self._write({"jsonrpc": "2.0", "method": method, "params": params})
+
+    def _respond(self, request_id: Any, result: Any = None, error: Optional[JsonRpcError] = None):
+        if error is not None:
+            self._write({
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "error": {"code": error.code, "message": error.message},
+            })
+        else:
+            self._write({"jsonrpc": "2.0", "id": request_id, "result": result})
+
+    def _handle(self, request_id: Any, method: Callable[..., Any], params: Dict):
+        try:
+            result = method(**params)
+        except JsonRpcError as e:
+            self._respond(request_id, error=e)
+        except TypeError as e:
+            self._respond(request_id, error=JsonRpcError(INVALID_PARAMS, str(e)))
+        except Exception as e:
+            logger.debug(f"Request {request_id} failed", exc_info=True)
+            self._respond(request_id, error=JsonRpcError(INTERNAL_ERROR, str(e)))
+        else:
+            self._respond(request_id, result)
+
+    def _dispatch(self, line: str) -> bool:
+        """
+            Handles a single request, returns False when the server must stop
+        """
+        try:
+            request = json.loads(line)
+        except ValueError:
+            self._respond(None, error=JsonRpcError(PARSE_ERROR, "Invalid json"))
+            return True
+
+        if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+            self._respond(None, error=JsonRpcError(INVALID_REQUEST, "Invalid request"))
+            return True
+
+        request_id = request.get("id")
+        method_name = request["method"]
+        params = request.get("params") or {}
+
+        if method_name == "shutdown":
+            self._respond(request_id, None)
+            return False
+
+        method = self.methods.get(method_name)
+        if method is None:
+            self._respond(request_id, error=JsonRpcError(METHOD_NOT_FOUND, f"Unknown method {method_name}"))
+        elif method_name == "reindex":
+            # Lookups keep being answered from the current index while indexing
+            threading.Thread(
+                target=self._handle, args=(request_id, method, params), daemon=True
+            ).start()
+        else:
+            self._handle(request_id, method, params)
+        return True
+
+    def serve(self):
+        for line in self._input_stream:
+            if line.strip() and not self._dispatch(line):
+                break
+
+        # Stdin is closed when the plugin host goes away
+        self._kill_indexer()
+
+
+if __name__ == '__main__':
+    output_stream = sys.stdout
+    # Nothing else may write to the protocol stream
+    sys.stdout = sys.stderr
+    IndexServer(sys.stdin, output_stream).serve()
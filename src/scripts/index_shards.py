@@ -0,0 +1,373 @@
+import os
+import re
+import json
+import heapq
+import hashlib
+import shutil
+import tempfile
+import logging
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from index_format import ImportEntry, UNKNOWN_KIND
+
+
+logger = logging.getLogger(__name__)
+
+
+# Spill files of the running indexer, cleared on every run
+SPILL_DIRECTORY_NAME = "spill"
+
+# Import entries kept in memory by a spill file before they are sorted
+# and written to disk as a run
+SPILL_RUN_SIZE = 20000
+
+# Shard of a distribution left unfinished by a run, only used until the
+# distribution is indexed completely
+PARTIAL_SHARD_SUFFIX = ".partial"
+SHARD_SUFFIX = ".txt"
+
+JSON_INDEX_FORMAT = "json"
+
+# Environment used when none is given, the interpreter running the indexer
+DEFAULT_ENVIRONMENT_NAME = "default"
+
+# Generation of the environment index, bumped when a re-index completes
+INDEX_GENERATION_FILE_NAME = "py_rock_generation.txt"
+
+# Max files merged at once, more runs are first merged in groups, so
+# the indexer never holds too many open files
+MERGE_FAN_IN = 64
+
+
+def _write_entries(file_path: str, import_entries: Iterable[ImportEntry]):
+    with open(file_path, 'w', encoding='utf-8') as f:
+        for import_path, kind in import_entries:
+            f.write(f"{import_path}\t{kind}\n")
+
+
+def _read_entries(file_path: str) -> Iterator[ImportEntry]:
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            import_path, _, kind = line.rstrip("\n").partition("\t")
+            if import_path:
+                # Shards written before the kinds were stored have none
+                yield import_path, kind or UNKNOWN_KIND
+
+
+def _merge_entries(sorted_entries: List[Iterator[ImportEntry]]) -> Iterator[ImportEntry]:
+    """
+        Merges entries sorted by path, a path found more than once,
+        like a namespace package shared by distributions, is kept once
+    """
+    previous_path = None
+    for import_path, kind in heapq.merge(*sorted_entries):
+        if import_path != previous_path:
+            previous_path = import_path
+            yield import_path, kind
+
+
+def get_shard_key(
+    name: str,
+    version: str,
+    content_parts: Iterable[str],
+) -> str:
+    """
+        Shards are addressed by what they are built from, so environments
+        with the same distribution installed share a single shard
+    """
+    digest = hashlib.sha1("\n".join([name, version, *content_parts]).encode('utf-8')).hexdigest()
+    # Keeps the file name readable and safe on every platform
+    safe_version = re.sub(r"[^\w.+-]", "_", version)
+    return f"{name}-{safe_version}-{digest[:16]}"
+
+
+def get_environment_directory_path(settings: Dict) -> str:
+    return os.path.join(
+        settings["INDEX_CACHE_DIRECTORY"],
+        settings["ENVIRONMENTS_DIRECTORY_NAME"],
+        settings.get("ENVIRONMENT_NAME") or DEFAULT_ENVIRONMENT_NAME,
+    )
+
+
+def get_index_file_path(settings: Dict, stdlib: bool = False) -> str:
+    """
+        Index of the environment, or the link to the prebuilt index of
+        its standard library when `stdlib` is set
+    """
+    if settings.get("INDEX_FORMAT") == JSON_INDEX_FORMAT:
+        setting_name = "STDLIB_IMPORT_INDEX_FILE_NAME" if stdlib else "IMPORT_INDEX_FILE_NAME"
+    else:
+        setting_name = "STDLIB_BINARY_INDEX_FILE_NAME" if stdlib else "BINARY_INDEX_FILE_NAME"
+
+    return os.path.join(get_environment_directory_path(settings), settings[setting_name])
+
+
+def get_index_generation_file_path(settings: Dict) -> str:
+    return os.path.join(
+        get_environment_directory_path(settings),
+        settings.get("INDEX_GENERATION_FILE_NAME") or INDEX_GENERATION_FILE_NAME,
+    )
+
+
+def _get_directory_size(directory_path: str, seen_files: Optional[Set[Tuple[int, int]]] = None) -> int:
+    """
+        Files linked more than once, like the standard library indexes,
+        are counted once for the same `seen_files`
+    """
+    seen_files = set() if seen_files is None else seen_files
+    size = 0
+    for root, _, file_names in os.walk(directory_path):
+        for file_name in file_names:
+            try:
+                stat = os.stat(os.path.join(root, file_name))
+            except OSError:
+                continue
+            if (stat.st_dev, stat.st_ino) not in seen_files:
+                seen_files.add((stat.st_dev, stat.st_ino))
+                size += stat.st_size
+    return size
+
+
+def prune_index_cache(
+    base_directory_path: str,
+    directory_names: Iterable[str],
+    max_size: int,
+    protected_paths: Set[str],
+) -> int:
+    """
+        Removes the least recently used entries of the given directories,
+        like the environments and the shards, until the cache directory
+        fits in `max_size` bytes, returns the bytes freed. Entries are
+        marked used by touching them, the protected ones, in use by the
+        running indexer, are never removed.
+    """
+    # path, last used time in ns, size
+    entries: List[Tuple[str, int, int]] = []
+    total_size = _get_directory_size(base_directory_path)
+    if total_size <= max_size:
+        return 0
+
+    for directory_name in directory_names:
+        try:
+            with os.scandir(os.path.join(base_directory_path, directory_name)) as directory_entries:
+                for entry in directory_entries:
+                    if entry.path in protected_paths:
+                        continue
+                    size = _get_directory_size(entry.path) if entry.is_dir() else entry.stat().st_size
+                    entries.append((entry.path, entry.stat().st_mtime_ns, size))
+        except OSError:
+            continue
+
+    freed_size = 0
+    for entry_path, _, size in sorted(entries, key=lambda entry: entry[1]):
+        if total_size - freed_size <= max_size:
+            break
+
+        if os.path.isdir(entry_path):
+            shutil.rmtree(entry_path, ignore_errors=True)
+        else:
+            try:
+                os.remove(entry_path)
+            except OSError:
+                continue
+        freed_size += size
+
+    return freed_size
+
+
+class SpillFile:
+    """
+        Collects import entries on disk as sorted runs, only the entries
+        of the current run are held in memory. Runs are merged when the
+        entries are read back, sorted by path and without duplicates.
+        Spill files are picklable, so a worker process can hand its runs
+        over to the main process.
+    """
+
+    def __init__(self, spill_directory_path: str, run_size: int = SPILL_RUN_SIZE):
+        self.spill_directory_path = spill_directory_path
+        self.run_size = run_size
+        self.run_paths: List[str] = []
+        self._entries: List[ImportEntry] = []
+
+    def _new_run_path(self) -> str:
+        if not os.path.exists(self.spill_directory_path):
+            os.makedirs(self.spill_directory_path, exist_ok=True)
+
+        file_descriptor, run_path = tempfile.mkstemp(suffix='.run', dir=self.spill_directory_path)
+        os.close(file_descriptor)
+        return run_path
+
+    def add(self, import_entries: Iterable[ImportEntry]):
+        self._entries.extend(import_entries)
+        if len(self._entries) >= self.run_size:
+            self.flush()
+
+    def add_sorted_run(self, sorted_entries: Iterable[ImportEntry]):
+        run_path = self._new_run_path()
+        _write_entries(run_path, sorted_entries)
+        self.run_paths.append(run_path)
+
+    def flush(self):
+        if not self._entries:
+            return
+
+        self.add_sorted_run(sorted(self._entries))
+        self._entries = []
+
+    def iter_entries(self) -> Iterator[ImportEntry]:
+        self.flush()
+
+        while len(self.run_paths) > MERGE_FAN_IN:
+            run_paths, self.run_paths = self.run_paths, []
+            for index in range(0, len(run_paths), MERGE_FAN_IN):
+                group = run_paths[index:index + MERGE_FAN_IN]
+                self.add_sorted_run(_merge_entries([_read_entries(run_path) for run_path in group]))
+                self._remove_runs(group)
+
+        yield from _merge_entries([_read_entries(run_path) for run_path in self.run_paths])
+
+    def _remove_runs(self, run_paths: List[str]):
+        for run_path in run_paths:
+            try:
+                os.remove(run_path)
+            except OSError:
+                pass
+
+    def remove(self):
+        self._remove_runs(self.run_paths)
+        self.run_paths = []
+        self._entries = []
+
+
+class ShardStore:
+    """
+        Keeps the indexed import paths of every distribution in its own
+        shard file, along with a manifest of the distributions indexed
+        for an environment, so only the changed distributions have to be
+        indexed again. Shards are shared by all the environments, they
+        are named by a key of their content, see `get_shard_key`.
+        Shard lines are the import path and its kind, tab separated,
+        sorted by import path.
+    """
+
+    def __init__(
+        self,
+        base_directory_path: str,
+        environment_directory_path: str,
+        manifest_file_name: str,
+        shards_directory_name: str,
+    ):
+        self.environment_directory_path = environment_directory_path
+        self.manifest_path = os.path.join(environment_directory_path, manifest_file_name)
+        self.shards_directory_path = os.path.join(base_directory_path, shards_directory_name)
+        # Per environment, indexers of other environments can run meanwhile
+        self.spill_directory_path = os.path.join(environment_directory_path, SPILL_DIRECTORY_NAME)
+
+    def load_manifest(self) -> Dict:
+        if not os.path.exists(self.manifest_path):
+            return {}
+
+        try:
+            with open(self.manifest_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            logger.debug("Unable to read distributions manifest, ignoring it")
+            return {}
+
+    def save_manifest(self, manifest: Dict):
+        temp_path = f"{self.manifest_path}.tmp"
+
+        with open(temp_path, 'w') as f:
+            json.dump(manifest, f)
+
+        os.replace(temp_path, self.manifest_path)
+
+    def get_shard_path(self, shard_key: str, partial: bool = False) -> str:
+        suffix = f"{PARTIAL_SHARD_SUFFIX}{SHARD_SUFFIX}" if partial else SHARD_SUFFIX
+        return os.path.join(self.shards_directory_path, f"{shard_key}{suffix}")
+
+    def has_shard(self, shard_key: str) -> bool:
+        return os.path.exists(self.get_shard_path(shard_key))
+
+    def _find_shard_path(self, shard_key: str) -> Optional[str]:
+        for partial in (False, True):
+            shard_path = self.get_shard_path(shard_key, partial)
+            if os.path.exists(shard_path):
+                return shard_path
+        return None
+
+    def open_spill(self) -> SpillFile:
+        return SpillFile(self.spill_directory_path)
+
+    def clear_spill(self):
+        # Left by an indexer which was killed
+        shutil.rmtree(self.spill_directory_path, ignore_errors=True)
+
+    def write_shard(self, shard_key: str, spill: SpillFile, partial: bool = False):
+        if not os.path.exists(self.shards_directory_path):
+            os.makedirs(self.shards_directory_path, exist_ok=True)
+
+        shard_path = self.get_shard_path(shard_key, partial)
+        # Indexers of other environments can write the same shard
+        temp_path = f"{shard_path}.{os.getpid()}.tmp"
+
+        _write_entries(temp_path, spill.iter_entries())
+        spill.remove()
+
+        os.replace(temp_path, shard_path)
+
+        if not partial:
+            try:
+                os.remove(self.get_shard_path(shard_key, partial=True))
+            except OSError:
+                pass
+
+    def read_shard(self, shard_key: str) -> Iterator[ImportEntry]:
+        shard_path = self._find_shard_path(shard_key)
+        if shard_path is None:
+            logger.debug(f"No shard found for {shard_key}")
+            return
+        yield from _read_entries(shard_path)
+
+    def merge_shards(self, shard_keys: Iterable[str]) -> Iterator[ImportEntry]:
+        """
+            Entries of all the shards sorted by path, without duplicates,
+            read from disk as they are merged. A partial shard is used
+            when the complete one is missing. Shards read are marked as
+            used, so they are the last ones pruned from the cache.
+        """
+        shard_paths: List[str] = []
+        for shard_key in shard_keys:
+            shard_path = self._find_shard_path(shard_key)
+            if shard_path is not None:
+                shard_paths.append(shard_path)
+                self.touch(shard_path)
+
+        if len(shard_paths) <= MERGE_FAN_IN:
+            yield from _merge_entries([_read_entries(shard_path) for shard_path in shard_paths])
+            return
+
+        # Shards are sorted runs already, they are merged in groups into
+        # spill runs first, the shards themselves are left as they are
+        spill = self.open_spill()
+        try:
+            for index in range(0, len(shard_paths), MERGE_FAN_IN):
+                group = shard_paths[index:index + MERGE_FAN_IN]
+                spill.add_sorted_run(_merge_entries([_read_entries(shard_path) for shard_path in group]))
+
+            yield from spill.iter_entries()
+        finally:
+            spill.remove()
+
+    def delete_shard(self, shard_key: str):
+        for partial in (False, True):
+            try:
+                os.remove(self.get_shard_path(shard_key, partial))
+            except OSError:
+                pass
+
+    def touch(self, file_path: str):
+        try:
+            os.utime(file_path)
+        except OSError:
+            pass
@@ -1,201 +1,1576 @@
 import os
+import re
 import sys
 import json
+import time
+import queue
+import shutil
+import subprocess
+import hashlib
 import pkgutil
-import inspect
-import json
-from collections import defaultdict
+from collections import defaultdict, deque
 import importlib
 import traceback
 import typing
-from typing import List, Dict, Tuple, Set
-from types import FunctionType, ModuleType
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Callable, Deque, List, Dict, Tuple, Set, Optional, Iterable
+from types import BuiltinFunctionType, FunctionType, ModuleType
 import logging
 from pathlib import Path
+from static_indexer import StaticIndexer
+from module_supervisor import ModuleSupervisor
+from import_sandbox import ImportSandbox
+from distributions import DistributionInfo, STDLIB_DISTRIBUTION_NAME
+from module_discovery import ModuleDiscovery
+from index_lease import IndexLease
+from indexer_settings import SETTINGS_ENV_VAR
+from index_shards import (
+    ShardStore,
+    SpillFile,
+    SPILL_DIRECTORY_NAME,
+    get_shard_key,
+    get_environment_directory_path,
+    get_index_file_path,
+    get_index_generation_file_path,
+    prune_index_cache,
+)
+from index_format import (
+    BinaryImportIndexWriter,
+    JsonImportIndexWriter,
+    BINARY_INDEX_VERSION,
+    JSON_INDEX_VERSION,
+    ImportEntry,
+    InvalidIndexFile,
+    get_snapshot_path,
+    migrate_index_file,
+    open_index_file,
+    read_index_generation,
+    remove_previous_snapshots,
+    write_index_generation,
+    UNKNOWN_KIND,
+    MODULE_KIND,
+    CLASS_KIND,
+    FUNCTION_KIND,
+    BUILTIN_KIND,
+    ALIAS_KIND,
+)
 
 
 logger = logging.getLogger(__name__)
 path = Path(__file__)
 
 
+IMPORT_ENGINE = "import"
+STATIC_ENGINE = "static"
+
+BINARY_INDEX_FORMAT = "binary"
+JSON_INDEX_FORMAT = "json"
+
+
+# Modules are handed to the workers in small chunks, so a single heavy
+# package doesn't hold back the rest of the partition
+CHUNKS_PER_WORKER = 8
+
+# Seconds between two reads of the modules reported by the pool workers
+PROGRESS_POLL_INTERVAL = 0.1
+
+# Number of the slowest modules reported in the summary
+SLOWEST_MODULES_COUNT = 10
+
+# Defaults of the import engine worker limits, the plugin sends its own
+DEFAULT_MODULE_TIMEOUT = 5
+DEFAULT_WORKER_MAX_RSS = 1024 * 1024 * 1024
+DEFAULT_WORKER_MAX_MODULES = 50
+
+# Public re-export paths kept for a class or function, besides the
+# path of the module defining it
+MAX_SYMBOL_ALIASES = 3
+
+# How much a module means to re-export a name it has
+NOT_EXPORTED = 0
+# Imported in a package `__init__` whose `__all__` leaves it out
+PACKAGE_IMPORTED = 1
+# Imported in a package `__init__` without `__all__`
+PACKAGE_EXPORTED = 2
+# Listed in `__all__`
+EXPLICITLY_EXPORTED = 3
+
+# Part of the indexer timeout kept to write the shards and the index,
+# no more modules are started once the rest of it is spent
+SAVE_TIME_RESERVE = 0.25
+
+# Min seconds between two saves of the manifest while indexing, so the
+# distributions indexed so far are not indexed again after a crash
+MANIFEST_CHECKPOINT_INTERVAL = 5
+
+# Niceness of the indexer and its workers, so it doesn't compete with
+# the editor for the cpu
+DEFAULT_INDEXER_NICENESS = 10
+
+# Seconds between two checks of the pause file while indexing is paused
+PAUSE_POLL_INTERVAL = 0.2
+
+# Defaults of the pause of the indexer while the editor is in use, in
+# seconds, the plugin sends its own
+DEFAULT_INDEXER_IDLE_DELAY = 0
+DEFAULT_INDEXER_MAX_PAUSE = 60
+
+INDEXER_PAUSE_FILE_NAME = "py_rock_indexer.pause"
+
+# Default max size of the cache directory, least recently used
+# environments and shards are removed past it
+DEFAULT_INDEX_CACHE_MAX_SIZE = 512 * 1024 * 1024
+
+# Shard files named by a shard key, older ones were named by distribution
+SHARD_FILE_NAME_PATTERN = re.compile(r"-[0-9a-f]{16}(\.partial)?\.txt$")
+
+# Aliases like `typing.List`, python >= 3.9 has a base class shared by
+# `List` and `List[int]`, older versions only have `_GenericAlias`
+TYPING_ALIAS_TYPES = (getattr(typing, '_BaseGenericAlias', typing._GenericAlias),)
+
+# Events are written here, stdout is pointed to stderr while indexing
+# so nothing printed by the indexed packages gets mixed with the events
+_event_stream = sys.__stdout__
+
+# Lease of the running indexer, its events are recorded for the indexers
+# following its progress
+_event_lease: Optional[IndexLease] = None
+
+# Events of the indexer holding the lease handed to the plugin of the
+# indexers following it, its summary tells about another run
+FOLLOWED_EVENTS = ("started", "module_started", "module_finished")
+
+INDEXER_LEASE_FILE_NAME = "py_rock_indexer.lock"
+INDEXER_EVENTS_FILE_NAME = "py_rock_indexer_events.jsonl"
+
+
+def emit_event(event: str, **fields):
+    """
+        Writes an event for the plugin, one json object per line, the
+        events are:
+
+        started: distributions and modules to index
+        module_started: module
+        module_finished: module, symbols, duration, error and skipped if any
+        published: distributions and generation of the index saved with
+            the distributions the project imports, before the rest
+        paused: indexing waits for the editor to be idle
+        resumed: paused, seconds indexing was paused
+        summary: success, modules, symbols, duration, slowest_modules,
+            skipped_modules, unfinished_distributions and generation,
+            or success and followed when another indexer is still running
+        failed: message
+    """
+    line = json.dumps({"event": event, **fields}) + "\n"
+    if _event_lease is not None:
+        _event_lease.record_event(line)
+    try:
+        _event_stream.write(line)
+        _event_stream.flush()
+    except BrokenPipeError:
+        logger.debug("Broken pipe caught")
+
+
 class Indexer:
-    def __init__(self):
+    def __init__(self, settings: Optional[Dict] = None):
         self.import_path_count: int = 0
-        self.imports_map = defaultdict(lambda: defaultdict(lambda: []))
-    
-    def parse_serialized_settings(self):
-        settings_path = os.path.join(path.parent.parent, 'serialized_settings.json')
-        with open(settings_path, 'r') as f:
-            self.settings = json.load(f)
-
-    def save_imports_to_cache(self):
-        base_directory_path: str = self.settings["INDEX_CACHE_DIRECTORY"]
+        # Generation of the index in use once the run is done
+        self.index_generation: int = 0
+        # Seconds the run waited for the editor to be idle
+        self.paused_time: float = 0
+        # Import paths and kinds collected for the distribution being indexed
+        self.import_entries: List[ImportEntry] = []
+        # Symbol count, duration and error of every indexed module
+        self.module_stats: List[Dict] = []
+        self.module_error: Optional[str] = None
+        # Ids of the modules walked while indexing the current top level module
+        self.visited_modules: Set[int] = set()
+        # Classes and functions found while indexing the current top level
+        # module, by id, with their kind, every path exposing them and how
+        # much the module of the path exports them
+        self.symbol_aliases: Dict[int, Tuple[object, str, Dict[str, int]]] = {}
+        self.settings: Dict = settings if settings is not None else {}
+        self.last_manifest_checkpoint: float = 0
 
-        if not os.path.exists(base_directory_path):
-            os.mkdir(base_directory_path)
+    def parse_settings(self):
+        self.settings = json.loads(os.environ[SETTINGS_ENV_VAR])
 
-        file_path: str = os.path.join(base_directory_path, self.settings["IMPORT_INDEX_FILE_NAME"])
+    def save_imports_to_cache(self, import_entries: Iterable[ImportEntry], file_path: Optional[str] = None):
+        file_path = file_path or self._get_index_file_path()
 
         logger.debug(f"Saving imports index at: {file_path}")
 
-        with open(file_path, 'w') as f:
-            json.dump(self.imports_map, f)
+        if self._is_json_index_format():
+            JsonImportIndexWriter().write(file_path, import_entries, self._get_index_metadata())
+        else:
+            BinaryImportIndexWriter().write(file_path, import_entries, self._get_index_metadata())
+
+    def _is_json_index_format(self) -> bool:
+        return self.settings.get("INDEX_FORMAT", BINARY_INDEX_FORMAT) == JSON_INDEX_FORMAT
 
-    def _store_in_map(self, import_path: str):
-        entity: str = import_path.split('.')[-1]
-        first_letter: str = entity[0]
-        last_letter: str = entity[-1]
+    def _get_index_version(self) -> int:
+        return JSON_INDEX_VERSION if self._is_json_index_format() else BINARY_INDEX_VERSION
 
-        if first_letter not in self.imports_map:
-            self.imports_map[first_letter] = {}
+    def _get_index_metadata(self) -> Dict:
+        """
+            Written in the header of the index files, tells which plugin
+            version and which interpreter built them
+        """
+        return {
+            "producer": f"PyRock {self.settings.get('PACKAGE_VERSION', 'unknown')}",
+            "interpreter": f"{sys.implementation.name} {' '.join(sys.version.split())}",
+        }
 
-        if last_letter in self.imports_map[first_letter]:
-            self.imports_map[first_letter][last_letter].append(import_path)
-        else:
-            self.imports_map[first_letter][last_letter] = [import_path]
-        
+    def _store_import_path(self, import_path: str, kind: str = UNKNOWN_KIND):
+        self.import_entries.append((import_path, kind))
         self.import_path_count += 1
 
-    def get_class_members(self, module) -> List[Tuple[str, object]]:
+    def _get_member_kind(self, member_obj: object) -> Optional[str]:
+        if isinstance(member_obj, type):
+            return CLASS_KIND
+        if isinstance(member_obj, FunctionType):
+            return FUNCTION_KIND
+        if isinstance(member_obj, BuiltinFunctionType):
+            return BUILTIN_KIND
+        if isinstance(member_obj, TYPING_ALIAS_TYPES):
+            return ALIAS_KIND
+        return None
+
+    def classify_members(
+        self,
+        module: ModuleType,
+    ) -> Tuple[List[Tuple[str, object, str]], List[Tuple[str, ModuleType]]]:
+        """
+            Splits the module namespace in one pass, into the classes,
+            functions, builtins and typing aliases with their kind, and the
+            submodules. The namespace is read as is, no attribute is looked up.
+        """
+        members: List[Tuple[str, object, str]] = []
+        sub_modules: List[Tuple[str, ModuleType]] = []
+
         try:
-            return inspect.getmembers(module, inspect.isclass)
-        except Exception:
-            return []
+            namespace: Dict[str, object] = dict(vars(module))
+        except TypeError:
+            return members, sub_modules
+
+        for member_name, member_obj in namespace.items():
+            try:
+                # Lazy proxies can fail on their `__class__`
+                if isinstance(member_obj, ModuleType):
+                    sub_modules.append((member_name, member_obj))
+                    continue
+
+                kind = self._get_member_kind(member_obj)
+            except Exception:
+                continue
 
-    def get_function_members(self, module) -> List[Tuple[str, FunctionType]]:
+            if kind is not None:
+                members.append((member_name, member_obj, kind))
+
+        return members, sub_modules
+
+    def _index_module_members(
+        self,
+        parent_module_path: str,
+        module: ModuleType,
+    ) -> List[Tuple[str, ModuleType]]:
+        """
+            Collects the classes and functions of the module, returns its
+            submodules to walk next, the ones of its package and the ones
+            it re-exports
+        """
+        package_name = parent_module_path.split('.')[0]
+        exported_names: Optional[Set[str]] = self._get_exported_names(module)
+        is_package: bool = hasattr(module, '__path__')
+
+        members, sub_modules = self.classify_members(module)
+        for member_name, member_obj, kind in members:
+            # Special case to handle typing module classes
+            if kind == ALIAS_KIND and "typing" not in parent_module_path:
+                continue
+            self._add_symbol_alias(
+                member_obj,
+                kind,
+                f"{parent_module_path}.{member_name}",
+                self._get_export_level(exported_names, is_package, member_name),
+            )
+
+        walked_sub_modules: List[Tuple[str, ModuleType]] = []
+        for member_name, member_obj in sub_modules:
+            module_path = f"{parent_module_path}.{member_name}"
+            export_level = self._get_export_level(exported_names, is_package, member_name)
+
+            if self._is_owned_sub_module(package_name, member_obj) or self._is_re_exported_sub_module(
+                module_path, member_obj, export_level == EXPLICITLY_EXPORTED
+            ):
+                walked_sub_modules.append((member_name, member_obj))
+            elif self._is_implicitly_re_exported_module(member_name, member_obj, export_level):
+                # Importable from there, its members are indexed under its own path
+                self._store_import_path(module_path, MODULE_KIND)
+
+        return walked_sub_modules
+
+    def _get_exported_names(self, module: ModuleType) -> Optional[Set[str]]:
+        """
+            Names listed in `__all__`, None when the module has none
+        """
         try:
-            return inspect.getmembers(module, inspect.isfunction)
+            names = getattr(module, '__all__', None)
+            if names is None:
+                return None
+            return {name for name in names if isinstance(name, str)}
         except Exception:
-            return []
+            return set()
 
-    def get_module_members(self, module) -> List[Tuple[str, ModuleType]]:
+    def _get_export_level(self, exported_names: Optional[Set[str]], is_package: bool, member_name: str) -> int:
+        if exported_names is not None and member_name in exported_names:
+            return EXPLICITLY_EXPORTED
+        if is_package:
+            return PACKAGE_EXPORTED if exported_names is None else PACKAGE_IMPORTED
+        return NOT_EXPORTED
+
+    def _is_implicitly_re_exported_module(self, member_name: str, module: ModuleType, export_level: int) -> bool:
+        """
+            Module of another package bound to a public name of a package
+            `__init__` without `__all__`, like `from json import decoder`.
+            A top level module under its own name, like `import os`, is
+            imported from where it is.
+        """
+        return (
+            export_level == PACKAGE_EXPORTED
+            and not member_name.startswith('_')
+            and getattr(module, '__name__', None) != member_name
+        )
+
+    def _add_symbol_alias(self, member_obj: object, kind: str, import_path: str, export_level: int):
+        _, _, aliases = self.symbol_aliases.setdefault(id(member_obj), (member_obj, kind, {}))
+        aliases[import_path] = max(aliases.get(import_path, NOT_EXPORTED), export_level)
+
+    def _get_defining_module_name(self, member_obj: object) -> Optional[str]:
         try:
-            return inspect.getmembers(module, inspect.ismodule)
+            module_name = getattr(member_obj, '__module__', None)
         except Exception:
-            return []
+            return None
+        return module_name if isinstance(module_name, str) else None
 
-    def get_built_in_function_members(self, module):
+    def _get_canonical_path(self, member_obj: object) -> Optional[str]:
+        """
+            Path of the object in the module defining it, only when it can
+            really be imported from there
+        """
+        module_name = self._get_defining_module_name(member_obj)
         try:
-            return inspect.getmembers(module, inspect.isbuiltin)
+            qualified_name = getattr(member_obj, '__qualname__', None)
         except Exception:
-            return []
+            return None
+
+        # Nested classes and functions can't be imported
+        if module_name is None or not isinstance(qualified_name, str) or '.' in qualified_name:
+            return None
 
-    def get_all_members(self, module):
         try:
-            return inspect.getmembers(module)
+            if getattr(sys.modules.get(module_name), qualified_name, None) is not member_obj:
+                return None
         except Exception:
-            return []
+            return None
+        return f"{module_name}.{qualified_name}"
 
-    def _index_module_class_and_function_members(
+    def _is_private_path(self, import_path: str) -> bool:
+        return any(part.startswith('_') for part in import_path.split('.'))
+
+    def _rank_alias(self, import_path: str, export_level: int) -> Tuple:
+        return (
+            self._is_private_path(import_path),
+            -export_level,
+            import_path.count('.'),
+            len(import_path),
+            import_path,
+        )
+
+    def _get_symbol_import_paths(
         self,
-        parent_module_path: str,
-        module: ModuleType,
-    ):
-        module_classes: List[Tuple[str, object]] = self.get_class_members(module)
-        for class_name, class_obj in module_classes:
-            class_path = f"{parent_module_path}.{class_name}"
-            self._store_in_map(class_path)
-    
-        module_functions: List[Tuple[str, FunctionType]] = self.get_function_members(module)
-        for function_name, function_obj in module_functions:
-            function_path = f"{parent_module_path}.{function_name}"
-            self._store_in_map(function_path)
-
-        module_built_in_functions: List[Tuple[str, FunctionType]] = self.get_built_in_function_members(module)
-        for built_in_name, function_obj in module_built_in_functions:
-            built_in_path = f"{parent_module_path}.{built_in_name}"
-            self._store_in_map(built_in_path)
-
-        # Special case to handle typing module classes
-        if "typing" in parent_module_path:
-            all_members = self.get_all_members(module)
-            for member_name, member_obj in all_members:
-                if isinstance(member_obj, typing._GenericAlias):
-                    alias_path = f"{parent_module_path}.{member_name}"
-                    self._store_in_map(alias_path)
+        package_name: str,
+        member_obj: object,
+        aliases: Dict[str, int],
+    ) -> List[str]:
+        ranked_aliases: List[str] = sorted(
+            aliases, key=lambda import_path: self._rank_alias(import_path, aliases[import_path])
+        )
+
+        module_name = self._get_defining_module_name(member_obj)
+        if module_name is not None and not (
+            module_name == package_name or module_name.startswith(f"{package_name}.")
+        ):
+            # Defined by another package, which indexes it, kept only
+            # where this package lists it in `__all__`, or under a public
+            # name of a package `__init__` which has no `__all__`
+            return [
+                import_path for import_path in ranked_aliases
+                if aliases[import_path] == EXPLICITLY_EXPORTED or (
+                    aliases[import_path] == PACKAGE_EXPORTED and not self._is_private_path(import_path)
+                )
+            ][:MAX_SYMBOL_ALIASES]
+
+        canonical_path: Optional[str] = self._get_canonical_path(member_obj)
+        public_aliases: List[str] = [
+            import_path for import_path in ranked_aliases
+            if import_path != canonical_path and not self._is_private_path(import_path)
+        ]
+        # Modules which only import it for their own use are not re-exports,
+        # unless there is no better public path
+        exported_aliases: List[str] = [
+            import_path for import_path in public_aliases if aliases[import_path] != NOT_EXPORTED
+        ]
+        if not exported_aliases and (canonical_path is None or self._is_private_path(canonical_path)):
+            exported_aliases = public_aliases[:1]
+
+        if canonical_path is not None:
+            return [canonical_path] + exported_aliases[:MAX_SYMBOL_ALIASES]
+        return exported_aliases[:MAX_SYMBOL_ALIASES] or ranked_aliases[:1]
+
+    def _store_symbol_aliases(self, package_name: str):
+        """
+            Stores every class and function once under the module defining
+            it, plus its best public re-exports, instead of under every
+            module importing it
+        """
+        for member_obj, kind, aliases in self.symbol_aliases.values():
+            for import_path in self._get_symbol_import_paths(package_name, member_obj, aliases):
+                self._store_import_path(import_path, kind)
+        self.symbol_aliases = {}
+
+    def _is_owned_sub_module(self, package_name: str, module: ModuleType) -> bool:
+        module_name = getattr(module, '__name__', None)
+        return isinstance(module_name, str) and module_name.startswith(f"{package_name}.")
+
+    def _is_re_exported_sub_module(self, module_path: str, module: ModuleType, is_exported: bool) -> bool:
+        """
+            Module of another package the module means to expose, listed
+            in its `__all__` or importable under the alias, like `os.path`
+            which is `posixpath` or `ntpath`
+        """
+        return is_exported or sys.modules.get(module_path) is module
 
     def _index_sub_module_members(
         self,
         parent_module_name: str,
         sub_modules: List[Tuple[str, ModuleType]],
     ):
-        # Import depth, default 4
-        if len(parent_module_name.split('.')) >= self.settings["IMPORT_SCAN_DEPTH"]:
-            return []
-
-        for module_name, module_obj in sub_modules:
-            module_path = f"{parent_module_name}.{module_name}"
-            
-            self._index_module_class_and_function_members(
-                module_path,
-                module_obj
-            )
+        """
+            Walks the submodules breadth first, a submodule reachable from
+            more than one parent is indexed once, under its shortest path.
+            Modules imported from other packages, like `os` in `pkg.utils`,
+            are not walked, `pkg.utils.os.path.join` is never imported from,
+            unless they are re-exported, like `os.path`.
+        """
+        pending_modules: Deque[Tuple[str, List[Tuple[str, ModuleType]]]] = deque(
+            [(parent_module_name, sub_modules)]
+        )
 
-            self._store_in_map(module_path)
+        while pending_modules:
+            parent_module_name, sub_modules = pending_modules.popleft()
 
-            self._index_sub_module_members(
-                f"{parent_module_name}.{module_name}",
-                self.get_module_members(module_obj)
-            )
-    
-    def _run(self):
-        self.parse_serialized_settings()
+            # Import depth, default 4
+            if len(parent_module_name.split('.')) >= self.settings["IMPORT_SCAN_DEPTH"]:
+                continue
 
-        system_module_name_list: Set[str] = {
-            module[1] for module in pkgutil.iter_modules(
-                path=sys.path
-            )
-        }
+            for module_name, module_obj in sub_modules:
+                if id(module_obj) in self.visited_modules:
+                    continue
+                self.visited_modules.add(id(module_obj))
 
-        total_modules = len(system_module_name_list)
+                module_path = f"{parent_module_name}.{module_name}"
 
-        for index, module_name in enumerate(system_module_name_list):
-            if "sublime" in module_name or "xkcd" in module_name or "antigravity" in module_name:
-                continue
+                module_sub_modules = self._index_module_members(module_path, module_obj)
 
-            self._store_in_map(module_name)
+                self._store_import_path(module_path, MODULE_KIND)
 
-            sys.stdout = sys.stderr = os.devnull
+                if len(module_path.split('.')) < self.settings["IMPORT_SCAN_DEPTH"]:
+                    pending_modules.append((module_path, module_sub_modules))
+
+    def _index_imported_module(self, module_name: str) -> List[str]:
+        """
+            Imports the module inside the sandbox and indexes its members,
+            returns the calls blocked by the sandbox when the import failed
+        """
+        # Members are read inside the sandbox too, lazy module attributes
+        # can import more code
+        with ImportSandbox() as sandbox:
             try:
                 module: ModuleType = importlib.import_module(module_name)
             except Exception as e:
-                module = None
-            sys.stdout, sys.stderr = sys.__stdout__, sys.__stderr__
+                self.module_error = f"{type(e).__name__}: {e}"
+                return sandbox.blocked_calls
+
+            self.visited_modules = {id(module)}
+            self.symbol_aliases = {}
+
+            sub_modules: List[Tuple[str, ModuleType]] = self._index_module_members(module_name, module)
+            self._index_sub_module_members(module_name, sub_modules)
+
+            self._store_symbol_aliases(module_name)
+
+        return []
 
-            if module is None:
+    def index_module_statically(self, module_info: pkgutil.ModuleInfo):
+        """
+            Fallback for the modules which can't be imported, reads their
+            sources instead. Extension modules are left out, introspecting
+            them means importing them.
+        """
+        self._get_static_indexer().index_module(module_info)
+
+    def _get_static_indexer(self) -> StaticIndexer:
+        return StaticIndexer(
+            store=self._store_import_path,
+            scan_depth=self.settings["IMPORT_SCAN_DEPTH"],
+            extension_cache_path=os.path.join(
+                self.settings["INDEX_CACHE_DIRECTORY"],
+                self.settings["EXTENSION_CACHE_FILE_NAME"]
+            ),
+        )
+
+    def _get_environment_directory_path(self) -> str:
+        return get_environment_directory_path(self.settings)
+
+    def _discover_modules(self) -> Tuple[Dict[str, pkgutil.ModuleInfo], Dict[str, DistributionInfo]]:
+        return ModuleDiscovery(
+            cache_path=os.path.join(
+                self._get_environment_directory_path(),
+                self.settings["MODULE_DISCOVERY_CACHE_FILE_NAME"]
+            ),
+            include_patterns=self.settings.get("INCLUDE_MODULES"),
+            exclude_patterns=self.settings.get("EXCLUDE_MODULES"),
+        ).discover()
+
+    def _get_shard_store(self) -> ShardStore:
+        return ShardStore(
+            base_directory_path=self.settings["INDEX_CACHE_DIRECTORY"],
+            environment_directory_path=self._get_environment_directory_path(),
+            manifest_file_name=self.settings["DISTRIBUTIONS_MANIFEST_FILE_NAME"],
+            shards_directory_name=self.settings["INDEX_SHARDS_DIRECTORY_NAME"],
+        )
+
+    def _index_module(
+        self,
+        module_info: pkgutil.ModuleInfo,
+        static_indexer: Optional[StaticIndexer],
+    ):
+        self._store_import_path(module_info.name, MODULE_KIND)
+
+        if static_indexer:
+            static_indexer.index_module(module_info)
+            return
+
+        blocked_calls = self._index_imported_module(module_info.name)
+        if blocked_calls:
+            # Import failed on a side effect, like reaching the network
+            self.module_error += ", indexed from sources"
+            self.index_module_statically(module_info)
+
+    def index_distribution(
+        self,
+        distribution: DistributionInfo,
+        system_module_map: Dict[str, pkgutil.ModuleInfo],
+        static_indexer: Optional[StaticIndexer],
+        spill: SpillFile,
+        deadline: Optional[float] = None,
+        on_event: Optional[Callable[..., None]] = None,
+        wait_while_paused: Optional[Callable[[Optional[float]], Optional[float]]] = None,
+    ) -> Tuple[bool, Optional[float]]:
+        """
+            Indexes the modules of the distribution, their import paths are
+            added to the spill file module by module. Returns False when the
+            deadline is hit before every module is indexed, and the deadline
+            moved by the time paused.
+        """
+        self.import_entries = []
+        finished = True
+
+        for module_name in distribution.modules:
+            module_info = system_module_map.get(module_name)
+            if module_info is None:
                 continue
 
-            self._index_module_class_and_function_members(
-                module_name,
-                module
+            if wait_while_paused:
+                deadline = wait_while_paused(deadline)
+            if deadline is not None and time.monotonic() >= deadline:
+                finished = False
+                break
+
+            if on_event:
+                on_event("module_started", module=module_name)
+
+            start_time = time.perf_counter()
+            import_path_count = self.import_path_count
+            self.module_error = None
+
+            self._index_module(module_info, static_indexer)
+
+            spill.add(self.import_entries)
+            self.import_entries = []
+
+            module_stats: Dict = {
+                "module": module_name,
+                "symbols": self.import_path_count - import_path_count,
+                "duration": round(time.perf_counter() - start_time, 4),
+            }
+            if self.module_error:
+                module_stats["error"] = self.module_error
+            self.module_stats.append(module_stats)
+
+            if on_event:
+                on_event("module_finished", **module_stats)
+
+        # Only the run files are kept until the shard is written
+        spill.flush()
+        return finished, deadline
+
+    def _index_sequentially(
+        self,
+        distributions: List[DistributionInfo],
+        system_module_map: Dict[str, pkgutil.ModuleInfo],
+        static_indexer: StaticIndexer,
+        deadline: Optional[float],
+        shard_store: ShardStore,
+        write_shard: Callable[[str, SpillFile], None],
+    ) -> Tuple[Dict[str, SpillFile], Set[str]]:
+        """
+            Indexes the distributions one after the other, the shard of a
+            distribution is written as soon as it is done. Returns the spill
+            files of the distributions which are not fully indexed when the
+            deadline is hit, and their names.
+        """
+        distribution_spills: Dict[str, SpillFile] = {}
+        unfinished_distributions: Set[str] = set()
+
+        for distribution in distributions:
+            spill = shard_store.open_spill()
+            finished, deadline = self.index_distribution(
+                distribution, system_module_map, static_indexer, spill, deadline, emit_event, self._wait_while_paused
             )
+            if not finished:
+                distribution_spills[distribution.name] = spill
+                unfinished_distributions.add(distribution.name)
+                continue
 
-            sub_modules: List[Tuple[str, ModuleType]] = self.get_module_members(module)
-            self._index_sub_module_members(module_name, sub_modules)
+            self._flush_extension_modules(static_indexer, [distribution], {distribution.name: spill})
+            write_shard(distribution.name, spill)
 
-            progress = int((index/total_modules) * 100)
+        return distribution_spills, unfinished_distributions
 
+    def _emit_worker_progress(self, progress_queue: "queue.Queue[Tuple[str, Dict]]"):
+        while True:
             try:
-                print(progress, flush=True)
-            except BrokenPipeError:
-                if progress < 90:
-                    continue
-                logger.debug("Broken pipe caught")
-        
+                event, fields = progress_queue.get_nowait()
+            except queue.Empty:
+                return
+
+            if event == "module_finished":
+                self.module_stats.append(fields)
+            emit_event(event, **fields)
+
+    def _index_in_parallel(
+        self,
+        distributions: List[DistributionInfo],
+        static_indexer: StaticIndexer,
+        worker_count: int,
+        deadline: Optional[float],
+        write_shard: Callable[[str, SpillFile], None],
+    ) -> Tuple[Dict[str, SpillFile], Set[str]]:
+        """
+            Indexes chunks of distributions in a pool of workers, the shards
+            of a chunk are written as soon as it is done. No more chunks are
+            started once the deadline is hit, returns the spill files of the
+            distributions which are not fully indexed, and their names.
+        """
+        total_modules = max(1, sum(len(distribution.modules) for distribution in distributions))
+        chunk_module_count = max(1, total_modules // (worker_count * CHUNKS_PER_WORKER))
+
+        # Distributions are never split, a chunk gets whole distributions
+        # until it has its share of modules
+        chunks: List[List[DistributionInfo]] = [[]]
+        chunk_modules = 0
+        for distribution in distributions:
+            if chunk_modules >= chunk_module_count:
+                chunks.append([])
+                chunk_modules = 0
+            chunks[-1].append(distribution)
+            chunk_modules += len(distribution.modules)
+
+        pending_chunks: Deque[List[DistributionInfo]] = deque(chunk for chunk in chunks if chunk)
+        distribution_spills: Dict[str, SpillFile] = {}
+        unfinished_distributions: Set[str] = set()
+
+        with multiprocessing.Manager() as manager, ProcessPoolExecutor(
+            max_workers=worker_count,
+            initializer=_initialize_worker,
+            initargs=(self.settings,),
+        ) as executor:
+            # Workers report their modules as they go, not once their chunk is done
+            progress_queue = manager.Queue()
+            futures: Dict[Future, List[DistributionInfo]] = {}
+
+            while pending_chunks or futures:
+                # Submitted as workers get free, so the pause and the deadline
+                # hold back the chunks not started yet
+                while pending_chunks and len(futures) < worker_count:
+                    deadline = self._wait_while_paused(deadline)
+                    if deadline is not None and time.monotonic() >= deadline:
+                        unfinished_distributions.update(
+                            distribution.name for chunk in pending_chunks for distribution in chunk
+                        )
+                        pending_chunks.clear()
+                        break
+
+                    chunk = pending_chunks.popleft()
+                    futures[executor.submit(_index_distribution_chunk, chunk, deadline, progress_queue)] = chunk
+
+                if not futures:
+                    break
+
+                done, _ = wait(futures, timeout=PROGRESS_POLL_INTERVAL, return_when=FIRST_COMPLETED)
+                # Queued before the chunk returns, its modules are reported first
+                self._emit_worker_progress(progress_queue)
+
+                for future in done:
+                    chunk = futures.pop(future)
+                    chunk_spills, chunk_unfinished_distributions, import_path_count, pending_extension_modules = (
+                        future.result()
+                    )
+                    self.import_path_count += import_path_count
+
+                    finished_distributions = [
+                        distribution for distribution in chunk
+                        if distribution.name not in chunk_unfinished_distributions
+                    ]
+                    static_indexer.pending_extension_modules.update(pending_extension_modules)
+                    self._flush_extension_modules(static_indexer, finished_distributions, chunk_spills)
+
+                    for distribution in finished_distributions:
+                        write_shard(distribution.name, chunk_spills.pop(distribution.name))
+                    distribution_spills.update(chunk_spills)
+                    unfinished_distributions.update(chunk_unfinished_distributions)
+
+        return distribution_spills, unfinished_distributions
+
+    def _index_in_supervised_workers(
+        self,
+        distributions: List[DistributionInfo],
+        system_module_map: Dict[str, pkgutil.ModuleInfo],
+        worker_count: int,
+        deadline: Optional[float],
+        shard_store: ShardStore,
+        write_shard: Callable[[str, SpillFile], None],
+    ) -> Tuple[Dict[str, SpillFile], Set[str]]:
+        """
+            Imports every top level module in a supervised worker, the shard
+            of a distribution is written as soon as all its modules are
+            indexed. Returns the spill files of the distributions which are
+            not fully indexed when the deadline is hit, and their names.
+            Modules whose worker was killed are indexed from their sources.
+        """
+        module_owners: Dict[str, List[str]] = defaultdict(list)
+        for distribution in distributions:
+            for module_name in distribution.modules:
+                module_owners[module_name].append(distribution.name)
+
+        distribution_spills: Dict[str, SpillFile] = {
+            distribution.name: shard_store.open_spill() for distribution in distributions
+        }
+        remaining_module_counts: Dict[str, int] = {
+            distribution.name: len(distribution.modules) for distribution in distributions
+        }
+        # Namespace packages are shared by distributions, imported only once
+        pending_modules: Set[str] = set(module_owners)
+
+        for distribution_name, remaining_module_count in remaining_module_counts.items():
+            if remaining_module_count == 0:
+                write_shard(distribution_name, distribution_spills.pop(distribution_name))
+
+        supervisor = ModuleSupervisor(
+            index_module=_index_module_in_worker,
+            initializer=_initialize_worker,
+            initargs=(self.settings,),
+            worker_count=worker_count,
+            module_timeout=self.settings.get("MODULE_TIMEOUT", DEFAULT_MODULE_TIMEOUT),
+            max_rss=self.settings.get("WORKER_MAX_RSS", DEFAULT_WORKER_MAX_RSS),
+            max_modules=self.settings.get("WORKER_MAX_MODULES", DEFAULT_WORKER_MAX_MODULES),
+            on_module_started=lambda module_name: emit_event("module_started", module=module_name),
+        )
+
+        for result in supervisor.run(
+            list(module_owners), deadline=deadline, wait_while_paused=self._wait_while_paused
+        ):
+            pending_modules.discard(result.module)
+            import_entries = result.import_entries
+
+            if result.skipped and result.module in system_module_map:
+                fallback_indexer = Indexer(self.settings)
+                fallback_indexer._store_import_path(result.module, MODULE_KIND)
+                fallback_indexer.index_module_statically(system_module_map[result.module])
+                import_entries = fallback_indexer.import_entries
+
+            for distribution_name in module_owners[result.module]:
+                distribution_spills[distribution_name].add(import_entries)
+                remaining_module_counts[distribution_name] -= 1
+                if remaining_module_counts[distribution_name] == 0:
+                    write_shard(distribution_name, distribution_spills.pop(distribution_name))
+            self.import_path_count += len(import_entries)
+
+            module_stats: Dict = {
+                "module": result.module,
+                "symbols": len(import_entries),
+                "duration": result.duration,
+            }
+            if result.error:
+                module_stats["error"] = result.error
+            if result.skipped:
+                module_stats["skipped"] = True
+            self.module_stats.append(module_stats)
+            emit_event("module_finished", **module_stats)
+
+        unfinished_distributions: Set[str] = {
+            distribution_name
+            for module_name in pending_modules
+            for distribution_name in module_owners[module_name]
+        }
+        return distribution_spills, unfinished_distributions
+
+    def _flush_extension_modules(
+        self,
+        static_indexer: StaticIndexer,
+        distributions: List[DistributionInfo],
+        distribution_spills: Dict[str, SpillFile],
+    ):
+        """
+            Extension modules found for the distributions are introspected
+            together here, in the main process, so the extension cache has
+            a single writer
+        """
+        module_owners: Dict[str, List[str]] = defaultdict(list)
+        for distribution in distributions:
+            for module_name in distribution.modules:
+                module_owners[module_name].append(distribution.name)
+
+        # The ones of distributions left unfinished wait for the next run
+        static_indexer.pending_extension_modules = {
+            module_path: file_path
+            for module_path, file_path in static_indexer.pending_extension_modules.items()
+            if module_path.split('.')[0] in module_owners
+        }
+
+        def store_extension_import_path(import_path: str, kind: str):
+            for distribution_name in module_owners[import_path.split('.')[0]]:
+                distribution_spills[distribution_name].add([(import_path, kind)])
+            self.import_path_count += 1
+
+        static_indexer.flush_extension_modules(store=store_extension_import_path)
+
+    def _get_shard_keys(self, distributions: Dict[str, DistributionInfo]) -> Dict[str, str]:
+        """
+            Shard key of every distribution, same for every environment
+            having the distribution installed and indexed the same way
+        """
+        python_build = f"{sys.implementation.name}-{sys.version_info[0]}.{sys.version_info[1]}"
+        return {
+            distribution.name: get_shard_key(
+                distribution.name,
+                distribution.version,
+                [
+                    distribution.record_hash,
+                    ",".join(distribution.modules),
+                    self.settings.get("INDEXER_ENGINE", IMPORT_ENGINE),
+                    str(self.settings["IMPORT_SCAN_DEPTH"]),
+                    python_build,
+                ],
+            )
+            for distribution in distributions.values()
+        }
+
+    def _get_environment_identity(self, shard_keys: Dict[str, str]) -> Dict:
+        """
+            Interpreter the index is built for and the state of its
+            installed distributions, the index is up to date while it
+            stays the same
+        """
+        return {
+            "prefix": sys.prefix,
+            "version": sys.version,
+            "executable": sys.executable,
+            "site_hash": hashlib.sha1("\n".join(sorted(shard_keys.values())).encode('utf-8')).hexdigest(),
+        }
+
+    def _get_distributions_to_index(
+        self,
+        distributions: Dict[str, DistributionInfo],
+        shard_keys: Dict[str, str],
+        shard_store: ShardStore,
+        manifest: Dict,
+    ) -> List[DistributionInfo]:
+        requested_distributions: Set[str] = set(self.settings.get("REINDEX_DISTRIBUTIONS", []))
+        full_reindex: bool = self.settings.get("FULL_REINDEX", False)
+        indexed_distributions: Dict[str, Dict] = manifest.get("distributions", {})
+        # Left by a previous run, a forced one keeps their shard of before
+        unfinished_distributions: Set[str] = set(manifest.get("unfinished_distributions", []))
+
+        def needs_index(distribution: DistributionInfo) -> bool:
+            shard_key = shard_keys[distribution.name]
+            if distribution.name in requested_distributions or distribution.name in unfinished_distributions:
+                return True
+            if indexed_distributions and distribution.name not in indexed_distributions:
+                # Installed since the last run or left out of it, a new
+                # environment uses the shards of the others as they are
+                return True
+            if distribution.name == STDLIB_DISTRIBUTION_NAME:
+                # Never changes for a python build, only indexed again
+                # when asked for by name
+                return not os.path.exists(self._get_stdlib_index_path(shard_key)) and not shard_store.has_shard(shard_key)
+            # A shard indexed for another environment is used as it is
+            return full_reindex or not shard_store.has_shard(shard_key)
+
+        return [distribution for distribution in distributions.values() if needs_index(distribution)]
+
+    def _get_manifest(
+        self,
+        distributions: Dict[str, DistributionInfo],
+        excluded_distributions: Set[str],
+        shard_keys: Dict[str, str],
+        environment: Dict,
+    ) -> Dict:
+        return {
+            # Index file is migrated, or rebuilt from the shards, when its
+            # version changes
+            "index_version": self._get_index_version(),
+            "environment": environment,
+            "distributions": {
+                distribution.name: {**distribution._asdict(), "shard": shard_keys[distribution.name]}
+                for distribution in distributions.values()
+                if distribution.name not in excluded_distributions
+            },
+            # Indexed again by the next run, whatever shard they have
+            "unfinished_distributions": sorted(excluded_distributions),
+        }
+
+    def _checkpoint_manifest(
+        self,
+        shard_store: ShardStore,
+        distributions: Dict[str, DistributionInfo],
+        pending_distributions: Set[str],
+        shard_keys: Dict[str, str],
+        environment: Dict,
+    ):
+        """
+            Saves the distributions whose shard is written so far, without
+            the index version, the index file is not rebuilt yet
+        """
+        now = time.monotonic()
+        if now - self.last_manifest_checkpoint < MANIFEST_CHECKPOINT_INTERVAL:
+            return
+        self.last_manifest_checkpoint = now
+
+        manifest = self._get_manifest(distributions, pending_distributions, shard_keys, environment)
+        del manifest["index_version"]
+        shard_store.save_manifest(manifest)
+
+    def _get_index_file_path(self) -> str:
+        return get_index_file_path(self.settings)
+
+    def _get_snapshot_path(self, generation: int, stdlib: bool = False) -> str:
+        return get_snapshot_path(get_index_file_path(self.settings, stdlib=stdlib), generation)
+
+    def _get_stdlib_index_path(self, stdlib_shard_key: str) -> str:
+        """
+            Prebuilt index of the standard library, shared by all the
+            environments of the same python build
+        """
+        extension = os.path.splitext(self._get_index_file_path())[1]
+        return os.path.join(
+            self.settings["INDEX_CACHE_DIRECTORY"],
+            self.settings["STDLIB_INDEX_DIRECTORY_NAME"],
+            f"{stdlib_shard_key}{extension}",
+        )
+
+    def _link_index_file(self, file_path: str, link_path: str, copy: bool = False):
+        try:
+            os.remove(link_path)
+        except OSError:
+            pass
+        if not copy:
+            try:
+                os.link(file_path, link_path)
+                return
+            except OSError:
+                pass
+        shutil.copyfile(file_path, link_path)
+
+    def _save_stdlib_index(self, shard_store: ShardStore, stdlib_shard_key: str, generation: int) -> bool:
+        """
+            Builds the standard library index from its shard when it was
+            just indexed and links it in the environment directory for the
+            generation, returns False when there is no complete standard
+            library index yet
+        """
+        stdlib_index_path = self._get_stdlib_index_path(stdlib_shard_key)
+
+        if shard_store.has_shard(stdlib_shard_key):
+            os.makedirs(os.path.dirname(stdlib_index_path), exist_ok=True)
+            self.save_imports_to_cache(shard_store.read_shard(stdlib_shard_key), stdlib_index_path)
+            # The index replaces the shard, it is never merged again
+            shard_store.delete_shard(stdlib_shard_key)
+
+        if not os.path.exists(stdlib_index_path):
+            return False
+
+        shard_store.touch(stdlib_index_path)
+        # Not copied, every environment shares the same file, except on
+        # windows where readers mapping it would keep it from being rebuilt
+        self._link_index_file(
+            stdlib_index_path, self._get_snapshot_path(generation, stdlib=True), copy=sys.platform == 'win32'
+        )
+        return True
+
+    def _upgrade_index_file(self, file_path: str, migrated_file_path: Optional[str] = None) -> bool:
+        """
+            Migrates an index file of a previous version to
+            `migrated_file_path`, in place when not given, and checks it, a
+            corrupted one or one of another interpreter is removed.
+            Returns True when the file was migrated.
+        """
+        metadata = self._get_index_metadata()
+        migrated_file_path = migrated_file_path or file_path
+        migrated_version: Optional[int] = None
+        try:
+            migrated_version = migrate_index_file(file_path, metadata, migrated_file_path)
+            import_index = open_index_file(migrated_file_path if migrated_version is not None else file_path)
+            try:
+                is_usable = import_index.is_valid() and (
+                    import_index.get_metadata().get("interpreter", metadata["interpreter"]) == metadata["interpreter"]
+                )
+            finally:
+                import_index.close()
+        except (InvalidIndexFile, OSError, ValueError) as e:
+            logger.debug(f"Unable to read index file {file_path}: {e}")
+            is_usable = False
+
+        if not is_usable:
+            logger.warning(f"Removing corrupted or foreign index file {file_path}, it is built again")
+            for removed_file_path in {file_path, migrated_file_path}:
+                try:
+                    os.remove(removed_file_path)
+                except OSError:
+                    pass
+            return False
+
+        if migrated_version is not None:
+            logger.debug(f"Migrated index file {file_path} from version {migrated_version}")
+        return migrated_version is not None
+
+    def _upgrade_index_files(self, shard_store: ShardStore, manifest: Dict, shard_keys: Dict[str, str]):
+        """
+            Index files written by a previous version of the plugin are
+            migrated to the next generation instead of built again,
+            corrupted ones are built again from the shards
+        """
+        generation = read_index_generation(get_index_generation_file_path(self.settings))
+        index_file_path = self._get_snapshot_path(generation)
+        migrated_index_file_path = self._get_snapshot_path(generation + 1)
+
+        is_index_migrated = os.path.exists(index_file_path) and self._upgrade_index_file(
+            index_file_path, migrated_index_file_path
+        )
+        is_stdlib_migrated = False
+        if STDLIB_DISTRIBUTION_NAME in shard_keys:
+            stdlib_index_path = self._get_stdlib_index_path(shard_keys[STDLIB_DISTRIBUTION_NAME])
+            if os.path.exists(stdlib_index_path):
+                # Shared, not mapped by the readers on windows, see `_save_stdlib_index`
+                is_stdlib_migrated = self._upgrade_index_file(stdlib_index_path)
+
+        if not is_index_migrated and not is_stdlib_migrated:
+            return
+
+        if is_index_migrated and "index_version" in manifest:
+            # Manifest only has the version once the index file is complete
+            manifest["index_version"] = self._get_index_version()
+            shard_store.save_manifest(manifest)
+
+        # Both files of the next generation are in place before readers load them
+        if not is_index_migrated and os.path.exists(index_file_path):
+            self._link_index_file(index_file_path, migrated_index_file_path)
+        if STDLIB_DISTRIBUTION_NAME in shard_keys:
+            self._save_stdlib_index(shard_store, shard_keys[STDLIB_DISTRIBUTION_NAME], generation + 1)
+
+        self.index_generation = write_index_generation(get_index_generation_file_path(self.settings))
+        self._remove_previous_snapshots()
+
+    def _remove_previous_snapshots(self):
+        for stdlib in (False, True):
+            remove_previous_snapshots(get_index_file_path(self.settings, stdlib=stdlib), self.index_generation)
+
+    def _remove_legacy_cache_files(self, shard_store: ShardStore):
+        """
+            Removes the files of the single index kept before the indexes
+            were kept per environment. It was not versioned and has no
+            shards to build from, so it is not migrated, the first run
+            after the upgrade indexes everything again.
+        """
+        base_directory_path: str = self.settings["INDEX_CACHE_DIRECTORY"]
+        for file_name in (
+            self.settings["IMPORT_INDEX_FILE_NAME"],
+            self.settings["BINARY_INDEX_FILE_NAME"],
+            self.settings["DISTRIBUTIONS_MANIFEST_FILE_NAME"],
+            self.settings["MODULE_DISCOVERY_CACHE_FILE_NAME"],
+        ):
+            try:
+                os.remove(os.path.join(base_directory_path, file_name))
+            except OSError:
+                pass
+
+        shutil.rmtree(os.path.join(shard_store.shards_directory_path, SPILL_DIRECTORY_NAME), ignore_errors=True)
+
+        try:
+            shard_file_names = os.listdir(shard_store.shards_directory_path)
+        except OSError:
+            return
+        for file_name in shard_file_names:
+            if file_name.endswith(".txt") and not SHARD_FILE_NAME_PATTERN.search(file_name):
+                try:
+                    os.remove(os.path.join(shard_store.shards_directory_path, file_name))
+                except OSError:
+                    pass
+
+    def _prune_cache(self, shard_store: ShardStore, shard_keys: Dict[str, str]):
+        protected_paths: Set[str] = {shard_store.environment_directory_path}
+        for shard_key in shard_keys.values():
+            protected_paths.add(shard_store.get_shard_path(shard_key))
+            protected_paths.add(shard_store.get_shard_path(shard_key, partial=True))
+        if STDLIB_DISTRIBUTION_NAME in shard_keys:
+            protected_paths.add(self._get_stdlib_index_path(shard_keys[STDLIB_DISTRIBUTION_NAME]))
+
+        freed_size = prune_index_cache(
+            base_directory_path=self.settings["INDEX_CACHE_DIRECTORY"],
+            directory_names=[
+                self.settings["ENVIRONMENTS_DIRECTORY_NAME"],
+                self.settings["INDEX_SHARDS_DIRECTORY_NAME"],
+                self.settings["STDLIB_INDEX_DIRECTORY_NAME"],
+            ],
+            max_size=self.settings.get("INDEX_CACHE_MAX_SIZE", DEFAULT_INDEX_CACHE_MAX_SIZE),
+            protected_paths=protected_paths,
+        )
+        if freed_size:
+            logger.debug(f"Removed {freed_size} bytes of least recently used indexes from the cache")
+
+    def _emit_summary(self, start_time: float, unfinished_distributions: int = 0):
+        slowest_modules = sorted(
+            self.module_stats, key=lambda module_stats: module_stats["duration"], reverse=True
+        )[:SLOWEST_MODULES_COUNT]
+
+        emit_event(
+            "summary",
+            success=True,
+            modules=len(self.module_stats),
+            symbols=self.import_path_count,
+            duration=round(time.perf_counter() - start_time, 4),
+            slowest_modules=[
+                [module_stats["module"], module_stats["duration"]] for module_stats in slowest_modules
+            ],
+            skipped_modules=[
+                module_stats["module"] for module_stats in self.module_stats if module_stats.get("skipped")
+            ],
+            # Indexed on the next run
+            unfinished_distributions=unfinished_distributions,
+            generation=self.index_generation,
+        )
+
+    def _split_priority_distributions(
+        self,
+        distributions: List[DistributionInfo],
+    ) -> Tuple[List[DistributionInfo], List[DistributionInfo]]:
+        """
+            Splits the distributions in the ones installing a module the
+            project imports, sent by the plugin, and the rest
+        """
+        priority_modules: Set[str] = set(self.settings.get("PRIORITY_MODULES") or [])
+        priority_distributions: List[DistributionInfo] = []
+        other_distributions: List[DistributionInfo] = []
+
+        for distribution in distributions:
+            if priority_modules.intersection(distribution.modules):
+                priority_distributions.append(distribution)
+            else:
+                other_distributions.append(distribution)
+        return priority_distributions, other_distributions
+
+    def _index_distributions(
+        self,
+        distributions: List[DistributionInfo],
+        system_module_map: Dict[str, pkgutil.ModuleInfo],
+        worker_count: int,
+        deadline: Optional[float],
+        shard_store: ShardStore,
+        shard_keys: Dict[str, str],
+        write_shard: Callable[[str, SpillFile], None],
+    ) -> Set[str]:
+        """
+            Indexes the distributions and writes their shards, returns the
+            distributions left unfinished
+        """
+        static_indexer: Optional[StaticIndexer] = None
+        if self.settings.get("INDEXER_ENGINE", IMPORT_ENGINE) == STATIC_ENGINE:
+            static_indexer = self._get_static_indexer()
+
+        if static_indexer is None:
+            # Importing runs package code, which can hang or eat memory
+            distribution_spills, unfinished_distributions = self._index_in_supervised_workers(
+                distributions, system_module_map, worker_count, deadline, shard_store, write_shard
+            )
+        elif worker_count > 1 and len(distributions) > 1:
+            distribution_spills, unfinished_distributions = self._index_in_parallel(
+                distributions, static_indexer, worker_count, deadline, write_shard
+            )
+        else:
+            distribution_spills, unfinished_distributions = self._index_sequentially(
+                distributions, system_module_map, static_indexer, deadline, shard_store, write_shard
+            )
+
+        # The shards of the finished distributions are written already
+        for distribution_name, spill in distribution_spills.items():
+            if shard_store.has_shard(shard_keys[distribution_name]):
+                # A partial shard doesn't replace the one of a previous run
+                spill.remove()
+            else:
+                # Kept apart, so no environment takes it for a complete one
+                shard_store.write_shard(shard_keys[distribution_name], spill, partial=True)
+
+        return unfinished_distributions
+
+    def _publish_index(self, shard_store: ShardStore, shard_keys: Dict[str, str]):
+        """
+            Saves the index merged from the shards as the next generation
+            and bumps the generation, the files of the previous ones are
+            removed once readers are told to load it
+        """
+        generation = read_index_generation(get_index_generation_file_path(self.settings)) + 1
+        merged_shard_keys: List[str] = list(shard_keys.values())
+        # Both in place before the generation tells the readers to load them
+        if STDLIB_DISTRIBUTION_NAME in shard_keys and self._save_stdlib_index(
+            shard_store, shard_keys[STDLIB_DISTRIBUTION_NAME], generation
+        ):
+            # Looked up along with the index, left out of it
+            merged_shard_keys.remove(shard_keys[STDLIB_DISTRIBUTION_NAME])
+
+        # Shards are merged from disk without duplicates, the index writer
+        # still builds its tables in memory, sized by the unique paths
+        self.save_imports_to_cache(shard_store.merge_shards(merged_shard_keys), self._get_snapshot_path(generation))
+        # Readers keep the previous snapshot until the new one is complete
+        self.index_generation = write_index_generation(get_index_generation_file_path(self.settings))
+        self._remove_previous_snapshots()
+
+    def _lower_priority(self):
+        """
+            Runs the indexer, and the workers it starts, below the editor,
+            both for the cpu and the disk where the platform allows it
+        """
+        niceness: int = self.settings.get("INDEXER_NICENESS", DEFAULT_INDEXER_NICENESS)
+        if not niceness:
+            return
+
+        if hasattr(os, 'nice'):
+            try:
+                os.nice(niceness)
+            except OSError:
+                logger.debug("Unable to lower the indexer cpu priority")
+        elif sys.platform == 'win32':
+            import ctypes
+            below_normal_priority_class = 0x4000
+            kernel32 = ctypes.windll.kernel32
+            kernel32.SetPriorityClass(kernel32.GetCurrentProcess(), below_normal_priority_class)
+
+        ionice_path = shutil.which('ionice')
+        if ionice_path and sys.platform.startswith('linux'):
+            # Idle class, the disk is only used when nothing else needs it
+            subprocess.run(
+                [ionice_path, '-c', '3', '-p', str(os.getpid())],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                check=False,
+            )
+
+    def _get_pause_file_path(self) -> str:
+        return os.path.join(
+            self._get_environment_directory_path(),
+            self.settings.get("INDEXER_PAUSE_FILE_NAME") or INDEXER_PAUSE_FILE_NAME,
+        )
+
+    def _is_paused(self) -> bool:
+        """
+            The plugin touches the pause file while the user types, indexing
+            waits until it is left untouched for the idle delay
+        """
+        try:
+            touched_time = os.stat(self._get_pause_file_path()).st_mtime
+        except OSError:
+            return False
+        return time.time() - touched_time < self.settings.get("INDEXER_IDLE_DELAY", DEFAULT_INDEXER_IDLE_DELAY)
+
+    def _wait_while_paused(self, deadline: Optional[float]) -> Optional[float]:
+        """
+            Blocks while the editor is in use and returns the deadline moved
+            by the time paused. Once the run has been paused for the max
+            pause the deadline is now, what is left is indexed on the next run.
+        """
+        if not self._is_paused():
+            return deadline
+
+        max_pause: float = self.settings.get("INDEXER_MAX_PAUSE", DEFAULT_INDEXER_MAX_PAUSE)
+        pause_start_time = time.monotonic()
+        emit_event("paused")
+
+        while self._is_paused() and self.paused_time + time.monotonic() - pause_start_time < max_pause:
+            time.sleep(PAUSE_POLL_INTERVAL)
+
+        paused_time = time.monotonic() - pause_start_time
+        self.paused_time += paused_time
+        emit_event("resumed", paused=round(paused_time, 4))
+
+        if self.paused_time >= max_pause:
+            logger.debug("Paused for too long, leaving the rest for the next run")
+            return time.monotonic()
+        return deadline + paused_time if deadline is not None else None
+
+    def _get_lease(self) -> IndexLease:
+        environment_directory_path = self._get_environment_directory_path()
+        return IndexLease(
+            os.path.join(
+                environment_directory_path,
+                self.settings.get("INDEXER_LEASE_FILE_NAME") or INDEXER_LEASE_FILE_NAME,
+            ),
+            os.path.join(
+                environment_directory_path,
+                self.settings.get("INDEXER_EVENTS_FILE_NAME") or INDEXER_EVENTS_FILE_NAME,
+            ),
+        )
+
+    def _acquire_lease(self, deadline: Optional[float]) -> Optional[IndexLease]:
+        """
+            Takes the lease of the environment, while another indexer holds
+            it its progress is followed, returns None when the deadline
+            comes before it is done
+        """
+        lease = self._get_lease()
+
+        def on_event(event: Dict):
+            if event.get("event") in FOLLOWED_EVENTS:
+                emit_event(**event)
+
+        while not lease.acquire():
+            logger.debug("Another indexer is running, following its progress")
+            if not lease.follow(on_event, deadline):
+                return None
+        return lease
+
+    def _run(self):
+        global _event_lease
+        start_time = time.perf_counter()
+
+        if not self.settings:
+            self.parse_settings()
+
+        deadline: Optional[float] = None
+        if self.settings.get("INDEXER_TIMEOUT"):
+            deadline = time.monotonic() + self.settings["INDEXER_TIMEOUT"] * (1 - SAVE_TIME_RESERVE)
+
+        environment_directory_path = self._get_environment_directory_path()
+        os.makedirs(environment_directory_path, exist_ok=True)
+
+        lease = self._acquire_lease(deadline)
+        if lease is None:
+            # Left to the indexer holding the lease, it saves the index
+            emit_event("summary", success=True, followed=True)
+            return
+
+        _event_lease = lease
+        try:
+            # Once the previous indexer is done, only what it left is indexed
+            self._index(start_time, deadline, environment_directory_path)
+        finally:
+            _event_lease = None
+            lease.release()
+
+    def _index(self, start_time: float, deadline: Optional[float], environment_directory_path: str):
+        shard_store = self._get_shard_store()
+        # Marks the environment as used, the last one pruned from the cache
+        shard_store.touch(environment_directory_path)
+        self._remove_legacy_cache_files(shard_store)
+        shard_store.clear_spill()
+        manifest: Dict = shard_store.load_manifest()
+
+        system_module_map, distributions = self._discover_modules()
+        shard_keys = self._get_shard_keys(distributions)
+        environment = self._get_environment_identity(shard_keys)
+        self._upgrade_index_files(shard_store, manifest, shard_keys)
+
+        distributions_to_index = self._get_distributions_to_index(distributions, shard_keys, shard_store, manifest)
+
+        logger.debug(f"Distributions to index: {len(distributions_to_index)} of {len(distributions)}")
+
+        emit_event(
+            "started",
+            distributions=len(distributions_to_index),
+            modules=sum(len(distribution.modules) for distribution in distributions_to_index),
+        )
+
+        generation = read_index_generation(get_index_generation_file_path(self.settings))
+        if (
+            not distributions_to_index
+            and manifest.get("environment") == environment
+            and manifest.get("index_version") == self._get_index_version()
+            and os.path.exists(self._get_snapshot_path(generation))
+            and (
+                STDLIB_DISTRIBUTION_NAME not in distributions
+                or os.path.exists(self._get_snapshot_path(generation, stdlib=True))
+            )
+        ):
+            logger.debug("Index is up to date")
+            self.index_generation = generation
+            # Left by a previous run while a reader had them mapped
+            self._remove_previous_snapshots()
+            self._emit_summary(start_time)
+            return
+
+        worker_count: int = self.settings.get("INDEXER_WORKERS", 1)
+        unfinished_distributions: Set[str] = set()
+        pending_distributions: Set[str] = {distribution.name for distribution in distributions_to_index}
+
+        def write_shard(distribution_name: str, spill: SpillFile):
+            shard_store.write_shard(shard_keys[distribution_name], spill)
+            pending_distributions.discard(distribution_name)
+            self._checkpoint_manifest(shard_store, distributions, pending_distributions, shard_keys, environment)
+
+        # Saved before anything is indexed, a run killed before its next
+        # checkpoint still leaves them to the next run
+        self._checkpoint_manifest(shard_store, distributions, pending_distributions, shard_keys, environment)
+
+        priority_distributions, other_distributions = self._split_priority_distributions(distributions_to_index)
+        if priority_distributions and other_distributions:
+            logger.debug(f"Indexing first the {len(priority_distributions)} distributions the project imports")
+            unfinished_distributions |= self._index_distributions(
+                priority_distributions, system_module_map, worker_count, deadline, shard_store, shard_keys, write_shard
+            )
+
+            # Lookups get the imports of the project while the rest is
+            # indexed, the rest keep the shards of their previous version
+            previous_shard_keys: Dict[str, str] = {
+                distribution_name: distribution["shard"]
+                for distribution_name, distribution in manifest.get("distributions", {}).items()
+                if distribution.get("shard")
+            }
+            self._publish_index(shard_store, {
+                distribution_name: (
+                    shard_key if distribution_name not in pending_distributions
+                    else previous_shard_keys.get(distribution_name, shard_key)
+                )
+                for distribution_name, shard_key in shard_keys.items()
+            })
+            emit_event("published", distributions=len(priority_distributions), generation=self.index_generation)
+        else:
+            other_distributions = distributions_to_index
+
+        unfinished_distributions |= self._index_distributions(
+            other_distributions, system_module_map, worker_count, deadline, shard_store, shard_keys, write_shard
+        )
+
         logger.debug(f"Imported path count: {self.import_path_count}")
 
-        self.save_imports_to_cache()
+        self._publish_index(shard_store, shard_keys)
+
+        # Saved last, so an interrupted run indexes these distributions again
+        shard_store.save_manifest(
+            self._get_manifest(distributions, unfinished_distributions, shard_keys, environment)
+        )
+
+        self._prune_cache(shard_store, shard_keys)
+
+        self._emit_summary(start_time, len(unfinished_distributions))
 
     def run(self):
+        # Anything printed while indexing goes to stderr, stdout only has events
+        sys.stdout = sys.stderr
         try:
+            if not self.settings:
+                self.parse_settings()
+            self._lower_priority()
             self._run()
         except Exception:
-            # Send error Flag
-            print("FAILED_INDEXING", flush=True)
             error_details = traceback.format_exc()
             logger.debug(f"Indexing failed due to: {error_details}")
             # Send error details to plugin
-            print(error_details, flush=True)
+            emit_event("failed", message=error_details)
+
+# Worker process state, set once per worker by the pool initializer
+_worker_settings: Dict = {}
+_worker_system_module_map: Dict[str, pkgutil.ModuleInfo] = {}
+
+
+def _initialize_worker(settings: Dict):
+    global _worker_settings, _worker_system_module_map
+    _worker_settings = settings
+    # Discovered by the main process already, read from the cache
+    _worker_system_module_map, _ = Indexer(settings)._discover_modules()
+
+
+def _index_module_in_worker(module_name: str) -> Tuple[List[ImportEntry], Optional[str]]:
+    """
+        Imports a top level module inside a supervised worker, returns its
+        import paths and the import error if any
+    """
+    indexer = Indexer(_worker_settings)
+
+    module_info = _worker_system_module_map.get(module_name)
+    if module_info is not None:
+        indexer._index_module(module_info, None)
+
+    return indexer.import_entries, indexer.module_error
+
+
+def _index_distribution_chunk(
+    distributions: List[DistributionInfo],
+    deadline: Optional[float],
+    progress_queue: "queue.Queue[Tuple[str, Dict]]",
+) -> Tuple[Dict[str, SpillFile], Set[str], int, Dict[str, str]]:
+    """
+        Indexes a chunk of distributions inside a pool worker and returns
+        the spill files holding their import paths, the main process
+        writes the shards from them. The distributions not fully indexed
+        by the deadline are returned too, modules are reported to the main
+        process through the progress queue.
+    """
+    indexer = Indexer(_worker_settings)
+    shard_store = indexer._get_shard_store()
+    static_indexer = indexer._get_static_indexer()
+
+    def report_event(event: str, **fields):
+        progress_queue.put((event, fields))
+
+    distribution_spills: Dict[str, SpillFile] = {}
+    unfinished_distributions: Set[str] = set()
+    for distribution in distributions:
+        spill = distribution_spills[distribution.name] = shard_store.open_spill()
+        # The main process checks the pause before it hands out a chunk
+        finished, _ = indexer.index_distribution(
+            distribution, _worker_system_module_map, static_indexer, spill, deadline, report_event
+        )
+        if not finished:
+            unfinished_distributions.add(distribution.name)
+
+    return (
+        distribution_spills,
+        unfinished_distributions,
+        indexer.import_path_count,
+        static_indexer.pending_extension_modules,
+    )
+
 
 if __name__ == '__main__':
     Indexer().run()
@@ -0,0 +1,9 @@
+'''
+    Settings shared by the plugin and the indexer scripts. Kept apart,
+    without imports, so the scripts read them without loading the indexer
+    and the plugin without going through the scripts imports.
+'''
+
+
+# Environment variable holding the settings as json, set by the plugin
+SETTINGS_ENV_VAR = "PYROCK_INDEXER_SETTINGS"
@@ -0,0 +1,359 @@
+'''
+    Finds the importable top level modules and the distributions owning
+    them, without importing anything. Directories are listed once, without
+    a stat per entry, and the result is cached until `sys.path` or one of
+    its directories changes.
+'''
+import os
+import re
+import ast
+import sys
+import json
+import inspect
+import pkgutil
+import fnmatch
+import logging
+import sysconfig
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
+from distributions import DistributionInfo, get_installed_distributions, read_installed_distributions
+
+
+logger = logging.getLogger(__name__)
+path = Path(__file__)
+
+
+PTH_SUFFIX = '.pth'
+
+# Editable installs of setuptools import a finder module from their .pth
+EDITABLE_FINDER_PREFIX = '__editable__'
+EDITABLE_MAPPING_NAME = 'MAPPING'
+PTH_IMPORT_PATTERN = re.compile(r'import\s+([\w.]+)')
+
+# Bumped when the cached result is laid out differently
+DISCOVERY_CACHE_VERSION = 1
+
+
+class DiscoveredModule(NamedTuple):
+    # Directory or zip file the module is found in
+    location: str
+    is_package: bool
+
+
+class ModuleDiscovery:
+    """
+        Usage:
+            system_module_map, distributions = ModuleDiscovery(
+                cache_path, include_patterns, exclude_patterns
+            ).discover()
+
+        `include_patterns` and `exclude_patterns` are glob patterns of top
+        level module names, a module matching an include pattern is indexed
+        even when it matches an exclude pattern. The patterns come from the
+        plugin settings, which hold the default excluded modules.
+    """
+
+    def __init__(
+        self,
+        cache_path: str,
+        include_patterns: Optional[List[str]] = None,
+        exclude_patterns: Optional[List[str]] = None,
+    ):
+        self.cache_path = cache_path
+        self.include_patterns: List[str] = include_patterns or []
+        self.exclude_patterns: List[str] = exclude_patterns or []
+
+    def _is_included(self, module_name: str) -> bool:
+        if any(fnmatch.fnmatchcase(module_name, pattern) for pattern in self.include_patterns):
+            return True
+        return not any(fnmatch.fnmatchcase(module_name, pattern) for pattern in self.exclude_patterns)
+
+    def _get_search_path(self) -> List[str]:
+        # Scripts of this plugin are on sys.path only to run them
+        scripts_directory = os.path.normcase(str(path.parent.resolve()))
+        search_path: List[str] = []
+        for location in sys.path:
+            location = os.path.abspath(location or os.curdir)
+            if os.path.normcase(location) != scripts_directory and location not in search_path:
+                search_path.append(location)
+        return search_path
+
+    def _get_stdlib_paths(self) -> Tuple[List[str], List[str]]:
+        """
+            Directories of the standard library and the site directories
+            found inside them
+        """
+        paths = sysconfig.get_paths()
+
+        def normalize(names: Tuple[str, ...]) -> List[str]:
+            return sorted({os.path.normcase(os.path.abspath(paths[name])) for name in names if name in paths})
+
+        return normalize(('stdlib', 'platstdlib')), normalize(('purelib', 'platlib'))
+
+    def _is_stdlib_location(self, location: str, stdlib_paths: List[str], site_paths: List[str]) -> bool:
+        location = os.path.normcase(location)
+
+        def is_under(directory: str) -> bool:
+            return location == directory or location.startswith(directory + os.sep)
+
+        # Zipped standard library of the embedded builds
+        if os.path.basename(location) == f"python{sys.version_info[0]}{sys.version_info[1]}.zip":
+            return True
+        return (
+            any(is_under(directory) for directory in stdlib_paths)
+            and not any(is_under(directory) for directory in site_paths)
+            and 'site-packages' not in location.split(os.sep)
+            and 'dist-packages' not in location.split(os.sep)
+        )
+
+    def _get_signature(self) -> Dict:
+        return {
+            "version": DISCOVERY_CACHE_VERSION,
+            "python": sys.version,
+            "executable": sys.executable,
+            "sys_path": self._get_search_path(),
+            "include": self.include_patterns,
+            "exclude": self.exclude_patterns,
+        }
+
+    def _get_mtime(self, location: str) -> Optional[int]:
+        try:
+            return os.stat(location).st_mtime_ns
+        except OSError:
+            return None
+
+    def _has_init_module(self, directory: str) -> bool:
+        if os.path.isfile(os.path.join(directory, '__init__.py')):
+            return True
+        try:
+            return any(inspect.getmodulename(name) == '__init__' for name in os.listdir(directory))
+        except OSError:
+            return False
+
+    def _read_pth_file(self, site_directory: str, pth_path: str) -> Tuple[List[str], List[str]]:
+        """
+            Directories added by the .pth file, same as `site` does, and
+            the paths of the editable finder modules it imports
+        """
+        directories: List[str] = []
+        finder_paths: List[str] = []
+        try:
+            with open(pth_path, 'r', encoding='utf-8') as f:
+                lines = f.read().splitlines()
+        except (OSError, UnicodeDecodeError):
+            return directories, finder_paths
+
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+
+            if line.startswith(('import ', 'import\t')):
+                for module_name in PTH_IMPORT_PATTERN.findall(line):
+                    if module_name.startswith(EDITABLE_FINDER_PREFIX):
+                        finder_paths.append(os.path.join(site_directory, f"{module_name}.py"))
+                continue
+
+            directory = os.path.abspath(os.path.join(site_directory, line))
+            if os.path.isdir(directory):
+                directories.append(directory)
+
+        return directories, finder_paths
+
+    def _read_editable_mapping(self, finder_path: str) -> Dict[str, str]:
+        """
+            Reads `MAPPING = {"package": "/path/to/package"}` written by
+            setuptools in the finder module, the module is never imported
+        """
+        try:
+            with open(finder_path, 'rb') as f:
+                tree = ast.parse(f.read(), filename=finder_path)
+        except (SyntaxError, ValueError, OSError):
+            return {}
+
+        for node in tree.body:
+            if (
+                isinstance(node, ast.Assign)
+                and any(isinstance(target, ast.Name) and target.id == EDITABLE_MAPPING_NAME for target in node.targets)
+            ):
+                try:
+                    mapping = ast.literal_eval(node.value)
+                except ValueError:
+                    return {}
+                if isinstance(mapping, dict):
+                    return {
+                        module_name: module_path for module_name, module_path in mapping.items()
+                        if isinstance(module_name, str) and isinstance(module_path, str)
+                    }
+        return {}
+
+    def _iter_directory_modules(
+        self,
+        directory: str,
+        declared_modules: Set[str],
+        pth_paths: List[str],
+    ) -> Iterator[Tuple[str, bool]]:
+        """
+            Yields the module names and whether they are packages, the
+            directories declared by a distribution are packages even
+            without `__init__`, like namespace packages. The .pth files
+            found are added to `pth_paths`.
+        """
+        try:
+            with os.scandir(directory) as entries:
+                entries = list(entries)
+        except OSError:
+            return
+
+        for entry in entries:
+            name = entry.name
+            try:
+                # Read from the directory listing on most platforms, no stat
+                is_directory = entry.is_dir()
+            except OSError:
+                continue
+
+            if is_directory:
+                if name.isidentifier() and name != '__pycache__' and (
+                    name in declared_modules or self._has_init_module(entry.path)
+                ):
+                    yield name, True
+                continue
+
+            if name.endswith(PTH_SUFFIX):
+                pth_paths.append(entry.path)
+                continue
+
+            module_name = inspect.getmodulename(name)
+            if module_name and module_name.isidentifier() and module_name != '__init__':
+                yield module_name, False
+
+    def _iter_location_modules(
+        self,
+        location: str,
+        declared_modules: Set[str],
+        pth_paths: List[str],
+    ) -> Iterator[Tuple[str, bool]]:
+        if os.path.isdir(location):
+            yield from self._iter_directory_modules(location, declared_modules, pth_paths)
+        elif os.path.isfile(location):
+            # Zip files on sys.path
+            for module_info in pkgutil.iter_modules([location]):
+                yield module_info.name, module_info.ispkg
+
+    def _scan(self) -> Tuple[Dict[str, DiscoveredModule], List[DistributionInfo], Dict[str, Optional[int]]]:
+        installed_distributions = read_installed_distributions()
+        declared_modules: Set[str] = {
+            module_name for distribution in installed_distributions for module_name in distribution.modules
+        }
+
+        modules: Dict[str, DiscoveredModule] = {}
+        search_path: List[str] = self._get_search_path()
+        scanned_locations: Dict[str, Optional[int]] = {}
+        editable_modules: Dict[str, str] = {}
+
+        index = 0
+        while index < len(search_path):
+            location = search_path[index]
+            index += 1
+
+            scanned_locations[location] = self._get_mtime(location)
+            pth_paths: List[str] = []
+
+            for module_name, is_package in self._iter_location_modules(location, declared_modules, pth_paths):
+                # First one found wins, same as the import system
+                if module_name not in modules:
+                    modules[module_name] = DiscoveredModule(location, is_package)
+
+            for pth_path in sorted(pth_paths):
+                directories, finder_paths = self._read_pth_file(location, pth_path)
+                # Usually on sys.path already, unless `site` didn't run
+                search_path.extend(directory for directory in directories if directory not in search_path)
+                for finder_path in finder_paths:
+                    for module_name, module_path in self._read_editable_mapping(finder_path).items():
+                        editable_modules.setdefault(module_name, module_path)
+
+        # Editable finders are looked up after sys.path by the import system
+        for module_name, module_path in editable_modules.items():
+            location = os.path.dirname(os.path.abspath(module_path))
+            if module_name not in modules and os.path.exists(module_path):
+                modules[module_name] = DiscoveredModule(location, os.path.isdir(module_path))
+                scanned_locations.setdefault(location, self._get_mtime(location))
+
+        modules = {
+            module_name: module for module_name, module in modules.items() if self._is_included(module_name)
+        }
+        return modules, installed_distributions, scanned_locations
+
+    def _load_cache(self, signature: Dict) -> Optional[Tuple[Dict[str, DiscoveredModule], List[DistributionInfo]]]:
+        try:
+            with open(self.cache_path, 'r') as f:
+                cache: Dict = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if cache.get("signature") != signature:
+            return None
+
+        # A directory changes when modules or distributions are added to it
+        # or removed from it
+        for location, mtime in cache["locations"].items():
+            if self._get_mtime(location) != mtime:
+                return None
+
+        try:
+            return (
+                {module_name: DiscoveredModule(*module) for module_name, module in cache["modules"].items()},
+                [DistributionInfo(*distribution) for distribution in cache["distributions"]],
+            )
+        except (TypeError, KeyError):
+            return None
+
+    def _save_cache(
+        self,
+        signature: Dict,
+        modules: Dict[str, DiscoveredModule],
+        installed_distributions: List[DistributionInfo],
+        scanned_locations: Dict[str, Optional[int]],
+    ):
+        # Worker processes can save it at the same time
+        temp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, 'w') as f:
+                json.dump({
+                    "signature": signature,
+                    "locations": scanned_locations,
+                    "modules": modules,
+                    "distributions": installed_distributions,
+                }, f)
+            os.replace(temp_path, self.cache_path)
+        except OSError:
+            logger.debug("Unable to save module discovery cache")
+
+    def discover(self) -> Tuple[Dict[str, pkgutil.ModuleInfo], Dict[str, DistributionInfo]]:
+        signature = self._get_signature()
+
+        cached_result = self._load_cache(signature)
+        if cached_result is not None:
+            modules, installed_distributions = cached_result
+        else:
+            modules, installed_distributions, scanned_locations = self._scan()
+            self._save_cache(signature, modules, installed_distributions, scanned_locations)
+
+        stdlib_paths, site_paths = self._get_stdlib_paths()
+        system_module_map: Dict[str, pkgutil.ModuleInfo] = {}
+        stdlib_module_names: Set[str] = set()
+        for module_name, module in modules.items():
+            module_finder = pkgutil.get_importer(module.location)
+            if module_finder is not None:
+                system_module_map[module_name] = pkgutil.ModuleInfo(module_finder, module_name, module.is_package)
+                if self._is_stdlib_location(module.location, stdlib_paths, site_paths):
+                    stdlib_module_names.add(module_name)
+
+        distributions = get_installed_distributions(
+            set(system_module_map),
+            installed_distributions,
+            stdlib_module_names,
+            stdlib_path=stdlib_paths[0] if stdlib_paths else "",
+        )
+        return system_module_map, distributions
@@ -0,0 +1,285 @@
+import os
+import sys
+import time
+import multiprocessing
+import multiprocessing.connection
+import logging
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+from index_format import ImportEntry
+
+
+logger = logging.getLogger(__name__)
+
+
+# Seconds between two memory checks of a busy worker
+RSS_POLL_INTERVAL = 0.5
+
+# Seconds given to a worker to exit when it is recycled
+WORKER_EXIT_TIMEOUT = 1
+
+
+class ModuleResult(NamedTuple):
+    module: str
+    import_entries: List[ImportEntry]
+    duration: float
+    error: Optional[str]
+    # Worker was killed, on timeout, memory limit or crash
+    skipped: bool = False
+
+
+def get_process_rss(pid: int) -> Optional[int]:
+    """
+        Resident memory of a running process in bytes, only available
+        where /proc exists, None otherwise
+    """
+    try:
+        with open(f"/proc/{pid}/statm", 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def get_peak_rss() -> Optional[int]:
+    """
+        Peak resident memory of the current process in bytes
+    """
+    try:
+        import resource
+    except ImportError:
+        # Not available on windows
+        return None
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak_rss if sys.platform == 'darwin' else peak_rss * 1024
+
+
+def _run_worker(
+    connection: multiprocessing.connection.Connection,
+    initializer: Callable[..., None],
+    initargs: Tuple,
+    index_module: Callable[[str], Tuple[List[ImportEntry], Optional[str]]],
+):
+    initializer(*initargs)
+
+    while True:
+        try:
+            module_name: Optional[str] = connection.recv()
+        except EOFError:
+            break
+
+        if module_name is None:
+            break
+
+        import_entries, error = index_module(module_name)
+        connection.send((import_entries, error, get_peak_rss()))
+
+
+class ModuleWorker:
+    def __init__(self, process: multiprocessing.Process, connection: multiprocessing.connection.Connection):
+        self.process = process
+        self.connection = connection
+        self.indexed_modules = 0
+        self.module: Optional[str] = None
+        self.start_time: float = 0
+        self.next_rss_check: float = 0
+
+    def stop(self):
+        try:
+            self.connection.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(WORKER_EXIT_TIMEOUT)
+        if self.process.is_alive():
+            self.kill()
+        self.connection.close()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.connection.close()
+
+
+class ModuleSupervisor:
+    """
+        Indexes every module in a worker process, a module which runs past
+        its deadline, uses too much memory or crashes its worker is skipped,
+        its worker is killed and replaced. Workers are also replaced after
+        `max_modules` modules, every import stays loaded in the worker
+        and memory only grows.
+    """
+
+    def __init__(
+        self,
+        index_module: Callable[[str], Tuple[List[ImportEntry], Optional[str]]],
+        initializer: Callable[..., None],
+        initargs: Tuple,
+        worker_count: int,
+        module_timeout: float,
+        max_rss: int,
+        max_modules: int,
+        on_module_started: Optional[Callable[[str], None]] = None,
+    ):
+        self.index_module = index_module
+        self.initializer = initializer
+        self.initargs = initargs
+        self.worker_count = worker_count
+        self.module_timeout = module_timeout
+        self.max_rss = max_rss
+        self.max_modules = max_modules
+        self.on_module_started = on_module_started
+        self.workers: List[Optional[ModuleWorker]] = [None] * worker_count
+
+    def _start_worker(self) -> ModuleWorker:
+        parent_connection, child_connection = multiprocessing.Pipe()
+        process = multiprocessing.Process(
+            target=_run_worker,
+            args=(child_connection, self.initializer, self.initargs, self.index_module),
+            daemon=True,
+        )
+        process.start()
+        child_connection.close()
+        return ModuleWorker(process, parent_connection)
+
+    def _dispatch(self, slot: int, module_name: str):
+        worker = self.workers[slot]
+        if worker is None:
+            worker = self.workers[slot] = self._start_worker()
+
+        worker.module = module_name
+        worker.start_time = time.monotonic()
+        worker.next_rss_check = worker.start_time + RSS_POLL_INTERVAL
+        worker.connection.send(module_name)
+
+        if self.on_module_started:
+            self.on_module_started(module_name)
+
+    def _finish(
+        self,
+        slot: int,
+        import_entries: List[ImportEntry],
+        error: Optional[str],
+        skipped: bool = False,
+    ) -> ModuleResult:
+        worker = self.workers[slot]
+        result = ModuleResult(
+            module=worker.module,
+            import_entries=import_entries,
+            duration=round(time.monotonic() - worker.start_time, 4),
+            error=error,
+            skipped=skipped,
+        )
+        worker.module = None
+        return result
+
+    def _discard(self, slot: int, error: str) -> ModuleResult:
+        logger.debug(f"Killing worker indexing {self.workers[slot].module}: {error}")
+        self.workers[slot].kill()
+        result = self._finish(slot, [], error, skipped=True)
+        self.workers[slot] = None
+        return result
+
+    def _recycle(self, slot: int):
+        self.workers[slot].stop()
+        self.workers[slot] = None
+
+    def _receive(self, slot: int) -> ModuleResult:
+        worker = self.workers[slot]
+        try:
+            import_entries, error, peak_rss = worker.connection.recv()
+        except (EOFError, OSError):
+            return self._discard(slot, f"Worker exited with code {worker.process.exitcode}")
+
+        result = self._finish(slot, import_entries, error)
+        worker.indexed_modules += 1
+
+        if worker.indexed_modules >= self.max_modules or (peak_rss or 0) > self.max_rss:
+            self._recycle(slot)
+        return result
+
+    def _check_busy_worker(self, slot: int, now: float) -> Optional[ModuleResult]:
+        worker = self.workers[slot]
+
+        if now - worker.start_time >= self.module_timeout:
+            return self._discard(slot, f"Timed out after {self.module_timeout} sec")
+
+        if now >= worker.next_rss_check:
+            worker.next_rss_check = now + RSS_POLL_INTERVAL
+            rss = get_process_rss(worker.process.pid)
+            if rss is not None and rss > self.max_rss:
+                return self._discard(slot, f"Used more than {self.max_rss // (1024 * 1024)} MB")
+
+        return None
+
+    def _get_wait_timeout(self, now: float) -> float:
+        wait_timeout = RSS_POLL_INTERVAL
+        for worker in self.workers:
+            if worker is not None and worker.module is not None:
+                wait_timeout = min(wait_timeout, worker.start_time + self.module_timeout - now)
+        return max(0, wait_timeout)
+
+    def run(
+        self,
+        module_names: List[str],
+        deadline: Optional[float] = None,
+        wait_while_paused: Optional[Callable[[Optional[float]], Optional[float]]] = None,
+    ) -> Iterator[ModuleResult]:
+        """
+            Yields the result of every module as soon as it is indexed, no
+            more modules are started past the `deadline` (monotonic time),
+            the modules still being indexed then are abandoned.
+            `wait_while_paused` blocks before new modules are started while
+            indexing is paused, it returns the deadline moved by the pause.
+        """
+        pending_modules = list(reversed(module_names))
+
+        try:
+            while True:
+                if wait_while_paused is not None and pending_modules:
+                    deadline = wait_while_paused(deadline)
+                now = time.monotonic()
+
+                for slot, worker in enumerate(self.workers):
+                    if not pending_modules or (deadline is not None and now >= deadline):
+                        break
+                    if worker is None or worker.module is None:
+                        self._dispatch(slot, pending_modules.pop())
+
+                busy_slots: Dict[Any, int] = {
+                    worker.connection: slot
+                    for slot, worker in enumerate(self.workers)
+                    if worker is not None and worker.module is not None
+                }
+                if not busy_slots:
+                    break
+
+                if deadline is not None and now >= deadline:
+                    logger.debug(f"Out of time, abandoning {len(busy_slots)} running modules")
+                    break
+
+                ready_connections = multiprocessing.connection.wait(
+                    list(busy_slots), timeout=self._get_wait_timeout(now)
+                )
+
+                for connection in ready_connections:
+                    yield self._receive(busy_slots[connection])
+
+                now = time.monotonic()
+                for slot in busy_slots.values():
+                    worker = self.workers[slot]
+                    if worker is not None and worker.module is not None:
+                        result = self._check_busy_worker(slot, now)
+                        if result is not None:
+                            yield result
+        finally:
+            self.close()
+
+    def close(self):
+        for slot, worker in enumerate(self.workers):
+            if worker is None:
+                continue
+            if worker.module is None:
+                worker.stop()
+            else:
+                worker.kill()
+            self.workers[slot] = None
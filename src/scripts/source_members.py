@@ -0,0 +1,159 @@
+'''
+    Reads the names a python source defines with ast, without running it.
+    Shared by the static indexer script and the plugin, which indexes the
+    project sources, so it only depends on the standard library and the
+    index format.
+'''
+import ast
+import logging
+from typing import Dict, Iterator, List, Optional, Set
+
+try:
+    # Imported by the plugin as part of the package
+    from .index_format import UNKNOWN_KIND, CLASS_KIND, FUNCTION_KIND
+except ImportError:
+    # Imported by the indexer scripts
+    from index_format import UNKNOWN_KIND, CLASS_KIND, FUNCTION_KIND
+
+
+logger = logging.getLogger(__name__)
+
+
+def _get_string_constant(node: ast.AST) -> Optional[str]:
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    # Python < 3.8 parses strings as ast.Str
+    if isinstance(node, getattr(ast, 'Str', ())):
+        return node.s
+    return None
+
+
+def _get_target_names(target: ast.AST) -> List[str]:
+    if isinstance(target, ast.Name):
+        return [target.id]
+    if isinstance(target, (ast.Tuple, ast.List)):
+        names = []
+        for element in target.elts:
+            names.extend(_get_target_names(element))
+        return names
+    return []
+
+
+def _iter_module_level_nodes(body: List[ast.stmt]) -> Iterator[ast.stmt]:
+    """
+        Yields the module level statements, including the ones nested
+        inside if/try/with blocks, but not the ones inside classes or functions
+    """
+    for node in body:
+        yield node
+
+        if isinstance(node, ast.If):
+            yield from _iter_module_level_nodes(node.body)
+            yield from _iter_module_level_nodes(node.orelse)
+        elif isinstance(node, ast.Try):
+            yield from _iter_module_level_nodes(node.body)
+            for handler in node.handlers:
+                yield from _iter_module_level_nodes(handler.body)
+            yield from _iter_module_level_nodes(node.orelse)
+            yield from _iter_module_level_nodes(node.finalbody)
+        elif isinstance(node, ast.With):
+            yield from _iter_module_level_nodes(node.body)
+
+
+def _get_exported_names(node: ast.AST) -> List[str]:
+    """
+        Reads the names from `__all__ = [...]` or `__all__ += [...]`
+    """
+    value = getattr(node, 'value', None)
+    if not isinstance(value, (ast.List, ast.Tuple)):
+        return []
+
+    names = []
+    for element in value.elts:
+        name = _get_string_constant(element)
+        if name:
+            names.append(name)
+    return names
+
+
+def _is_re_export(module_path: str, node: ast.ImportFrom) -> bool:
+    """
+        Imports from the same top level package are treated as re-exports,
+        same as the import engine sees them as module members
+    """
+    if node.level > 0:
+        return True
+    if node.module is None:
+        return False
+    return node.module.split('.')[0] == module_path.split('.')[0]
+
+
+def parse_source(file_path: str) -> Optional[ast.Module]:
+    try:
+        with open(file_path, 'rb') as f:
+            return ast.parse(f.read(), filename=file_path)
+    except (SyntaxError, ValueError, OSError, RecursionError, MemoryError):
+        logger.debug(f"Unable to parse {file_path}")
+        return None
+
+
+def get_imported_modules(tree: ast.Module) -> Set[str]:
+    """
+        Top level modules the source imports absolutely, anywhere in it
+    """
+    imported_modules: Set[str] = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            imported_modules.update(alias.name.split('.')[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            imported_modules.add(node.module.split('.')[0])
+    return imported_modules
+
+
+def get_source_members(module_path: str, file_path: str, tree: Optional[ast.Module] = None) -> Dict[str, str]:
+    """
+        Names defined by the module with their kind, names which are
+        assigned or imported have an unknown kind. The source is parsed
+        unless its `tree` is given.
+    """
+    if tree is None:
+        tree = parse_source(file_path)
+    if tree is None:
+        return {}
+
+    members: Dict[str, str] = {}
+
+    def add_member(name: str, kind: str = UNKNOWN_KIND):
+        # A definition tells more than an assignment of the same name
+        if members.get(name, UNKNOWN_KIND) == UNKNOWN_KIND:
+            members[name] = kind
+
+    for node in _iter_module_level_nodes(tree.body):
+        if isinstance(node, ast.ClassDef):
+            add_member(node.name, CLASS_KIND)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            add_member(node.name, FUNCTION_KIND)
+        elif isinstance(node, ast.Assign):
+            for target in node.targets:
+                if isinstance(target, ast.Name) and target.id == '__all__':
+                    names = _get_exported_names(node)
+                else:
+                    names = _get_target_names(target)
+                for name in names:
+                    add_member(name)
+        elif isinstance(node, ast.AnnAssign) and isinstance(node.target, ast.Name):
+            add_member(node.target.id)
+        elif isinstance(node, ast.AugAssign):
+            if isinstance(node.target, ast.Name) and node.target.id == '__all__':
+                for name in _get_exported_names(node):
+                    add_member(name)
+        elif isinstance(node, ast.ImportFrom) and _is_re_export(module_path, node):
+            for alias in node.names:
+                if alias.name != '*':
+                    add_member(alias.asname or alias.name)
+
+    # Dunder names like __version__, __all__ are not worth importing
+    return {
+        member: kind for member, kind in members.items()
+        if not (member.startswith('__') and member.endswith('__'))
+    }
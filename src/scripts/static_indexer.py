@@ -0,0 +1,290 @@
+import os
+import sys
+import json
+import pkgutil
+import hashlib
+import importlib
+import importlib.machinery
+import subprocess
+import tempfile
+import logging
+from typing import Callable, Dict, List, Optional, Iterator, Tuple, Union
+from types import BuiltinFunctionType, FunctionType
+from pathlib import Path
+from import_sandbox import ImportSandbox
+from source_members import get_source_members
+from index_format import (
+    ImportEntry,
+    UNKNOWN_KIND,
+    MODULE_KIND,
+    CLASS_KIND,
+    FUNCTION_KIND,
+    BUILTIN_KIND,
+)
+
+
+logger = logging.getLogger(__name__)
+path = Path(__file__)
+
+
+SOURCE_SUFFIXES = tuple(importlib.machinery.SOURCE_SUFFIXES)
+STUB_SUFFIX = '.pyi'
+EXTENSION_SUFFIXES = tuple(importlib.machinery.EXTENSION_SUFFIXES)
+
+# Extension modules are imported in a separate process, this is the max
+# time given to that process to introspect all the pending modules
+EXTENSION_INTROSPECTION_TIMEOUT = 60
+
+
+class StaticIndexer:
+    """
+        Indexes modules by parsing their sources with ast, so no package
+        code gets executed while indexing. Compiled extension modules
+        can't be parsed, those are imported in an isolated process and
+        the result is cached by the hash of the extension file.
+        Every import path is stored along with its kind.
+    """
+
+    def __init__(
+        self,
+        store: Callable[[str, str], None],
+        scan_depth: int,
+        extension_cache_path: str,
+    ):
+        self._store = store
+        self.scan_depth = scan_depth
+        self.extension_cache_path = extension_cache_path
+        # Members cached before kinds were stored are plain names
+        self.extension_cache: Dict[str, List[Union[str, List[str]]]] = self._load_extension_cache()
+        # module path -> extension file path
+        self.pending_extension_modules: Dict[str, str] = {}
+
+    def _load_extension_cache(self) -> Dict[str, List[Union[str, List[str]]]]:
+        if not os.path.exists(self.extension_cache_path):
+            return {}
+
+        try:
+            with open(self.extension_cache_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            logger.debug("Unable to read extension cache, ignoring it")
+            return {}
+
+    def _save_extension_cache(self):
+        base_directory_path = os.path.dirname(self.extension_cache_path)
+
+        if not os.path.exists(base_directory_path):
+            os.mkdir(base_directory_path)
+
+        with open(self.extension_cache_path, 'w') as f:
+            json.dump(self.extension_cache, f)
+
+    def _hash_file(self, file_path: str) -> Optional[str]:
+        file_hash = hashlib.sha1()
+        try:
+            with open(file_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    file_hash.update(chunk)
+        except OSError:
+            return None
+        return file_hash.hexdigest()
+
+    def _get_stub_path(self, file_path: str) -> Optional[str]:
+        directory, file_name = os.path.split(file_path)
+        stub_path = os.path.join(directory, file_name.split('.')[0] + STUB_SUFFIX)
+
+        if os.path.exists(stub_path):
+            return stub_path
+        return None
+
+    def _index_module_file(self, module_path: str, file_path: str):
+        if file_path.endswith(SOURCE_SUFFIXES) or file_path.endswith(STUB_SUFFIX):
+            source_path = file_path
+        elif file_path.endswith(EXTENSION_SUFFIXES):
+            source_path = self._get_stub_path(file_path)
+            if source_path is None:
+                # Will be introspected in a separate process
+                self.pending_extension_modules[module_path] = file_path
+                return
+        else:
+            # Bytecode only or frozen modules can't be parsed
+            return
+
+        for member_name, kind in get_source_members(module_path, source_path).items():
+            self._store(f"{module_path}.{member_name}", kind)
+
+    def _is_test_module(self, module_name: str) -> bool:
+        return (
+            module_name == 'tests'
+            or module_name.startswith('test_')
+            or module_name.endswith('_test')
+        )
+
+    def _index_spec(self, module_path: str, spec: importlib.machinery.ModuleSpec):
+        if spec.origin and os.path.isfile(spec.origin):
+            self._index_module_file(module_path, spec.origin)
+
+        search_locations = spec.submodule_search_locations
+
+        # Import depth, default 4
+        if not search_locations or len(module_path.split('.')) >= self.scan_depth:
+            return
+
+        for sub_module_info in pkgutil.iter_modules(list(search_locations)):
+            # Test suites shipped with the packages are never imported from,
+            # and they usually are the biggest part of the sources
+            if sub_module_info.name == '__main__' or self._is_test_module(sub_module_info.name):
+                continue
+
+            sub_module_path = f"{module_path}.{sub_module_info.name}"
+
+            try:
+                sub_module_spec = sub_module_info.module_finder.find_spec(sub_module_path)
+            except Exception:
+                sub_module_spec = None
+
+            if sub_module_spec is None:
+                continue
+
+            self._store(sub_module_path, MODULE_KIND)
+            self._index_spec(sub_module_path, sub_module_spec)
+
+    def index_module(self, module_info: pkgutil.ModuleInfo):
+        try:
+            spec = module_info.module_finder.find_spec(module_info.name)
+        except Exception:
+            spec = None
+
+        if spec is None:
+            logger.debug(f"Unable to find spec of {module_info.name}")
+            return
+
+        self._index_spec(module_info.name, spec)
+
+    def _introspect_in_subprocess(self, module_paths: List[str]) -> Dict[str, Optional[List[List[str]]]]:
+        """
+            Members of every extension module introspected, None for the
+            ones which failed to import, modules left out by a timeout are
+            missing
+        """
+        results: Dict[str, Optional[List[List[str]]]] = {}
+
+        with tempfile.TemporaryDirectory() as temp_directory:
+            output_path = os.path.join(temp_directory, 'introspection.jsonl')
+            try:
+                subprocess.run(
+                    [sys.executable, str(path), '--introspect', output_path],
+                    input=json.dumps(module_paths).encode('utf-8'),
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                    timeout=EXTENSION_INTROSPECTION_TIMEOUT,
+                )
+            except subprocess.TimeoutExpired:
+                logger.debug("Extension introspection timed out, using partial result")
+            except OSError:
+                logger.debug("Unable to start extension introspection")
+                return results
+
+            if not os.path.exists(output_path):
+                return results
+
+            with open(output_path, 'r') as f:
+                for line in f:
+                    try:
+                        module_result = json.loads(line)
+                    except ValueError:
+                        # Last line can be half written on timeout
+                        continue
+                    if module_result.get("error"):
+                        logger.debug(f"Unable to introspect {module_result['module']}: {module_result['error']}")
+                    results[module_result["module"]] = module_result["members"]
+
+        return results
+
+    def _iter_cached_members(self, members: List[Union[str, List[str]]]) -> Iterator[ImportEntry]:
+        for member in members:
+            if isinstance(member, str):
+                yield member, UNKNOWN_KIND
+            else:
+                yield member[0], member[1]
+
+    def flush_extension_modules(self, store: Optional[Callable[[str, str], None]] = None):
+        """
+            Indexes all the extension modules found so far, only the ones
+            which are not in cache are imported in a separate process
+        """
+        store = store or self._store
+        modules_to_introspect: Dict[str, str] = {}
+
+        for module_path, file_path in self.pending_extension_modules.items():
+            file_hash = self._hash_file(file_path)
+            if file_hash is None:
+                continue
+
+            members: Optional[List[Union[str, List[str]]]] = self.extension_cache.get(file_hash)
+            if members is None:
+                modules_to_introspect[module_path] = file_hash
+                continue
+
+            for member_name, kind in self._iter_cached_members(members):
+                store(f"{module_path}.{member_name}", kind)
+
+        self.pending_extension_modules = {}
+
+        if not modules_to_introspect:
+            return
+
+        logger.debug(f"Introspecting {len(modules_to_introspect)} extension modules")
+        results = self._introspect_in_subprocess(list(modules_to_introspect.keys()))
+
+        for module_path, members in results.items():
+            if members is None:
+                # Can be a transient failure, introspected again next run
+                continue
+            self.extension_cache[modules_to_introspect[module_path]] = members
+            for member_name, kind in self._iter_cached_members(members):
+                store(f"{module_path}.{member_name}", kind)
+
+        self._save_extension_cache()
+
+
+def _get_extension_member_kind(member_obj: object) -> Optional[str]:
+    if isinstance(member_obj, type):
+        return CLASS_KIND
+    if isinstance(member_obj, FunctionType):
+        return FUNCTION_KIND
+    if isinstance(member_obj, BuiltinFunctionType):
+        return BUILTIN_KIND
+    return None
+
+
+def introspect_modules(output_path: str, module_paths: List[str]):
+    """
+        Runs in the isolated process, imports the extension modules and
+        writes their class and function members, with their kind, one
+        module per line. Modules which fail to import have null members
+        and the error.
+    """
+    with open(output_path, 'w') as f:
+        for module_path in module_paths:
+            module_result: Dict = {"module": module_path}
+            try:
+                with ImportSandbox():
+                    module = importlib.import_module(module_path)
+                    members: List[Tuple[str, str]] = []
+                    for member_name, member_obj in vars(module).items():
+                        kind = _get_extension_member_kind(member_obj)
+                        if kind is not None and not member_name.startswith('__'):
+                            members.append((member_name, kind))
+                module_result["members"] = members
+            except BaseException as e:
+                module_result["members"] = None
+                module_result["error"] = f"{type(e).__name__}: {e}"
+
+            f.write(json.dumps(module_result) + "\n")
+            f.flush()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 3 and sys.argv[1] == '--introspect':
+        introspect_modules(sys.argv[2], json.loads(sys.stdin.read()))
@@ -7,7 +7,15 @@ from .exceptions import (
     InvalidImportDepthScan,
     InvalidPythonVirtualEnvPath,
     InvalidLogLevel,
-    InvalidTestConfig
+    InvalidTestConfig,
+    InvalidIndexerEngine,
+    InvalidIndexerWorkers,
+    InvalidIndexFormat,
+    InvalidIndexServer,
+    InvalidIndexServerFallback,
+    InvalidModulePatterns,
+    InvalidProjectSourceRoots,
+    InvalidIndexerIdleDelay,
 )
 
 
@@ -93,6 +101,91 @@ class SettingsPythonLogLevel(PyRockSettingsFieldBase):
         if log_level_map.get(self._field_value) is None:
             raise InvalidLogLevel
 
+class SettingsIndexerEngineField(PyRockSettingsFieldBase):
+    def _validate(self):
+        self._field_value = self._field_value.lower()
+
+        if self._field_value not in [
+            PyRockConstants.IMPORT_INDEXER_ENGINE,
+            PyRockConstants.STATIC_INDEXER_ENGINE,
+        ]:
+            raise InvalidIndexerEngine(f"Invalid indexer engine {self._field_value}")
+
+class SettingsIndexerWorkersField(PyRockSettingsFieldBase):
+    def _validate(self):
+        indexer_workers = self._field_value
+
+        if (
+            not isinstance(indexer_workers, int)
+            or not PyRockConstants.MIN_INDEXER_WORKERS <= indexer_workers <= PyRockConstants.MAX_INDEXER_WORKERS
+        ):
+            raise InvalidIndexerWorkers(
+                f"Indexer workers should be in range of {PyRockConstants.MIN_INDEXER_WORKERS} to {PyRockConstants.MAX_INDEXER_WORKERS}"
+            )
+
+class SettingsIndexerIdleDelayField(PyRockSettingsFieldBase):
+    def _get_value(self) -> Any:
+        # `0` turns the pause off, so it can't fall back with `or`
+        return self._settings.get(self._field_name, self._default_value)
+
+    def _validate(self):
+        idle_delay = self._field_value
+
+        if (
+            not isinstance(idle_delay, (int, float))
+            or isinstance(idle_delay, bool)
+            or not PyRockConstants.MIN_INDEXER_IDLE_DELAY <= idle_delay <= PyRockConstants.MAX_INDEXER_IDLE_DELAY
+        ):
+            raise InvalidIndexerIdleDelay(
+                f"Indexer idle delay should be in range of {PyRockConstants.MIN_INDEXER_IDLE_DELAY} to {PyRockConstants.MAX_INDEXER_IDLE_DELAY} seconds"
+            )
+
+class SettingsIndexFormatField(PyRockSettingsFieldBase):
+    def _validate(self):
+        self._field_value = self._field_value.lower()
+
+        if self._field_value not in [
+            PyRockConstants.BINARY_INDEX_FORMAT,
+            PyRockConstants.JSON_INDEX_FORMAT,
+        ]:
+            raise InvalidIndexFormat(f"Invalid index format {self._field_value}")
+
+class SettingsIndexServerField(PyRockSettingsFieldBase):
+    def _get_value(self) -> Any:
+        # `false` is a valid value, so it can't fall back with `or`
+        return self._settings.get(self._field_name, self._default_value)
+
+    def _validate(self):
+        if not isinstance(self._field_value, bool):
+            raise InvalidIndexServer
+
+class SettingsIndexServerFallbackField(PyRockSettingsFieldBase):
+    def _get_value(self) -> Any:
+        # `false` is a valid value, so it can't fall back with `or`
+        return self._settings.get(self._field_name, self._default_value)
+
+    def _validate(self):
+        if not isinstance(self._field_value, bool):
+            raise InvalidIndexServerFallback
+
+class SettingsModulePatternsField(PyRockSettingsFieldBase):
+    def _get_value(self) -> Any:
+        # An empty list is a valid value, so it can't fall back with `or`
+        return self._settings.get(self._field_name, self._default_value)
+
+    def _validate(self):
+        if not isinstance(self._field_value, list) or not all(
+            isinstance(pattern, str) for pattern in self._field_value
+        ):
+            raise InvalidModulePatterns(f"Invalid {self._field_name}, should be a list of module name patterns")
+
+class SettingsProjectSourceRootsField(PyRockSettingsFieldBase):
+    def _validate(self):
+        if not isinstance(self._field_value, list) or not all(
+            isinstance(source_root, str) for source_root in self._field_value
+        ):
+            raise InvalidProjectSourceRoots
+
 class SettingsTestConfigField(PyRockSettingsFieldBase):
     def _get_value(self) -> Any:
         return self._settings.get(
@@ -150,6 +243,60 @@ class PyRockSettings:
             "log_level", settings, default_value="INFO"
         )
 
+        self.INDEXER_ENGINE = SettingsIndexerEngineField(
+            "indexer_engine",
+            settings,
+            default_value=PyRockConstants.DEFAULT_INDEXER_ENGINE,
+        )
+
+        self.INDEXER_WORKERS = SettingsIndexerWorkersField(
+            "indexer_workers",
+            settings,
+            default_value=PyRockConstants.DEFAULT_INDEXER_WORKERS,
+        )
+
+        self.INDEX_FORMAT = SettingsIndexFormatField(
+            "index_format",
+            settings,
+            default_value=PyRockConstants.DEFAULT_INDEX_FORMAT,
+        )
+
+        self.INDEXER_IDLE_DELAY = SettingsIndexerIdleDelayField(
+            "indexer_idle_delay",
+            settings,
+            default_value=PyRockConstants.DEFAULT_INDEXER_IDLE_DELAY,
+        )
+
+        self.INDEX_SERVER = SettingsIndexServerField(
+            "index_server",
+            settings,
+            default_value=PyRockConstants.DEFAULT_INDEX_SERVER,
+        )
+
+        self.INDEX_SERVER_FALLBACK = SettingsIndexServerFallbackField(
+            "index_server_fallback",
+            settings,
+            default_value=PyRockConstants.DEFAULT_INDEX_SERVER_FALLBACK,
+        )
+
+        self.INCLUDE_MODULES = SettingsModulePatternsField(
+            "include_modules",
+            settings,
+            default_value=[],
+        )
+
+        self.EXCLUDE_MODULES = SettingsModulePatternsField(
+            "exclude_modules",
+            settings,
+            default_value=PyRockConstants.DEFAULT_EXCLUDED_MODULES,
+        )
+
+        self.PROJECT_SOURCE_ROOTS = SettingsProjectSourceRootsField(
+            "project_source_roots",
+            settings,
+            default_value=PyRockConstants.DEFAULT_PROJECT_SOURCE_ROOTS,
+        )
+
         self.TEST_CONFIG = SettingsTestConfigField(
             "test_config", settings, default_value={}
         )
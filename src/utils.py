@@ -1,8 +1,13 @@
 import os
 import re
+import hashlib
 import urllib.request
 import json
 import traceback
+from typing import Dict, List, Optional, Union
+import sublime
+from .constants import PyRockConstants
+from .settings import PyRockSettings
 from .exceptions import InvalidAPIStatus
 from .logger import Logger
 
@@ -85,3 +90,124 @@ def is_test_file(file_name: str):
     if re.match(test_file_name_regex, file_name) is None:
         return False
     return True
+
+
+def get_python_script_command(script_path: str) -> Union[str, List]:
+    """
+        Shell command running the script with the python of the user,
+        inside the virtual env if one is set
+    """
+    unix_env_bash = """
+        set -e
+        . "{venv_path}"
+        python -u "{script_path}"
+        deactivate
+    """
+    unix_without_env_bash = """
+        set -e
+        python -u "{script_path}"
+    """
+
+    if sublime.platform() in [
+        PyRockConstants.PLATFORM_LINUX,
+        PyRockConstants.PLATFORM_OSX
+    ]:
+        if PyRockSettings().PYTHON_VIRTUAL_ENV_PATH.value:
+            command = unix_env_bash.format(
+                venv_path=PyRockSettings().PYTHON_VIRTUAL_ENV_PATH.value,
+                script_path=script_path
+            )
+        else:
+            command = unix_without_env_bash.format(
+                script_path=script_path
+            )
+    else:
+        script_path = script_path.replace('\\', '\\\\')
+        if PyRockSettings().PYTHON_VIRTUAL_ENV_PATH.value:
+            venv_path = PyRockSettings().PYTHON_VIRTUAL_ENV_PATH.value.replace(
+                '\\', '\\\\'
+            )
+            command = [
+                venv_path, '&&', 'python', script_path, 'deactivate'
+            ]
+        else:
+            command = ['python', script_path]
+
+    return command
+
+
+def get_environment_name() -> str:
+    """
+        Name of the cache directory of the python environment in use,
+        the interpreter itself is checked by the indexer
+    """
+    venv_path = PyRockSettings().PYTHON_VIRTUAL_ENV_PATH.value
+    if not venv_path:
+        return PyRockConstants.DEFAULT_ENVIRONMENT_NAME
+
+    # `<prefix>/bin/activate` on unix and `<prefix>\Scripts\activate` on windows
+    environment_prefix = os.path.normcase(os.path.dirname(os.path.dirname(os.path.abspath(venv_path))))
+    return hashlib.sha1(environment_prefix.encode('utf-8')).hexdigest()[:16]
+
+
+def get_environment_cache_directory() -> str:
+    return os.path.join(
+        PyRockConstants.INDEX_CACHE_DIRECTORY,
+        PyRockConstants.ENVIRONMENTS_DIRECTORY_NAME,
+        get_environment_name(),
+    )
+
+
+def get_indexer_settings(
+    full_reindex: bool = False,
+    distributions: Optional[List[str]] = None,
+    priority_modules: Optional[List[str]] = None,
+) -> Dict:
+    """
+        Settings handed to the indexer scripts, through the environment
+        variable `PyRockConstants.INDEXER_SETTINGS_ENV_VAR`
+    """
+    return {
+        "PACKAGE_VERSION": PyRockConstants.PACKAGE_VERSION,
+        "IMPORT_SCAN_DEPTH": PyRockSettings().IMPORT_SCAN_DEPTH.value,
+        "INDEXER_ENGINE": PyRockSettings().INDEXER_ENGINE.value,
+        "INDEXER_WORKERS": PyRockSettings().INDEXER_WORKERS.value,
+        "INDEX_CACHE_DIRECTORY": PyRockConstants.INDEX_CACHE_DIRECTORY,
+        "ENVIRONMENTS_DIRECTORY_NAME": PyRockConstants.ENVIRONMENTS_DIRECTORY_NAME,
+        "ENVIRONMENT_NAME": get_environment_name(),
+        "INDEX_CACHE_MAX_SIZE": PyRockConstants.INDEX_CACHE_MAX_SIZE,
+        "INDEX_FORMAT": PyRockSettings().INDEX_FORMAT.value,
+        "IMPORT_INDEX_FILE_NAME": PyRockConstants.IMPORT_INDEX_FILE_NAME,
+        "BINARY_INDEX_FILE_NAME": PyRockConstants.BINARY_INDEX_FILE_NAME,
+        "STDLIB_INDEX_DIRECTORY_NAME": PyRockConstants.STDLIB_INDEX_DIRECTORY_NAME,
+        "STDLIB_IMPORT_INDEX_FILE_NAME": PyRockConstants.STDLIB_IMPORT_INDEX_FILE_NAME,
+        "STDLIB_BINARY_INDEX_FILE_NAME": PyRockConstants.STDLIB_BINARY_INDEX_FILE_NAME,
+        "EXTENSION_CACHE_FILE_NAME": PyRockConstants.EXTENSION_CACHE_FILE_NAME,
+        "DISTRIBUTIONS_MANIFEST_FILE_NAME": PyRockConstants.DISTRIBUTIONS_MANIFEST_FILE_NAME,
+        "INDEX_SHARDS_DIRECTORY_NAME": PyRockConstants.INDEX_SHARDS_DIRECTORY_NAME,
+        "MODULE_DISCOVERY_CACHE_FILE_NAME": PyRockConstants.MODULE_DISCOVERY_CACHE_FILE_NAME,
+        "INDEX_GENERATION_FILE_NAME": PyRockConstants.INDEX_GENERATION_FILE_NAME,
+        "INDEXER_LEASE_FILE_NAME": PyRockConstants.INDEXER_LEASE_FILE_NAME,
+        "INDEXER_EVENTS_FILE_NAME": PyRockConstants.INDEXER_EVENTS_FILE_NAME,
+        "INDEXER_PAUSE_FILE_NAME": PyRockConstants.INDEXER_PAUSE_FILE_NAME,
+        "INDEXER_IDLE_DELAY": PyRockSettings().INDEXER_IDLE_DELAY.value,
+        "INDEXER_MAX_PAUSE": PyRockConstants.INDEXER_MAX_PAUSE,
+        "INDEXER_NICENESS": PyRockConstants.INDEXER_NICENESS,
+        "INCLUDE_MODULES": PyRockSettings().INCLUDE_MODULES.value,
+        "EXCLUDE_MODULES": PyRockSettings().EXCLUDE_MODULES.value,
+        "INDEXER_TIMEOUT": PyRockConstants.INDEXER_TIMEOUT,
+        "MODULE_TIMEOUT": PyRockConstants.MODULE_TIMEOUT,
+        "WORKER_MAX_RSS": PyRockConstants.INDEXER_WORKER_MAX_RSS,
+        "WORKER_MAX_MODULES": PyRockConstants.INDEXER_WORKER_MAX_MODULES,
+        "FULL_REINDEX": full_reindex,
+        "REINDEX_DISTRIBUTIONS": distributions or [],
+        # Indexed first and published before the rest
+        "PRIORITY_MODULES": priority_modules or [],
+    }
+
+
+def get_indexer_environment(settings: Dict) -> Dict[str, str]:
+    return {
+        **os.environ,
+        PyRockConstants.INDEXER_SETTINGS_ENV_VAR: json.dumps(settings),
+    }
@@ -0,0 +1,64 @@
+import os
+import sys
+import importlib
+from types import ModuleType
+from typing import Dict
+
+import PyRock.src.scripts
+from PyRock.src.constants import PyRockConstants
+
+
+SCRIPTS_DIRECTORY = os.path.dirname(os.path.abspath(PyRock.src.scripts.__file__))
+
+
+def import_script(module_name: str) -> ModuleType:
+    """
+        Indexer scripts import each other by their module name, as when
+        they are run by the python of the project
+    """
+    if SCRIPTS_DIRECTORY not in sys.path:
+        sys.path.append(SCRIPTS_DIRECTORY)
+    return importlib.import_module(module_name)
+
+
+def get_test_indexer_settings(cache_directory: str, **settings) -> Dict:
+    """
+        Indexer settings keeping everything it writes in `cache_directory`
+    """
+    return {
+        "PACKAGE_VERSION": PyRockConstants.PACKAGE_VERSION,
+        "IMPORT_SCAN_DEPTH": PyRockConstants.DEFAULT_IMPORT_SCAN_DEPTH,
+        "INDEXER_ENGINE": PyRockConstants.DEFAULT_INDEXER_ENGINE,
+        "INDEXER_WORKERS": 1,
+        "INDEX_CACHE_DIRECTORY": cache_directory,
+        "ENVIRONMENTS_DIRECTORY_NAME": PyRockConstants.ENVIRONMENTS_DIRECTORY_NAME,
+        "ENVIRONMENT_NAME": PyRockConstants.DEFAULT_ENVIRONMENT_NAME,
+        "INDEX_CACHE_MAX_SIZE": PyRockConstants.INDEX_CACHE_MAX_SIZE,
+        "INDEX_FORMAT": PyRockConstants.DEFAULT_INDEX_FORMAT,
+        "IMPORT_INDEX_FILE_NAME": PyRockConstants.IMPORT_INDEX_FILE_NAME,
+        "BINARY_INDEX_FILE_NAME": PyRockConstants.BINARY_INDEX_FILE_NAME,
+        "STDLIB_INDEX_DIRECTORY_NAME": PyRockConstants.STDLIB_INDEX_DIRECTORY_NAME,
+        "STDLIB_IMPORT_INDEX_FILE_NAME": PyRockConstants.STDLIB_IMPORT_INDEX_FILE_NAME,
+        "STDLIB_BINARY_INDEX_FILE_NAME": PyRockConstants.STDLIB_BINARY_INDEX_FILE_NAME,
+        "EXTENSION_CACHE_FILE_NAME": PyRockConstants.EXTENSION_CACHE_FILE_NAME,
+        "DISTRIBUTIONS_MANIFEST_FILE_NAME": PyRockConstants.DISTRIBUTIONS_MANIFEST_FILE_NAME,
+        "INDEX_SHARDS_DIRECTORY_NAME": PyRockConstants.INDEX_SHARDS_DIRECTORY_NAME,
+        "MODULE_DISCOVERY_CACHE_FILE_NAME": PyRockConstants.MODULE_DISCOVERY_CACHE_FILE_NAME,
+        "INDEX_GENERATION_FILE_NAME": PyRockConstants.INDEX_GENERATION_FILE_NAME,
+        "INDEXER_LEASE_FILE_NAME": PyRockConstants.INDEXER_LEASE_FILE_NAME,
+        "INDEXER_EVENTS_FILE_NAME": PyRockConstants.INDEXER_EVENTS_FILE_NAME,
+        "INDEXER_PAUSE_FILE_NAME": PyRockConstants.INDEXER_PAUSE_FILE_NAME,
+        "INDEXER_IDLE_DELAY": 0,
+        "INDEXER_MAX_PAUSE": PyRockConstants.INDEXER_MAX_PAUSE,
+        "INDEXER_NICENESS": 0,
+        "INCLUDE_MODULES": [],
+        "EXCLUDE_MODULES": [],
+        "INDEXER_TIMEOUT": None,
+        "MODULE_TIMEOUT": PyRockConstants.MODULE_TIMEOUT,
+        "WORKER_MAX_RSS": PyRockConstants.INDEXER_WORKER_MAX_RSS,
+        "WORKER_MAX_MODULES": PyRockConstants.INDEXER_WORKER_MAX_MODULES,
+        "FULL_REINDEX": False,
+        "REINDEX_DISTRIBUTIONS": [],
+        "PRIORITY_MODULES": [],
+        **settings,
+    }
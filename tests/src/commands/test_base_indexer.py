@@ -1,6 +1,9 @@
+import io
+import json
 from unittest import mock
 from tests.base import PyRockTestBase
 from PyRock.src.commands.base_indexer import BaseIndexer
+from PyRock.src.constants import PyRockConstants
 
 
 class TestIndexer(PyRockTestBase):
@@ -20,3 +23,83 @@ class TestIndexer(PyRockTestBase):
         import_command = base_indexer._get_import_command()
 
         mocked_run_import_indexer.assert_called_once_with(self.window, import_command)
+
+    @mock.patch("PyRock.src.commands.base_indexer.indexer_scheduler.run_when_idle")
+    @mock.patch("PyRock.src.commands.base_indexer.BaseIndexer._run_import_indexer")
+    def test_unfinished_distributions_are_indexed_when_idle(
+        self,
+        mocked_run_import_indexer,
+        mocked_run_when_idle,
+    ):
+        base_indexer = BaseIndexer()
+
+        def run_import_indexer(window, import_command):
+            base_indexer._indexer_unfinished_distributions = 2
+            return True, ""
+
+        mocked_run_import_indexer.side_effect = run_import_indexer
+
+        base_indexer._run_indexer(self.window)
+        mocked_run_when_idle.assert_called_once()
+
+        mocked_run_when_idle.reset_mock()
+        base_indexer._run_indexer(self.window, resume_count=PyRockConstants.INDEXER_MAX_RESUMES)
+        mocked_run_when_idle.assert_not_called()
+
+    def _get_indexer_process(self, events):
+        output = b"".join(json.dumps(event).encode("utf-8") + b"\n" for event in events)
+        # Anything else the indexer prints is skipped
+        return mock.Mock(stdout=io.BytesIO(output + b"not an event\n"), stderr=io.BytesIO(b""))
+
+    @mock.patch("PyRock.src.commands.base_indexer.import_index_cache.warm_up")
+    @mock.patch("PyRock.src.commands.base_indexer.BaseIndexer._run_import_indexer")
+    def test_indexer_events_are_tracked(
+        self,
+        mocked_run_import_indexer,
+        mocked_warm_up,
+    ):
+        process = self._get_indexer_process([
+            {"event": "started", "distributions": 2, "modules": 2},
+            {"event": "module_started", "module": "rock_fast"},
+            {"event": "module_finished", "module": "rock_fast", "duration": 0.1, "error": None},
+            {"event": "paused"},
+            {"event": "resumed", "paused": 0.5},
+            {
+                "event": "summary", "success": True, "modules": 1, "symbols": 10, "duration": 1,
+                "slowest_modules": [], "skipped_modules": [], "unfinished_distributions": 1,
+            },
+        ])
+        base_indexer = BaseIndexer()
+        mocked_run_import_indexer.side_effect = lambda window, import_command: (
+            base_indexer._track_indexer_progress(window, process), ""
+        )
+
+        with mock.patch.object(self.window, "status_message") as mocked_status_message:
+            self.assertTrue(base_indexer._run_indexer_once(self.window, False, None))
+
+        status_messages = [call.args[0] for call in mocked_status_message.call_args_list]
+        self.assertTrue(any(message.startswith("Indexing imports...50%") for message in status_messages))
+        self.assertIn("Indexing imports paused while typing", status_messages)
+        self.assertEqual(
+            status_messages[-1],
+            "Indexed imports partially, 1 distributions are left for when the editor is idle",
+        )
+        self.assertEqual(base_indexer._indexer_current_module, "rock_fast")
+        process.wait.assert_called_once()
+
+    @mock.patch("PyRock.src.commands.base_indexer.sublime.error_message")
+    @mock.patch("PyRock.src.commands.base_indexer.BaseIndexer._run_import_indexer_on_server", return_value=None)
+    @mock.patch("PyRock.src.commands.base_indexer.subprocess.Popen")
+    def test_failed_event_fails_indexing(
+        self,
+        mocked_popen,
+        mocked_run_import_indexer_on_server,
+        mocked_error_message,
+    ):
+        mocked_popen.return_value = self._get_indexer_process([
+            {"event": "started", "distributions": 1, "modules": 1},
+            {"event": "failed", "message": "Unable to discover modules"},
+        ])
+
+        self.assertFalse(BaseIndexer()._run_indexer_once(self.window, False, None))
+        mocked_error_message.assert_called_once_with("Indexing Failed\n\nUnable to discover modules")
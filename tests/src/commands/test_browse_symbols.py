@@ -0,0 +1,63 @@
+from unittest.mock import patch
+
+from sublime import FindFlags
+
+from tests.base import PyRockTestBase
+from PyRock.src.scripts.index_format import JsonImportIndex
+from PyRock.src.commands.browse_symbols import SymbolPrefixInputHandler
+
+
+class TestBrowseSymbols(PyRockTestBase):
+    def setUp(self):
+        super().setUp()
+
+    @patch("PyRock.src.commands.import_symbol.ImportSymbolCommand.load_user_python_imports")
+    def test_symbol_prefix_search(
+        self,
+        mocked_load_user_python_imports,
+    ):
+        mocked_load_user_python_imports.return_value = JsonImportIndex({
+            "OrderedDict": ["collections.OrderedDict"],
+            "Order": ["shop.Order"],
+            "log10": ["cmath.log10"],
+        })
+
+        input_handler = SymbolPrefixInputHandler(self.view)
+        input_handler.preview("orde")
+
+        self.assertEqual(input_handler.import_paths, ["shop.Order", "collections.OrderedDict"])
+        self.assertFalse(input_handler.validate("xyz"))
+
+    @patch("PyRock.src.commands.import_symbol.ImportSymbolCommand.load_user_python_imports")
+    def test_entered_prefix_is_searched_once(
+        self,
+        mocked_load_user_python_imports,
+    ):
+        mocked_load_user_python_imports.return_value = JsonImportIndex({
+            "OrderedDict": ["collections.OrderedDict"],
+        })
+
+        input_handler = SymbolPrefixInputHandler(self.view)
+        with patch.object(
+            input_handler.import_index, "prefix_search", wraps=input_handler.import_index.prefix_search
+        ) as mocked_prefix_search:
+            input_handler.preview("Ordered")
+            self.assertTrue(input_handler.validate("Ordered"))
+            next_input = input_handler.next_input({"symbol_prefix": "Ordered"})
+
+            self.assertEqual(next_input.import_paths, ["collections.OrderedDict"])
+            mocked_prefix_search.assert_called_once()
+
+    def test_command(self):
+        self.view.run_command(
+            "py_rock_browse_symbols",
+            args={
+                "symbol_prefix": "Ordered",
+                "import_path": "collections.OrderedDict",
+                "test": True,
+            }
+        )
+        expected_import_statement = self.view.substr(
+            self.view.find("from collections import OrderedDict", 0, flags=FindFlags.LITERAL)
+        )
+        self.assertEqual(expected_import_statement, "from collections import OrderedDict")
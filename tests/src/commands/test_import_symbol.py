@@ -4,6 +4,7 @@ import sublime
 from sublime import FindFlags
 
 from tests.base import PyRockTestBase
+from PyRock.src.scripts.index_format import JsonImportIndex
 
 
 class TestImportSymbol(PyRockTestBase):
@@ -18,13 +19,11 @@ class TestImportSymbol(PyRockTestBase):
         self,
         mocked_load_user_python_imports,
     ):
-        mocked_load_user_python_imports.return_value = {
-            "c": {
-                "h": [
-                    "cmath"
-                ]
-            }
-        }
+        mocked_load_user_python_imports.return_value = JsonImportIndex({
+            "cmath": [
+                "cmath"
+            ]
+        })
 
         insert_text = "cmath"
         self.setText(insert_text)
@@ -46,13 +45,11 @@ class TestImportSymbol(PyRockTestBase):
         self,
         mocked_load_user_python_imports,
     ):
-        mocked_load_user_python_imports.return_value = {
-            "c": {
-                "h": [
-                    "cmath"
-                ]
-            }
-        }
+        mocked_load_user_python_imports.return_value = JsonImportIndex({
+            "cmath": [
+                "cmath"
+            ]
+        })
 
         insert_text = "import subprocess\ncmath"
         self.setText(insert_text)
@@ -86,13 +83,11 @@ class TestImportSymbol(PyRockTestBase):
         self,
         mocked_load_user_python_imports,
     ):
-        mocked_load_user_python_imports.return_value = {
-            "l": {
-                "0": [
-                    "cmath.log10"
-                ]
-            }
-        }
+        mocked_load_user_python_imports.return_value = JsonImportIndex({
+            "log10": [
+                "cmath.log10"
+            ]
+        })
 
         insert_text = "from cmath import sin\nlog10"
         self.setText(insert_text)
@@ -114,13 +109,11 @@ class TestImportSymbol(PyRockTestBase):
         self,
         mocked_load_user_python_imports,
     ):
-        mocked_load_user_python_imports.return_value = {
-            "c": {
-                "h": [
-                    "cmath"
-                ]
-            }
-        }
+        mocked_load_user_python_imports.return_value = JsonImportIndex({
+            "cmath": [
+                "cmath"
+            ]
+        })
 
         insert_text = "cmath"
         self.setText(insert_text)
@@ -137,3 +130,80 @@ class TestImportSymbol(PyRockTestBase):
 
         expected_import_statement = sublime.get_clipboard()
         self.assertEqual(expected_import_statement, "import cmath")
+
+    @patch("PyRock.src.commands.import_symbol.ImportSymbolCommand.load_user_python_imports")
+    def test_import_symbol_ignoring_case(
+        self,
+        mocked_load_user_python_imports,
+    ):
+        mocked_load_user_python_imports.return_value = JsonImportIndex({
+            "OrderedDict": [
+                "collections.OrderedDict"
+            ]
+        })
+
+        insert_text = "ordereddict"
+        self.setText(insert_text)
+
+        self.view.sel().clear()
+        self.view.sel().add(sublime.Region(0, len(insert_text)))
+
+        self.view.run_command("py_rock", args={"action": "import_symbol", "test": True})
+        expected_import_statement = self.view.substr(
+            self.view.find("from collections import OrderedDict", 0, flags=FindFlags.LITERAL)
+        )
+        self.assertEqual(expected_import_statement, "from collections import OrderedDict")
+
+    @patch("PyRock.src.commands.import_symbol.ImportSymbolCommand.load_user_python_imports")
+    def test_import_symbol_fuzzy_match(
+        self,
+        mocked_load_user_python_imports,
+    ):
+        mocked_load_user_python_imports.return_value = JsonImportIndex({
+            "HttpResponse": [
+                "django.http.HttpResponse"
+            ],
+            "ThreadPoolExecutor": [
+                "concurrent.futures.ThreadPoolExecutor"
+            ],
+        })
+
+        for insert_text, expected_import in [
+            ("HttpRespons", "from django.http import HttpResponse"),
+            ("TPE", "from concurrent.futures import ThreadPoolExecutor"),
+        ]:
+            self.view.run_command("select_all")
+            self.setText(insert_text)
+
+            self.view.sel().clear()
+            self.view.sel().add(sublime.Region(0, len(insert_text)))
+
+            self.view.run_command("py_rock", args={"action": "import_symbol", "test": True})
+            expected_import_statement = self.view.substr(
+                self.view.find(expected_import, 0, flags=FindFlags.LITERAL)
+            )
+            self.assertEqual(expected_import_statement, expected_import)
+
+    @patch("PyRock.src.commands.import_symbol.ImportSymbolCommand.load_user_python_imports")
+    def test_import_symbol_prefers_public_module(
+        self,
+        mocked_load_user_python_imports,
+    ):
+        mocked_load_user_python_imports.return_value = JsonImportIndex({
+            "Client": [
+                "pkg._impl.Client",
+                "pkg.api.clients.Client",
+            ]
+        })
+
+        insert_text = "Client"
+        self.setText(insert_text)
+
+        self.view.sel().clear()
+        self.view.sel().add(sublime.Region(0, len(insert_text)))
+
+        self.view.run_command("py_rock", args={"action": "import_symbol", "test": True})
+        expected_import_statement = self.view.substr(
+            self.view.find("from pkg.api.clients import Client", 0, flags=FindFlags.LITERAL)
+        )
+        self.assertEqual(expected_import_statement, "from pkg.api.clients import Client")
@@ -27,3 +27,18 @@ class TestReIndexImportsCommand(PyRockTestBase):
         )
 
         self.assertEqual(mocked_set_timeout_async.call_count, 1)
+
+    @patch("PyRock.src.commands.re_index_imports.ReIndexImportsCommand._run_indexer")
+    @patch("sublime.set_timeout_async")
+    @patch("sublime.ok_cancel_dialog")
+    def test_rebuild_command_indexes_everything_again(
+        self,
+        mocked_ok_cancel_dialog,
+        mocked_set_timeout_async,
+        mocked_run_indexer,
+    ):
+        mocked_ok_cancel_dialog.return_value = True
+        mocked_set_timeout_async.side_effect = lambda callback, delay: callback()
+        self.view.run_command("py_rock", args={"action": "rebuild_imports"})
+
+        mocked_run_indexer.assert_called_once_with(self.window, force=True)
@@ -0,0 +1,45 @@
+from unittest.mock import patch
+
+import sublime
+
+from tests.base import PyRockTestBase
+
+
+class TestReIndexPackageCommand(PyRockTestBase):
+    def setUp(self):
+        super().setUp()
+
+    @patch("PyRock.src.commands.base_indexer.BaseIndexer._run_indexer")
+    @patch("PyRock.src.commands.base_indexer.BaseIndexer.get_indexed_distributions")
+    def test_command(
+        self,
+        mocked_get_indexed_distributions,
+        mocked_run_indexer,
+    ):
+        mocked_get_indexed_distributions.return_value = {
+            "requests": {
+                "version": "2.31.0",
+                "record_hash": "",
+                "modules": ["requests"],
+            },
+        }
+
+        with patch("sublime.set_timeout_async", side_effect=lambda callback, delay: callback()):
+            self.view.run_command("py_rock", args={"action": "re_index_package", "test": True})
+
+        mocked_run_indexer.assert_called_once_with(
+            sublime.active_window(), distributions=["requests"]
+        )
+
+    @patch("sublime.set_timeout_async")
+    @patch("PyRock.src.commands.base_indexer.BaseIndexer.get_indexed_distributions")
+    def test_command_without_index(
+        self,
+        mocked_get_indexed_distributions,
+        mocked_set_timeout_async,
+    ):
+        mocked_get_indexed_distributions.return_value = {}
+
+        self.view.run_command("py_rock", args={"action": "re_index_package", "test": True})
+
+        mocked_set_timeout_async.assert_not_called()
@@ -0,0 +1,34 @@
+import socket
+import threading
+import subprocess
+
+from tests.base import PyRockTestBase
+from tests.helpers import import_script
+
+
+import_sandbox = import_script("import_sandbox")
+
+
+class TestImportSandbox(PyRockTestBase):
+    def test_blocked_calls_fail_and_are_restored(self):
+        connect = socket.socket.connect
+        execute_child = subprocess.Popen._execute_child
+        thread_start = threading.Thread.start
+
+        with import_sandbox.ImportSandbox() as sandbox:
+            with self.assertRaises(import_sandbox.SandboxViolation):
+                socket.create_connection(("localhost", 9))
+            with self.assertRaises(import_sandbox.SandboxViolation):
+                subprocess.run(["python", "--version"])
+            with self.assertRaises(OSError):
+                threading.Thread(target=print).start()
+
+        self.assertEqual(
+            sandbox.blocked_calls,
+            ["socket.create_connection", "subprocess.Popen", "threading.Thread.start"],
+        )
+        self.assertIs(socket.socket.connect, connect)
+        self.assertIs(subprocess.Popen._execute_child, execute_child)
+        self.assertIs(threading.Thread.start, thread_start)
+        # Inherited from the compiled socket class, never set on the subclass
+        self.assertNotIn("connect", vars(socket.socket))
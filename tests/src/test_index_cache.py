@@ -0,0 +1,167 @@
+import os
+import json
+import tempfile
+from unittest.mock import patch
+
+from tests.base import PyRockTestBase
+from PyRock.src.constants import PyRockConstants
+from PyRock.src.index_cache import ImportIndexCache
+from PyRock.src.scripts.index_format import (
+    BinaryImportIndex,
+    BinaryImportIndexWriter,
+    InvalidIndexFile,
+    JsonImportIndex,
+    JsonImportIndexWriter,
+    UNKNOWN_KIND,
+    get_snapshot_path,
+    migrate_index_file,
+    remove_previous_snapshots,
+    write_index_generation,
+)
+
+
+class TestImportIndexCache(PyRockTestBase):
+    def setUp(self):
+        super().setUp()
+        self.temp_directory = tempfile.TemporaryDirectory()
+        self.index_file_path = os.path.join(
+            self.temp_directory.name, PyRockConstants.IMPORT_INDEX_FILE_NAME
+        )
+        self.stdlib_index_file_path = os.path.join(
+            self.temp_directory.name, PyRockConstants.STDLIB_IMPORT_INDEX_FILE_NAME
+        )
+        self.stdlib_index_patcher = patch.object(
+            ImportIndexCache, "_get_stdlib_index_file_path", return_value=self.stdlib_index_file_path
+        )
+        self.stdlib_index_patcher.start()
+
+    def tearDown(self):
+        super().tearDown()
+        self.stdlib_index_patcher.stop()
+        self.temp_directory.cleanup()
+
+    def _write_file(self, index_data, file_path=None):
+        file_path = file_path or self.index_file_path
+        temp_path = f"{file_path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(index_data, f)
+        os.replace(temp_path, file_path)
+
+    def _write_index(self, imports_map, file_path=None):
+        JsonImportIndexWriter().write(file_path or self.index_file_path, [
+            (import_path, UNKNOWN_KIND) for import_paths in imports_map.values() for import_path in import_paths
+        ])
+
+    def test_index_is_loaded_again_only_when_replaced(self):
+        with patch.object(
+            ImportIndexCache, "_get_index_file_path", return_value=self.index_file_path
+        ):
+            index_cache = ImportIndexCache()
+            self.assertIsNone(index_cache.get())
+
+            self._write_index({"cmath": ["cmath"]})
+            import_index = index_cache.get()
+            self.assertEqual(import_index.lookup("cmath"), ["cmath"])
+            self.assertIs(index_cache.get(), import_index)
+
+            self._write_index({"log10": ["cmath.log10"]})
+            os.utime(self.index_file_path, ns=(0, 0))
+            self.assertEqual(index_cache.get().lookup("log10"), ["cmath.log10"])
+
+    def test_stdlib_index_is_looked_up_along(self):
+        with patch.object(
+            ImportIndexCache, "_get_index_file_path", return_value=self.index_file_path
+        ):
+            self._write_index({"Path": ["pathlib.Path"], "log10": ["cmath.log10"]}, self.stdlib_index_file_path)
+            self._write_index({"Path": ["trio.Path"]})
+
+            import_index = ImportIndexCache().get()
+            self.assertEqual(import_index.lookup("Path"), ["trio.Path", "pathlib.Path"])
+            self.assertEqual(import_index.lookup("log10"), ["cmath.log10"])
+            self.assertEqual(import_index.prefix_search("Pat", 10), ["pathlib.Path", "trio.Path"])
+
+    def test_previous_generation_is_used_until_the_next_one_is_complete(self):
+        generation_file_path = os.path.join(
+            self.temp_directory.name, PyRockConstants.INDEX_GENERATION_FILE_NAME
+        )
+        with patch.object(
+            ImportIndexCache, "_get_index_file_path", return_value=self.index_file_path
+        ):
+            self._write_index({"cmath": ["cmath"]}, get_snapshot_path(self.index_file_path, 1))
+            write_index_generation(generation_file_path)
+
+            index_cache = ImportIndexCache()
+            self.assertEqual(index_cache.get().lookup("cmath"), ["cmath"])
+            self.assertEqual(index_cache.generation, 1)
+
+            # Written by a re-index which is not done yet
+            self._write_index({"log10": ["cmath.log10"]}, get_snapshot_path(self.index_file_path, 2))
+            self.assertEqual(index_cache.get().lookup("cmath"), ["cmath"])
+
+            write_index_generation(generation_file_path)
+            self.assertEqual(index_cache.get().lookup("log10"), ["cmath.log10"])
+            self.assertEqual(index_cache.generation, 2)
+
+            # A broken index keeps the previous snapshot in use
+            with open(get_snapshot_path(self.index_file_path, 3), "w") as f:
+                f.write('{"imports": ')
+            write_index_generation(generation_file_path)
+            self.assertEqual(index_cache.get().lookup("log10"), ["cmath.log10"])
+
+    def test_next_generation_is_published_while_the_index_is_mapped(self):
+        index_file_path = os.path.join(self.temp_directory.name, PyRockConstants.BINARY_INDEX_FILE_NAME)
+        generation_file_path = os.path.join(
+            self.temp_directory.name, PyRockConstants.INDEX_GENERATION_FILE_NAME
+        )
+        with patch.object(ImportIndexCache, "_get_index_file_path", return_value=index_file_path):
+            BinaryImportIndexWriter().write(index_file_path, [("cmath.log10", "function")])
+            index_cache = ImportIndexCache()
+            import_index = index_cache.get()
+            self.assertIsInstance(import_index, BinaryImportIndex)
+            self.assertEqual(import_index.lookup("log10"), ["cmath.log10"])
+
+            # As the indexer publishes a generation, the mapped file is
+            # neither replaced nor written again
+            BinaryImportIndexWriter().write(
+                get_snapshot_path(index_file_path, 1), [("cmath.log1p", "function")]
+            )
+            generation = write_index_generation(generation_file_path)
+            remove_previous_snapshots(index_file_path, generation)
+
+            self.assertEqual(import_index.lookup("log10"), ["cmath.log10"])
+            self.assertEqual(index_cache.get().lookup("log1p"), ["cmath.log1p"])
+            self.assertEqual(index_cache.get().lookup("log10"), [])
+            import_index.close()
+
+            # Left behind while mapped on windows, removed by the next publish
+            remove_previous_snapshots(index_file_path, generation)
+            self.assertFalse(os.path.exists(index_file_path))
+            self.assertTrue(os.path.exists(get_snapshot_path(index_file_path, 1)))
+
+    def test_index_written_before_versioning_is_built_again(self):
+        # Symbols bucketed by their first and last letter
+        self._write_file({"l": {"0": ["cmath.log10"]}})
+
+        with self.assertRaises(InvalidIndexFile):
+            JsonImportIndex.from_file(self.index_file_path)
+        with self.assertRaises(InvalidIndexFile):
+            migrate_index_file(self.index_file_path, {"producer": "PyRock"})
+
+        with patch.object(
+            ImportIndexCache, "_get_index_file_path", return_value=self.index_file_path
+        ):
+            self.assertIsNone(ImportIndexCache().get())
+
+    def test_corrupted_index_keeps_the_previous_snapshot(self):
+        with patch.object(
+            ImportIndexCache, "_get_index_file_path", return_value=self.index_file_path
+        ):
+            JsonImportIndexWriter().write(self.index_file_path, [("cmath.log10", "function")])
+            index_cache = ImportIndexCache()
+            self.assertEqual(index_cache.get().lookup("log10"), ["cmath.log10"])
+
+            with open(self.index_file_path, "r") as f:
+                index_text = f.read()
+            self._write_file(json.loads(index_text.replace("cmath.log10", "cmath.log11")))
+            os.utime(self.index_file_path, ns=(0, 0))
+            self.assertEqual(index_cache.get().lookup("log10"), ["cmath.log10"])
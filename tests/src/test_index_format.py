@@ -0,0 +1,186 @@
+import os
+import struct
+import tempfile
+from unittest.mock import patch
+
+from tests.base import PyRockTestBase
+from PyRock.src.scripts.index_format import (
+    BINARY_INDEX_MAGIC,
+    BINARY_INDEX_MIGRATIONS,
+    BINARY_INDEX_VERSION,
+    HEADER_FIELDS,
+    HEADER_FIELDS_BY_VERSION,
+    BinaryImportIndex,
+    BinaryImportIndexWriter,
+    InvalidIndexFile,
+    JsonImportIndex,
+    JsonImportIndexWriter,
+    migrate_index_file,
+)
+
+
+IMPORT_ENTRIES = [
+    ("os.path", "module"),
+    ("os.path.join", "function"),
+    ("shlex.join", "function"),
+    ("collections.OrderedDict", "class"),
+    ("typing.OrderedDict", "alias"),
+    ("http.HTTPStatus", "class"),
+    ("json.JSONDecodeError", "class"),
+    ("json.decoder.JSONDecodeError", "class"),
+]
+
+
+class TestBinaryImportIndex(PyRockTestBase):
+    def setUp(self):
+        super().setUp()
+        self.temp_directory = tempfile.TemporaryDirectory()
+        self.index_file_path = os.path.join(self.temp_directory.name, "py_rock_imports.idx")
+        BinaryImportIndexWriter().write(self.index_file_path, IMPORT_ENTRIES, {"producer": "PyRock"})
+        self.import_index = BinaryImportIndex(self.index_file_path)
+
+    def tearDown(self):
+        super().tearDown()
+        self.import_index.close()
+        self.temp_directory.cleanup()
+
+    def _write_file(self, data: bytes) -> str:
+        file_path = os.path.join(self.temp_directory.name, "broken.idx")
+        with open(file_path, "wb") as f:
+            f.write(data)
+        return file_path
+
+    def test_lookup(self):
+        self.assertEqual(self.import_index.lookup("join"), ["os.path.join", "shlex.join"])
+        self.assertEqual(self.import_index.lookup("ordereddict"), [])
+        self.assertEqual(
+            self.import_index.lookup("ordereddict", ignore_case=True),
+            ["collections.OrderedDict", "typing.OrderedDict"],
+        )
+        self.assertEqual(self.import_index.lookup("OrderedDict", kinds=["alias"]), ["typing.OrderedDict"])
+        self.assertEqual(self.import_index.lookup("missing"), [])
+
+    def test_prefix_search(self):
+        self.assertEqual(
+            self.import_index.prefix_search("JSONDec", 10),
+            ["json.JSONDecodeError", "json.decoder.JSONDecodeError"],
+        )
+        self.assertEqual(self.import_index.prefix_search("os.pa", 10), ["os.path", "os.path.join"])
+        self.assertEqual(self.import_index.prefix_search("j", 10, kinds=["function"]), ["shlex.join", "os.path.join"])
+
+    def test_fuzzy_search(self):
+        self.assertEqual(self.import_index.fuzzy_search("ordrdict", 1), ["collections.OrderedDict"])
+        # Camel hump initials
+        self.assertEqual(self.import_index.fuzzy_search("jde", 1), ["json.JSONDecodeError"])
+        self.assertEqual(self.import_index.fuzzy_search("ordrdict", 5, kinds=["alias"]), ["typing.OrderedDict"])
+
+    def test_metadata_and_checksum(self):
+        self.assertEqual(self.import_index.version, BINARY_INDEX_VERSION)
+        self.assertEqual(self.import_index.get_metadata(), {"producer": "PyRock"})
+        self.assertTrue(self.import_index.is_valid())
+
+        with open(self.index_file_path, "rb") as f:
+            data = bytearray(f.read())
+        data[-len(b'{"producer": "PyRock"}') - 1] ^= 0xFF
+        corrupted_index = BinaryImportIndex(self._write_file(bytes(data)))
+        self.assertFalse(corrupted_index.is_valid())
+        corrupted_index.close()
+
+    def test_invalid_files(self):
+        with self.assertRaises(InvalidIndexFile):
+            BinaryImportIndex(self._write_file(b""))
+
+        with open(self.index_file_path, "rb") as f:
+            data = f.read()
+        with self.assertRaises(InvalidIndexFile):
+            BinaryImportIndex(self._write_file(data[:20]))
+        with self.assertRaises(InvalidIndexFile):
+            BinaryImportIndex(self._write_file(struct.pack('<8sI', BINARY_INDEX_MAGIC, 99) + data[12:]))
+
+    def test_previous_version_is_migrated(self):
+        header, header_size = self.import_index.header, self.import_index.header_size
+        with open(self.index_file_path, "rb") as f:
+            data = f.read()
+        body = data[header_size:header["metadata_offset"]]
+
+        # Version 6 would have sorted the prefix sections the other way
+        def migrate_previous_version(previous_header, previous_body):
+            migrated_body = bytearray(previous_body)
+            for offset_field, count in (
+                ("folded_sorted_symbols_offset", previous_header["symbol_count"]),
+                ("folded_sorted_paths_offset", previous_header["path_count"]),
+            ):
+                start = previous_header[offset_field] - header_size
+                section = struct.unpack_from(f"<{count}I", migrated_body, start)
+                struct.pack_into(f"<{count}I", migrated_body, start, *reversed(section))
+            return previous_header, bytes(migrated_body)
+
+        previous_version = BINARY_INDEX_VERSION - 1
+        file_path = self._write_file(struct.pack(
+            f"<8sI{len(HEADER_FIELDS)}I",
+            BINARY_INDEX_MAGIC,
+            previous_version,
+            *[header[field] for field in HEADER_FIELDS]
+        ) + migrate_previous_version(header, body)[1])
+
+        # Files of the versions before the first released one are built again
+        with self.assertRaises(InvalidIndexFile):
+            migrate_index_file(file_path, {"producer": "PyRock"})
+
+        with patch.dict(HEADER_FIELDS_BY_VERSION, {previous_version: HEADER_FIELDS}), \
+                patch.dict(BINARY_INDEX_MIGRATIONS, {previous_version: migrate_previous_version}):
+            with self.assertRaises(InvalidIndexFile):
+                BinaryImportIndex(file_path)
+
+            self.assertEqual(migrate_index_file(file_path, {"producer": "PyRock"}), previous_version)
+            self.assertIsNone(migrate_index_file(file_path, {"producer": "PyRock"}))
+
+        migrated_index = BinaryImportIndex(file_path)
+        self.assertTrue(migrated_index.is_valid())
+        self.assertEqual(migrated_index.get_metadata(), {"producer": "PyRock", "migrated_from": previous_version})
+        self.assertEqual(migrated_index.lookup("join"), ["os.path.join", "shlex.join"])
+        for prefix in ("JSONDec", "j", "os.pa", "json."):
+            self.assertEqual(migrated_index.prefix_search(prefix, 10), self.import_index.prefix_search(prefix, 10))
+        migrated_index.close()
+
+
+class TestPrefixSearch(PyRockTestBase):
+    def setUp(self):
+        super().setUp()
+        self.temp_directory = tempfile.TemporaryDirectory()
+        self.import_entries = [
+            (f"pkg.getattr_value_{number:05}", "function") for number in range(2500)
+        ] + [("pkg.getz", "class"), ("pkg.models.GetZ", "class")]
+
+    def tearDown(self):
+        super().tearDown()
+        self.temp_directory.cleanup()
+
+    def _get_import_indexes(self):
+        index_file_path = os.path.join(self.temp_directory.name, "py_rock_imports.idx")
+        BinaryImportIndexWriter().write(index_file_path, self.import_entries)
+        json_index_file_path = os.path.join(self.temp_directory.name, "py_rock_imports.json")
+        JsonImportIndexWriter().write(json_index_file_path, self.import_entries)
+        return [BinaryImportIndex(index_file_path), JsonImportIndex.from_file(json_index_file_path)]
+
+    def test_top_matches_past_the_scan_limit(self):
+        for import_index in self._get_import_indexes():
+            self.assertEqual(
+                import_index.prefix_search("get", 3),
+                ["pkg.getz", "pkg.models.GetZ", "pkg.getattr_value_00000"],
+            )
+            self.assertEqual(import_index.prefix_search("pkg.get", 2), ["pkg.getz", "pkg.getattr_value_00000"])
+            self.assertEqual(import_index.prefix_search("getattr_value_0249", 2), [
+                "pkg.getattr_value_02490", "pkg.getattr_value_02491",
+            ])
+            import_index.close()
+
+    def test_kinds_are_filtered_before_the_limit(self):
+        self.import_entries = [
+            (f"pkg.get_{number:05}", "function") for number in range(2500)
+        ] + [("pkg.models.get_everything", "class")]
+
+        for import_index in self._get_import_indexes():
+            self.assertEqual(import_index.prefix_search("get", 3, kinds=["class"]), ["pkg.models.get_everything"])
+            self.assertEqual(import_index.prefix_search("pkg.", 3, kinds=["class"]), ["pkg.models.get_everything"])
+            import_index.close()
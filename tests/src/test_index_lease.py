@@ -0,0 +1,56 @@
+import os
+import json
+import time
+import socket
+import tempfile
+
+from tests.base import PyRockTestBase
+from tests.helpers import import_script
+
+
+index_lease = import_script("index_lease")
+
+
+class TestIndexLease(PyRockTestBase):
+    def setUp(self):
+        super().setUp()
+        self.temp_directory = tempfile.TemporaryDirectory()
+        self.lease_path = os.path.join(self.temp_directory.name, "py_rock_indexer.lock")
+        self.events_path = os.path.join(self.temp_directory.name, "py_rock_indexer_events.jsonl")
+
+    def tearDown(self):
+        super().tearDown()
+        self.temp_directory.cleanup()
+
+    def _get_lease(self):
+        return index_lease.IndexLease(self.lease_path, self.events_path)
+
+    def _write_lease(self, pid, heartbeat_time):
+        with open(self.lease_path, "w") as f:
+            json.dump({"pid": pid, "hostname": socket.gethostname(), "started": heartbeat_time}, f)
+        os.utime(self.lease_path, (heartbeat_time, heartbeat_time))
+
+    def test_live_lease_is_followed_until_released(self):
+        lease = self._get_lease()
+        self.assertTrue(lease.acquire())
+        self.assertFalse(self._get_lease().acquire())
+
+        lease.record_event('{"event": "started"}\n')
+        lease.record_event('{"event": "summary"}\n')
+        lease.release()
+
+        events = []
+        self.assertTrue(self._get_lease().follow(events.append, deadline=time.monotonic() + 5))
+        self.assertEqual(events, [{"event": "started"}, {"event": "summary"}])
+        self.assertFalse(os.path.exists(self.lease_path))
+
+    def test_stale_lease_is_taken_over(self):
+        # Process still running, but no heartbeat for too long
+        self._write_lease(os.getpid(), time.time() - index_lease.LEASE_TIMEOUT - 1)
+
+        lease = self._get_lease()
+        self.assertTrue(lease.acquire())
+        with open(self.lease_path, "r") as f:
+            self.assertGreater(json.load(f)["started"], time.time() - index_lease.LEASE_TIMEOUT)
+        lease.release()
+        self.assertFalse(os.path.exists(self.lease_path))
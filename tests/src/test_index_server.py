@@ -0,0 +1,93 @@
+import io
+import os
+import json
+import time
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+from tests.base import PyRockTestBase
+from tests.helpers import import_script
+
+
+index_server = import_script("index_server")
+
+
+class TestIndexServer(PyRockTestBase):
+    def setUp(self):
+        super().setUp()
+        self.temp_directory = tempfile.TemporaryDirectory()
+        self.output_stream = io.StringIO()
+        self.server = index_server.IndexServer(io.StringIO(), self.output_stream)
+
+    def tearDown(self):
+        super().tearDown()
+        self.temp_directory.cleanup()
+
+    def _get_responses(self):
+        return {
+            message["id"]: message
+            for message in map(json.loads, self.output_stream.getvalue().splitlines())
+            if "id" in message
+        }
+
+    def _dispatch(self, request_id, method, params=None):
+        return self.server._dispatch(
+            json.dumps({"jsonrpc": "2.0", "id": request_id, "method": method, "params": params})
+        )
+
+    def _write_indexer(self, text):
+        # Run by the server in place of the indexer next to it
+        with open(os.path.join(self.temp_directory.name, "indexer.py"), "w") as f:
+            f.write(text)
+        return patch.object(index_server, "path", Path(self.temp_directory.name) / "index_server.py")
+
+    def test_requests_are_dispatched(self):
+        self.assertTrue(self._dispatch(1, "lookup", {"symbol": "path"}))
+        self.assertTrue(self._dispatch(2, "lookup", {"name": "path"}))
+        self.assertTrue(self._dispatch(3, "unknown"))
+        self.assertTrue(self.server._dispatch('{"jsonrpc": "2.0", "id": 4'))
+        self.assertFalse(self._dispatch(5, "shutdown"))
+
+        responses = self._get_responses()
+        # No index built yet
+        self.assertEqual(responses[1]["result"], [])
+        self.assertEqual(responses[2]["error"]["code"], index_server.INVALID_PARAMS)
+        self.assertEqual(responses[3]["error"]["code"], index_server.METHOD_NOT_FOUND)
+        self.assertEqual(responses[None]["error"]["code"], index_server.PARSE_ERROR)
+        self.assertIsNone(responses[5]["result"])
+
+    def test_reindex_is_refused_while_indexing(self):
+        self.server._reindex_lock.acquire()
+        try:
+            self._dispatch(1, "reindex", {"settings": {}, "timeout": 1})
+            # Answered from its own thread
+            deadline = time.monotonic() + 5
+            while 1 not in self._get_responses() and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            self.server._reindex_lock.release()
+
+        self.assertEqual(self._get_responses()[1]["error"]["code"], index_server.INDEXING_IN_PROGRESS)
+
+    def test_hanging_indexer_is_killed_past_the_timeout(self):
+        with self._write_indexer("import time\ntime.sleep(60)\n"):
+            start_time = time.monotonic()
+            result = self.server.reindex(settings={}, timeout=0.5)
+
+        self.assertLess(time.monotonic() - start_time, 10)
+        self.assertFalse(result["success"])
+        self.assertIn("ran past 0.5 sec", result["message"])
+        self.assertFalse(self.server._reindex_lock.locked())
+
+    def test_paused_indexer_is_given_the_max_pause(self):
+        with self._write_indexer(
+            "import json, time\nprint(json.dumps({'event': 'paused'}), flush=True)\ntime.sleep(60)\n"
+        ):
+            start_time = time.monotonic()
+            result = self.server.reindex(settings={"INDEXER_MAX_PAUSE": 1}, timeout=0.2)
+
+        self.assertGreaterEqual(time.monotonic() - start_time, 1)
+        self.assertLess(time.monotonic() - start_time, 10)
+        self.assertFalse(result["success"])
+        self.assertIn('"event": "paused"', self.output_stream.getvalue())
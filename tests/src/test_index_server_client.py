@@ -0,0 +1,63 @@
+from unittest.mock import patch
+
+from tests.base import PyRockTestBase
+from PyRock.src.exceptions import IndexServerError
+from PyRock.src.scripts.index_format import JsonImportIndex
+from PyRock.src.index_server_client import IndexServerClient
+
+
+class TestRemoteImportIndex(PyRockTestBase):
+    def setUp(self):
+        super().setUp()
+
+    @patch("PyRock.src.index_server_client.IndexServerClient.request")
+    def test_lookup(self, mocked_request):
+        mocked_request.return_value = ["cmath.log10"]
+
+        import_index = IndexServerClient().get_index()
+
+        self.assertEqual(import_index.lookup("log10"), ["cmath.log10"])
+        mocked_request.assert_called_once_with(
+            "lookup", {"symbol": "log10", "ignore_case": False, "kinds": None}, timeout=2
+        )
+
+    @patch("PyRock.src.index_server_client.PyRockSettings")
+    @patch("PyRock.src.index_cache.ImportIndexCache.get")
+    @patch("PyRock.src.index_server_client.IndexServerClient.request")
+    def test_lookup_without_server(self, mocked_request, mocked_import_index_cache_get, mocked_settings):
+        mocked_settings.return_value.INDEX_SERVER_FALLBACK.value = True
+        mocked_request.side_effect = IndexServerError()
+        mocked_import_index_cache_get.return_value = JsonImportIndex({
+            "log10": ["cmath.log10"]
+        })
+
+        import_index = IndexServerClient().get_index()
+
+        self.assertEqual(import_index.lookup("log10"), ["cmath.log10"])
+
+    @patch("PyRock.src.index_server_client.PyRockSettings")
+    @patch("PyRock.src.index_cache.ImportIndexCache.get")
+    @patch("PyRock.src.index_server_client.IndexServerClient.request")
+    def test_lookup_kinds_without_server(self, mocked_request, mocked_import_index_cache_get, mocked_settings):
+        mocked_settings.return_value.INDEX_SERVER_FALLBACK.value = True
+        mocked_request.side_effect = IndexServerError()
+        mocked_import_index_cache_get.return_value = JsonImportIndex(
+            {"path": ["os.path", "pathlib.Path"]},
+            {"os.path": "module", "pathlib.Path": "class"},
+        )
+
+        import_index = IndexServerClient().get_index()
+
+        self.assertEqual(import_index.lookup("path", kinds=["class"]), ["pathlib.Path"])
+
+    @patch("PyRock.src.index_server_client.PyRockSettings")
+    @patch("PyRock.src.index_cache.ImportIndexCache.get")
+    @patch("PyRock.src.index_server_client.IndexServerClient.request")
+    def test_lookup_without_server_nor_fallback(self, mocked_request, mocked_import_index_cache_get, mocked_settings):
+        mocked_settings.return_value.INDEX_SERVER_FALLBACK.value = False
+        mocked_request.side_effect = IndexServerError()
+
+        import_index = IndexServerClient().get_index()
+
+        self.assertEqual(import_index.lookup("log10"), [])
+        mocked_import_index_cache_get.assert_not_called()
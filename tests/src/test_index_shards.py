@@ -0,0 +1,58 @@
+import os
+import random
+import tempfile
+
+from tests.base import PyRockTestBase
+from tests.helpers import import_script
+
+
+index_shards = import_script("index_shards")
+
+
+class TestIndexShards(PyRockTestBase):
+    def setUp(self):
+        super().setUp()
+        self.temp_directory = tempfile.TemporaryDirectory()
+        self.shard_store = index_shards.ShardStore(
+            self.temp_directory.name,
+            os.path.join(self.temp_directory.name, "environment"),
+            "py_rock_distributions.json",
+            "shards",
+        )
+        # Enough for more runs of two entries than merged at once
+        self.import_entries = [
+            (f"rock_{index:04}.symbol", "function") for index in range(index_shards.MERGE_FAN_IN * 5)
+        ]
+
+    def tearDown(self):
+        super().tearDown()
+        self.temp_directory.cleanup()
+
+    def test_spill_of_more_runs_than_merged_at_once_is_sorted(self):
+        spill = index_shards.SpillFile(self.shard_store.spill_directory_path, run_size=2)
+        shuffled_entries = self.import_entries * 2
+        random.Random(0).shuffle(shuffled_entries)
+        for import_entry in shuffled_entries:
+            spill.add([import_entry])
+        self.assertGreater(len(spill.run_paths), index_shards.MERGE_FAN_IN)
+
+        self.assertEqual(list(spill.iter_entries()), self.import_entries)
+        self.assertLessEqual(len(spill.run_paths), index_shards.MERGE_FAN_IN)
+
+        spill.remove()
+        self.assertEqual(os.listdir(self.shard_store.spill_directory_path), [])
+
+    def test_more_shards_than_merged_at_once_are_merged_sorted(self):
+        shard_keys = []
+        for index in range(index_shards.MERGE_FAN_IN + 1):
+            spill = self.shard_store.open_spill()
+            # Every shard has its own entries and one shared by all of them
+            spill.add(self.import_entries[index::index_shards.MERGE_FAN_IN + 1] + [("rock.shared", "module")])
+            shard_key = f"rock_{index}"
+            self.shard_store.write_shard(shard_key, spill)
+            shard_keys.append(shard_key)
+
+        self.assertEqual(
+            list(self.shard_store.merge_shards(reversed(shard_keys))),
+            sorted(self.import_entries + [("rock.shared", "module")]),
+        )
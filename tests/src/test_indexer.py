@@ -0,0 +1,265 @@
+import io
+import os
+import sys
+import json
+import pkgutil
+import tempfile
+import multiprocessing
+from unittest import skipIf
+from unittest.mock import patch
+
+from tests.base import PyRockTestBase
+from PyRock.src.constants import PyRockConstants
+from tests.helpers import import_script, get_test_indexer_settings
+
+
+indexer = import_script("indexer")
+index_format = import_script("index_format")
+distributions = import_script("distributions")
+
+
+# Seconds the import of the slow package takes
+SLOW_IMPORT_DURATION = 1
+
+
+@skipIf(multiprocessing.get_start_method() != 'fork', "import workers are forked from the test process")
+class TestImportIndexer(PyRockTestBase):
+    def setUp(self):
+        super().setUp()
+        self.temp_directory = tempfile.TemporaryDirectory()
+        self.site_path = os.path.join(self.temp_directory.name, "site")
+        self.cache_path = os.path.join(self.temp_directory.name, "cache")
+        self.package_names = ["rock_fast", "rock_slow", "rock_late"]
+        # Owned by the standard library pseudo distribution
+        self.stdlib_module_names = set()
+
+        self._write_package("rock_fast", "def fast_symbol():\n    pass\n")
+        self._write_package(
+            "rock_slow", f"import time\ntime.sleep({SLOW_IMPORT_DURATION})\n\ndef slow_symbol():\n    pass\n"
+        )
+        self._write_package("rock_late", "def stale_symbol():\n    pass\n")
+
+        sys.path.append(self.site_path)
+        self.discover_patcher = patch.object(indexer.Indexer, "_discover_modules", self._discover_modules)
+        self.discover_patcher.start()
+
+    def tearDown(self):
+        super().tearDown()
+        self.discover_patcher.stop()
+        sys.path.remove(self.site_path)
+        self.temp_directory.cleanup()
+
+    def _write_package(self, package_name, text):
+        package_path = os.path.join(self.site_path, package_name)
+        os.makedirs(package_path, exist_ok=True)
+        with open(os.path.join(package_path, "__init__.py"), "w") as f:
+            f.write(text)
+
+    def _discover_modules(self):
+        module_finder = pkgutil.get_importer(self.site_path)
+        system_module_map = {name: pkgutil.ModuleInfo(module_finder, name, True) for name in self.package_names}
+        installed_distributions = [
+            distributions.DistributionInfo(name, "1.0", name, [name])
+            for name in self.package_names if name not in self.stdlib_module_names
+        ]
+        if not self.stdlib_module_names:
+            return system_module_map, {distribution.name: distribution for distribution in installed_distributions}
+
+        return system_module_map, distributions.get_installed_distributions(
+            set(self.package_names), installed_distributions, self.stdlib_module_names, self.site_path
+        )
+
+    def _run_indexer(self, **settings):
+        event_stream = io.StringIO()
+        with patch.object(indexer, "_event_stream", event_stream):
+            indexer.Indexer(get_test_indexer_settings(self.cache_path, **settings))._run()
+        return {
+            event["event"]: event
+            for event in map(json.loads, event_stream.getvalue().splitlines())
+        }
+
+    def _touch_pause_file(self):
+        pause_file_path = indexer.Indexer(get_test_indexer_settings(self.cache_path))._get_pause_file_path()
+        os.makedirs(os.path.dirname(pause_file_path), exist_ok=True)
+        with open(pause_file_path, "w"):
+            pass
+
+    def _lookup(self, symbol, stdlib=False):
+        settings = get_test_indexer_settings(self.cache_path)
+        generation = index_format.read_index_generation(indexer.get_index_generation_file_path(settings))
+        import_index = index_format.BinaryImportIndex(
+            index_format.get_snapshot_path(indexer.get_index_file_path(settings, stdlib=stdlib), generation)
+        )
+        try:
+            return import_index.lookup(symbol)
+        finally:
+            import_index.close()
+
+    def test_rebuild_left_unfinished_is_resumed(self):
+        self._run_indexer()
+        self.assertEqual(self._lookup("stale_symbol"), ["rock_late.stale_symbol"])
+
+        # Same distribution version, only a rebuild sees the change
+        self._write_package("rock_late", "def fresh_symbol():\n    pass\n")
+        events = self._run_indexer(FULL_REINDEX=True, INDEXER_TIMEOUT=SLOW_IMPORT_DURATION / 2)
+        self.assertGreaterEqual(events["summary"]["unfinished_distributions"], 2)
+        self.assertEqual(self._lookup("fresh_symbol"), [])
+
+        events = self._run_indexer()
+        self.assertGreaterEqual(events["started"]["distributions"], 2)
+        self.assertEqual(events["summary"]["unfinished_distributions"], 0)
+        self.assertEqual(self._lookup("fresh_symbol"), ["rock_late.fresh_symbol"])
+        self.assertEqual(self._lookup("stale_symbol"), [])
+        self.assertEqual(self._lookup("slow_symbol"), ["rock_slow.slow_symbol"])
+
+        with open(os.path.join(
+            indexer.get_environment_directory_path(get_test_indexer_settings(self.cache_path)),
+            PyRockConstants.DISTRIBUTIONS_MANIFEST_FILE_NAME,
+        )) as f:
+            manifest = json.load(f)
+        self.assertEqual(sorted(manifest["distributions"]), sorted(self.package_names))
+        self.assertEqual(manifest["unfinished_distributions"], [])
+
+        self.assertEqual(self._run_indexer()["started"]["distributions"], 0)
+
+    def test_stdlib_index_is_built_again_only_for_another_python_build(self):
+        self.stdlib_module_names = {"rock_fast"}
+        stdlib_index_directory = os.path.join(self.cache_path, PyRockConstants.STDLIB_INDEX_DIRECTORY_NAME)
+
+        self._run_indexer()
+        self.assertEqual(self._lookup("fast_symbol", stdlib=True), ["rock_fast.fast_symbol"])
+        self.assertEqual(len(os.listdir(stdlib_index_directory)), 1)
+
+        # Same python, the standard library index is used as it is
+        self._write_package("rock_fast", "def fresh_symbol():\n    pass\n")
+        self.assertEqual(self._run_indexer()["started"]["distributions"], 0)
+        self.assertEqual(self._lookup("fresh_symbol", stdlib=True), [])
+
+        # Patched build of the same python version
+        with patch.object(distributions.sys, "version", sys.version + " patched"):
+            events = self._run_indexer()
+        # Standard library and the modules of no distribution, the rest is kept
+        self.assertEqual(events["started"]["distributions"], 2)
+        self.assertEqual(self._lookup("fresh_symbol", stdlib=True), ["rock_fast.fresh_symbol"])
+        self.assertEqual(self._lookup("slow_symbol"), ["rock_slow.slow_symbol"])
+        self.assertEqual(len(os.listdir(stdlib_index_directory)), 2)
+
+    def test_distributions_the_project_imports_are_published_first(self):
+        index_distributions = indexer.Indexer._index_distributions
+        phases = []
+
+        def index_distributions_in_phase(indexer_instance, distributions_to_index, *args):
+            # Lookups are answered from the snapshot published by the phase before
+            phases.append((
+                [distribution.name for distribution in distributions_to_index],
+                self._lookup("stale_symbol") if phases else None,
+            ))
+            return index_distributions(indexer_instance, distributions_to_index, *args)
+
+        with patch.object(
+            indexer.Indexer, "_index_distributions", autospec=True, side_effect=index_distributions_in_phase
+        ):
+            events = self._run_indexer(PRIORITY_MODULES=["rock_late"])
+
+        self.assertEqual(phases, [
+            (["rock_late"], None),
+            (["rock_fast", "rock_slow"], ["rock_late.stale_symbol"]),
+        ])
+        self.assertEqual(events["published"]["distributions"], 1)
+        self.assertEqual(events["summary"]["generation"], events["published"]["generation"] + 1)
+        self.assertEqual(self._lookup("slow_symbol"), ["rock_slow.slow_symbol"])
+
+    def test_static_engine_indexes_distributions_in_a_process_pool(self):
+        with patch.object(
+            indexer.Indexer, "_index_in_parallel", autospec=True, side_effect=indexer.Indexer._index_in_parallel
+        ) as index_in_parallel:
+            events = self._run_indexer(INDEXER_ENGINE="static", INDEXER_WORKERS=2)
+        index_in_parallel.assert_called_once()
+
+        # Reported by the workers as they go
+        self.assertIn("module_started", events)
+        self.assertEqual(events["summary"]["unfinished_distributions"], 0)
+        self.assertEqual(self._lookup("fast_symbol"), ["rock_fast.fast_symbol"])
+        self.assertEqual(self._lookup("slow_symbol"), ["rock_slow.slow_symbol"])
+        self.assertEqual(self._lookup("stale_symbol"), ["rock_late.stale_symbol"])
+        self.assertNotIn("rock_slow", sys.modules)
+
+        # No chunk is started past the deadline
+        events = self._run_indexer(INDEXER_ENGINE="static", INDEXER_WORKERS=2, FULL_REINDEX=True, INDEXER_TIMEOUT=0.001)
+        self.assertEqual(events["summary"]["unfinished_distributions"], len(self.package_names))
+        self.assertEqual(self._lookup("fast_symbol"), ["rock_fast.fast_symbol"])
+
+    def test_static_engine_waits_while_the_editor_is_in_use(self):
+        self._touch_pause_file()
+        events = self._run_indexer(INDEXER_ENGINE="static", INDEXER_IDLE_DELAY=0.5)
+        self.assertGreater(events["resumed"]["paused"], 0.2)
+        self.assertEqual(events["summary"]["unfinished_distributions"], 0)
+        self.assertEqual(self._lookup("fast_symbol"), ["rock_fast.fast_symbol"])
+
+        # Paused for longer than the max pause, the rest waits for the next run
+        self._write_package("rock_fast", "def fresh_symbol():\n    pass\n")
+        self._touch_pause_file()
+        events = self._run_indexer(
+            INDEXER_ENGINE="static", FULL_REINDEX=True, INDEXER_IDLE_DELAY=60, INDEXER_MAX_PAUSE=0.2
+        )
+        self.assertEqual(events["summary"]["unfinished_distributions"], len(self.package_names))
+        self.assertEqual(self._lookup("fresh_symbol"), [])
+        self.assertEqual(self._lookup("fast_symbol"), ["rock_fast.fast_symbol"])
+
+
+class TestImportEngine(PyRockTestBase):
+    def setUp(self):
+        super().setUp()
+        self.temp_directory = tempfile.TemporaryDirectory()
+        self.site_path = os.path.join(self.temp_directory.name, "site")
+        sys.path.append(self.site_path)
+
+    def tearDown(self):
+        super().tearDown()
+        sys.path.remove(self.site_path)
+        for module_name in list(sys.modules):
+            if module_name.startswith("rock_"):
+                del sys.modules[module_name]
+        self.temp_directory.cleanup()
+
+    def _write_package(self, package_name, text):
+        package_path = os.path.join(self.site_path, package_name)
+        os.makedirs(package_path)
+        with open(os.path.join(package_path, "__init__.py"), "w") as f:
+            f.write(text)
+
+    def _get_import_index(self, *module_names):
+        import_indexer = indexer.Indexer(get_test_indexer_settings(self.temp_directory.name))
+        for module_name in module_names:
+            import_indexer._index_imported_module(module_name)
+
+        index_file_path = os.path.join(self.temp_directory.name, PyRockConstants.BINARY_INDEX_FILE_NAME)
+        index_format.BinaryImportIndexWriter().write(index_file_path, import_indexer.import_entries)
+        return index_format.BinaryImportIndex(index_file_path)
+
+    def test_re_exported_module_is_indexed_under_its_alias(self):
+        import_index = self._get_import_index("os")
+
+        # `posixpath` or `ntpath`, indexed under their own name apart
+        self.assertIn("os.path.join", import_index.lookup("join"))
+        self.assertIn("os.path", import_index.lookup("path"))
+        self.assertEqual(import_index.lookup("join", kinds=["function"]), ["os.path.join"])
+        import_index.close()
+
+    def test_package_without_all_re_exports_its_public_imports(self):
+        self._write_package(
+            "rock_implicit",
+            "import os\nfrom collections import OrderedDict\nfrom json import decoder as decoder\n",
+        )
+        self._write_package(
+            "rock_listed",
+            "from collections import OrderedDict\nfrom json import decoder\n\n"
+            "__all__ = ['helper']\n\ndef helper():\n    pass\n",
+        )
+        import_index = self._get_import_index("rock_implicit", "rock_listed")
+
+        self.assertEqual(import_index.lookup("OrderedDict"), ["rock_implicit.OrderedDict"])
+        self.assertEqual(import_index.lookup("decoder"), ["rock_implicit.decoder"])
+        self.assertEqual(import_index.lookup("os"), [])
+        self.assertEqual(import_index.lookup("helper"), ["rock_listed.helper"])
+        import_index.close()
@@ -0,0 +1,68 @@
+import os
+import tempfile
+from unittest.mock import patch
+
+from tests.base import PyRockTestBase
+from PyRock.src.constants import PyRockConstants
+from PyRock.src.indexer_scheduler import IndexerScheduler
+
+
+class TestIndexerScheduler(PyRockTestBase):
+    def setUp(self):
+        super().setUp()
+        self.temp_directory = tempfile.TemporaryDirectory()
+        self.pause_file_path = os.path.join(self.temp_directory.name, PyRockConstants.INDEXER_PAUSE_FILE_NAME)
+        self.directory_patcher = patch(
+            "PyRock.src.indexer_scheduler.get_environment_cache_directory", return_value=self.temp_directory.name
+        )
+        self.directory_patcher.start()
+
+    def tearDown(self):
+        super().tearDown()
+        self.directory_patcher.stop()
+        self.temp_directory.cleanup()
+
+    def test_pause_file_is_touched_only_while_indexing(self):
+        scheduler = IndexerScheduler()
+        scheduler.record_activity()
+        self.assertFalse(os.path.exists(self.pause_file_path))
+
+        with scheduler.indexing():
+            scheduler.record_activity()
+            self.assertTrue(os.path.exists(self.pause_file_path))
+
+            # Not touched again until the touch interval is over
+            os.utime(self.pause_file_path, (0, 0))
+            scheduler.record_activity()
+            self.assertEqual(os.stat(self.pause_file_path).st_mtime, 0)
+
+        os.remove(self.pause_file_path)
+        scheduler.record_activity()
+        self.assertFalse(os.path.exists(self.pause_file_path))
+
+    @patch("PyRock.src.indexer_scheduler.sublime.set_timeout_async")
+    @patch("PyRock.src.indexer_scheduler.PyRockSettings")
+    def test_callback_runs_once_the_editor_is_idle(self, mocked_settings, mocked_set_timeout_async):
+        def callback():
+            pass
+
+        mocked_settings.return_value.INDEXER_IDLE_DELAY.value = 3
+        scheduler = IndexerScheduler()
+        scheduler.record_activity()
+
+        scheduler.run_when_idle(callback)
+        retry, delay = mocked_set_timeout_async.call_args.args
+        self.assertIsNot(retry, callback)
+        self.assertGreater(delay, 2000)
+        self.assertLessEqual(delay, 3001)
+
+        # Idle for long enough by the time it is checked again
+        with patch.object(IndexerScheduler, "get_idle_time", return_value=3):
+            retry()
+        mocked_set_timeout_async.assert_called_with(callback, 0)
+
+        # No delay, it runs right away
+        mocked_settings.return_value.INDEXER_IDLE_DELAY.value = 0
+        mocked_set_timeout_async.reset_mock()
+        scheduler.run_when_idle(callback)
+        mocked_set_timeout_async.assert_called_once_with(callback, 0)
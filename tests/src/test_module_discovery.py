@@ -0,0 +1,56 @@
+import os
+import sys
+import tempfile
+from unittest.mock import patch
+
+from tests.base import PyRockTestBase
+from tests.helpers import import_script
+
+
+module_discovery = import_script("module_discovery")
+
+
+class TestModuleDiscovery(PyRockTestBase):
+    def setUp(self):
+        super().setUp()
+        self.temp_directory = tempfile.TemporaryDirectory()
+        self.site_path = os.path.join(self.temp_directory.name, "site")
+        self.cache_path = os.path.join(self.temp_directory.name, "py_rock_modules.json")
+        os.makedirs(os.path.join(self.site_path, "rock_package"))
+        self._write_file(os.path.join("rock_package", "__init__.py"))
+        self._write_file("rock_module.py")
+        self._write_file("rock_skipped.py")
+        sys.path.append(self.site_path)
+
+    def tearDown(self):
+        super().tearDown()
+        sys.path.remove(self.site_path)
+        self.temp_directory.cleanup()
+
+    def _write_file(self, relative_path):
+        with open(os.path.join(self.site_path, relative_path), "w") as f:
+            f.write("")
+
+    def _discover(self):
+        system_module_map, _ = module_discovery.ModuleDiscovery(
+            self.cache_path, exclude_patterns=["rock_skip*"]
+        ).discover()
+        return {name: module_info for name, module_info in system_module_map.items() if name.startswith("rock_")}
+
+    def test_discovered_modules_are_cached_until_a_directory_changes(self):
+        with patch.object(
+            module_discovery.ModuleDiscovery, "_scan", autospec=True, side_effect=module_discovery.ModuleDiscovery._scan
+        ) as scan:
+            modules = self._discover()
+            self.assertEqual(sorted(modules), ["rock_module", "rock_package"])
+            self.assertTrue(modules["rock_package"].ispkg)
+            self.assertFalse(modules["rock_module"].ispkg)
+
+            self.assertEqual(sorted(self._discover()), ["rock_module", "rock_package"])
+            self.assertEqual(scan.call_count, 1)
+
+            self._write_file("rock_added.py")
+            # Same modification time as the scan otherwise on coarse file systems
+            os.utime(self.site_path, ns=(0, 0))
+            self.assertEqual(sorted(self._discover()), ["rock_added", "rock_module", "rock_package"])
+            self.assertEqual(scan.call_count, 2)
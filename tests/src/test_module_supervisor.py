@@ -0,0 +1,53 @@
+import os
+import time
+import multiprocessing
+from unittest import skipIf
+
+from tests.base import PyRockTestBase
+from tests.helpers import import_script
+
+
+module_supervisor = import_script("module_supervisor")
+
+
+# Seconds a module has to be indexed
+MODULE_TIMEOUT = 0.5
+
+
+def index_module(module_name):
+    if module_name == "rock_hanging":
+        time.sleep(60)
+    if module_name == "rock_crashing":
+        os._exit(1)
+    return [(f"{module_name}.symbol", "function")], None
+
+
+@skipIf(multiprocessing.get_start_method() != 'fork', "workers are forked from the test process")
+class TestModuleSupervisor(PyRockTestBase):
+    def _run(self, module_names):
+        supervisor = module_supervisor.ModuleSupervisor(
+            index_module=index_module,
+            initializer=lambda: None,
+            initargs=(),
+            worker_count=1,
+            module_timeout=MODULE_TIMEOUT,
+            max_rss=1024 * 1024 * 1024,
+            max_modules=100,
+        )
+        return {result.module: result for result in supervisor.run(module_names)}
+
+    def test_hanging_and_crashing_modules_are_skipped(self):
+        start_time = time.monotonic()
+        results = self._run(["rock_fast", "rock_hanging", "rock_crashing", "rock_late"])
+        self.assertLess(time.monotonic() - start_time, 10)
+
+        self.assertTrue(results["rock_hanging"].skipped)
+        self.assertIn("Timed out", results["rock_hanging"].error)
+        self.assertTrue(results["rock_crashing"].skipped)
+        self.assertEqual(results["rock_crashing"].import_entries, [])
+
+        # Indexed by the workers started again after the kills
+        for module_name in ("rock_fast", "rock_late"):
+            self.assertFalse(results[module_name].skipped)
+            self.assertEqual(results[module_name].import_entries, [(f"{module_name}.symbol", "function")])
+        self.assertEqual(multiprocessing.active_children(), [])
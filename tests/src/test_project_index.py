@@ -0,0 +1,53 @@
+import os
+import tempfile
+
+from tests.base import PyRockTestBase
+from PyRock.src.project_index import ProjectIndex
+
+
+class TestProjectIndex(PyRockTestBase):
+    def setUp(self):
+        super().setUp()
+        self.temp_directory = tempfile.TemporaryDirectory()
+        self.package_path = os.path.join(self.temp_directory.name, "src", "pkg")
+        os.makedirs(self.package_path)
+        self._write_file("__init__.py", "")
+        self._write_file("mod.py", "class Foo:\n    pass\n")
+
+    def tearDown(self):
+        super().tearDown()
+        self.temp_directory.cleanup()
+
+    def _write_file(self, file_name, text):
+        file_path = os.path.join(self.package_path, file_name)
+        with open(file_path, "w") as f:
+            f.write(text)
+        return file_path
+
+    def test_module_paths_are_relative_to_source_roots(self):
+        project_index = ProjectIndex([self.temp_directory.name], [".", "src"])
+        project_index.build()
+
+        import_index = project_index.get_import_index()
+        self.assertEqual(import_index.lookup("Foo"), ["pkg.mod.Foo"])
+        self.assertEqual(import_index.lookup("pkg"), ["pkg"])
+
+    def test_saved_file_is_looked_up_right_away(self):
+        project_index = ProjectIndex([self.temp_directory.name], [".", "src"])
+        project_index.build()
+        self.assertEqual(project_index.get_import_index().lookup("bar"), [])
+
+        file_path = self._write_file("mod.py", "class Foo:\n    pass\n\ndef bar():\n    pass\n")
+        project_index.update_file(file_path)
+        self.assertEqual(project_index.get_import_index().lookup("bar"), ["pkg.mod.bar"])
+
+        os.remove(file_path)
+        project_index.update_file(file_path)
+        self.assertEqual(project_index.get_import_index().lookup("Foo"), [])
+
+    def test_imported_modules_are_the_ones_outside_the_project(self):
+        self._write_file("mod.py", "import os.path\nfrom pkg import mod\nfrom . import helpers\n\ndef run():\n    import requests\n")
+        project_index = ProjectIndex([self.temp_directory.name], [".", "src"])
+        project_index.build()
+
+        self.assertEqual(project_index.get_imported_modules(), {"os", "requests"})
@@ -0,0 +1,94 @@
+import os
+import sys
+import json
+import pkgutil
+import tempfile
+from unittest.mock import patch
+
+from tests.base import PyRockTestBase
+from tests.helpers import import_script
+
+
+static_indexer = import_script("static_indexer")
+index_format = import_script("index_format")
+
+
+class TestStaticIndexer(PyRockTestBase):
+    def setUp(self):
+        super().setUp()
+        self.temp_directory = tempfile.TemporaryDirectory()
+        self.site_path = os.path.join(self.temp_directory.name, "site")
+
+    def tearDown(self):
+        super().tearDown()
+        self.temp_directory.cleanup()
+
+    def _write_module(self, relative_path, text):
+        file_path = os.path.join(self.site_path, relative_path)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, "w") as f:
+            f.write(text)
+
+    def test_package_is_indexed_from_its_sources(self):
+        # Fails if the indexer ever runs the package code
+        self._write_module(
+            os.path.join("rock_static", "__init__.py"),
+            "from .core import Engine\nfrom os import path\n\nraise RuntimeError('imported')\n",
+        )
+        self._write_module(
+            os.path.join("rock_static", "core.py"),
+            "class Engine:\n    def run(self):\n        pass\n\n"
+            "async def start():\n    pass\n\ntry:\n    TIMEOUT = 1\nexcept ImportError:\n    pass\n",
+        )
+        self._write_module(os.path.join("rock_static", "tests", "test_core.py"), "def test_start():\n    pass\n")
+
+        import_entries = []
+        indexer = static_indexer.StaticIndexer(
+            store=lambda import_path, kind: import_entries.append((import_path, kind)),
+            scan_depth=4,
+            extension_cache_path=os.path.join(self.temp_directory.name, "py_rock_extension_cache.json"),
+        )
+        indexer.index_module(pkgutil.ModuleInfo(pkgutil.get_importer(self.site_path), "rock_static", True))
+
+        self.assertEqual(sorted(import_entries), [
+            ("rock_static.Engine", index_format.UNKNOWN_KIND),
+            ("rock_static.core", index_format.MODULE_KIND),
+            ("rock_static.core.Engine", index_format.CLASS_KIND),
+            ("rock_static.core.TIMEOUT", index_format.UNKNOWN_KIND),
+            ("rock_static.core.start", index_format.FUNCTION_KIND),
+        ])
+        self.assertNotIn("rock_static", sys.modules)
+
+    def test_extension_failing_to_import_is_introspected_again(self):
+        extension_cache_path = os.path.join(self.temp_directory.name, "py_rock_extension_cache.json")
+        self._write_module("rock_extension.so", "")
+        self._write_module("rock_math.so", "math")
+
+        def run_introspection(command, input, **kwargs):
+            # In this process, the sandbox keeps the import from doing harm
+            static_indexer.introspect_modules(command[-1], json.loads(input))
+
+        def flush(module_paths):
+            import_entries = []
+            indexer = static_indexer.StaticIndexer(
+                store=lambda import_path, kind: import_entries.append((import_path, kind)),
+                scan_depth=4,
+                extension_cache_path=extension_cache_path,
+            )
+            indexer.pending_extension_modules = {
+                module_path: os.path.join(self.site_path, f"rock_{module_path}.so") for module_path in module_paths
+            }
+            with patch.object(static_indexer.subprocess, "run", side_effect=run_introspection) as mocked_run:
+                indexer.flush_extension_modules()
+            return import_entries, mocked_run
+
+        # There is no `extension` module, its import fails
+        import_entries, mocked_run = flush(["math", "extension"])
+        self.assertIn(("math.sqrt", index_format.BUILTIN_KIND), import_entries)
+        self.assertFalse(any(import_path.startswith("extension.") for import_path, _ in import_entries))
+
+        with open(extension_cache_path, "r") as f:
+            self.assertEqual(len(json.load(f)), 1)
+
+        _, mocked_run = flush(["math", "extension"])
+        self.assertEqual(json.loads(mocked_run.call_args.kwargs["input"]), ["extension"])
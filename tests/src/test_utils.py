@@ -0,0 +1,24 @@
+from unittest.mock import patch
+
+from tests.base import PyRockTestBase
+from PyRock.src.constants import PyRockConstants
+from PyRock.src.utils import get_environment_name
+
+
+class TestGetEnvironmentName(PyRockTestBase):
+    @patch("PyRock.src.utils.PyRockSettings")
+    def test_environment_name(self, mocked_settings):
+        mocked_settings.return_value.PYTHON_VIRTUAL_ENV_PATH.value = None
+        self.assertEqual(get_environment_name(), PyRockConstants.DEFAULT_ENVIRONMENT_NAME)
+
+        mocked_settings.return_value.PYTHON_VIRTUAL_ENV_PATH.value = "/projects/api/venv/bin/activate"
+        api_environment_name = get_environment_name()
+
+        mocked_settings.return_value.PYTHON_VIRTUAL_ENV_PATH.value = "/projects/web/venv/bin/activate"
+        web_environment_name = get_environment_name()
+
+        self.assertNotEqual(api_environment_name, web_environment_name)
+        self.assertNotEqual(api_environment_name, PyRockConstants.DEFAULT_ENVIRONMENT_NAME)
+
+        mocked_settings.return_value.PYTHON_VIRTUAL_ENV_PATH.value = "/projects/api/venv/bin/activate"
+        self.assertEqual(get_environment_name(), api_environment_name)